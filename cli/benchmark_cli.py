@@ -0,0 +1,501 @@
+import argparse
+import sys
+from pathlib import Path
+
+# Add the parent directory to Python path to find the search module
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from search.benchmarks import (
+    BENCHMARK_EF_SEARCHES,
+    DEFAULT_AGGREGATION_BENCHMARK_CHUNKS,
+    DEFAULT_ANALYZER_BENCHMARK_DOCS,
+    DEFAULT_BATCH_BENCHMARK_QUERIES,
+    DEFAULT_BENCHMARK_DOC_LENGTH,
+    DEFAULT_BENCHMARK_DOCS,
+    DEFAULT_BENCHMARK_QUERIES,
+    DEFAULT_BENCHMARK_VOCAB_SIZE,
+    DEFAULT_COMPRESSION_BENCHMARK_DOCS,
+    DEFAULT_HNSW_BENCHMARK_EMBEDDINGS,
+    DEFAULT_HNSW_BENCHMARK_QUERIES,
+    DEFAULT_METADATA_BENCHMARK_CHUNKS,
+    DEFAULT_PARALLEL_BENCHMARK_DOCS,
+    DEFAULT_SEMANTIC_BENCHMARK_EMBEDDINGS,
+    DEFAULT_SEMANTIC_BENCHMARK_QUERIES,
+    DEFAULT_SPELLING_BENCHMARK_QUERIES,
+    DEFAULT_SPELLING_BENCHMARK_TERMS,
+    DEFAULT_STORAGE_BENCHMARK_QUERIES,
+    DEFAULT_WILDCARD_BENCHMARK_TERMS,
+    analyzer_throughput_command,
+    batch_scoring_command,
+    boolean_intersection_command,
+    chunk_aggregation_command,
+    chunk_metadata_command,
+    embedding_storage_command,
+    field_scoring_command,
+    hnsw_command,
+    index_memory_command,
+    parallel_build_command,
+    postings_compression_command,
+    semantic_scoring_command,
+    spelling_correction_command,
+    wildcard_expansion_command,
+)
+from search.search_utils import HNSW_EF_CONSTRUCTION, HNSW_M
+
+
+def format_bytes(size: int) -> str:
+    return f"{size / (1024 * 1024):.1f} MiB"
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Search Benchmark CLI")
+    subparsers = parser.add_subparsers(dest="command", help="Available commands")
+
+    memory_parser = subparsers.add_parser(
+        "index-memory",
+        help="Compare keyword index memory layouts on a synthetic corpus",
+    )
+    memory_parser.add_argument(
+        "--docs",
+        type=int,
+        default=DEFAULT_BENCHMARK_DOCS,
+        help="Number of synthetic documents",
+    )
+    memory_parser.add_argument(
+        "--doc-length",
+        type=int,
+        default=DEFAULT_BENCHMARK_DOC_LENGTH,
+        help="Tokens per synthetic document",
+    )
+    memory_parser.add_argument(
+        "--vocab-size",
+        type=int,
+        default=DEFAULT_BENCHMARK_VOCAB_SIZE,
+        help="Number of distinct terms",
+    )
+
+    compression_parser = subparsers.add_parser(
+        "postings-compression",
+        help="Compare array and compressed postings size, decode speed and query latency",
+    )
+    compression_parser.add_argument(
+        "--docs",
+        type=int,
+        default=DEFAULT_COMPRESSION_BENCHMARK_DOCS,
+        help="Number of synthetic documents",
+    )
+    compression_parser.add_argument(
+        "--doc-length",
+        type=int,
+        default=DEFAULT_BENCHMARK_DOC_LENGTH,
+        help="Tokens per synthetic document",
+    )
+    compression_parser.add_argument(
+        "--vocab-size",
+        type=int,
+        default=DEFAULT_BENCHMARK_VOCAB_SIZE,
+        help="Number of distinct terms",
+    )
+    compression_parser.add_argument(
+        "--queries",
+        type=int,
+        default=DEFAULT_BENCHMARK_QUERIES,
+        help="Number of timed queries",
+    )
+
+    parallel_parser = subparsers.add_parser(
+        "parallel-build",
+        help="Measure keyword index build time from 1 to N worker processes",
+    )
+    parallel_parser.add_argument(
+        "--docs",
+        type=int,
+        default=DEFAULT_PARALLEL_BENCHMARK_DOCS,
+        help="Number of synthetic documents",
+    )
+    parallel_parser.add_argument(
+        "--max-workers",
+        type=int,
+        default=None,
+        help="Largest worker count to measure (default: CPU count)",
+    )
+
+    analyzer_parser = subparsers.add_parser(
+        "analyzer-throughput",
+        help="Measure text analyzer throughput in tokens per second",
+    )
+    analyzer_parser.add_argument(
+        "--docs",
+        type=int,
+        default=DEFAULT_ANALYZER_BENCHMARK_DOCS,
+        help="Number of synthetic documents",
+    )
+
+    batch_parser = subparsers.add_parser(
+        "batch-scoring",
+        help="Compare per-query exhaustive BM25 with batched impact matrix scoring",
+    )
+    batch_parser.add_argument(
+        "--docs",
+        type=int,
+        default=DEFAULT_COMPRESSION_BENCHMARK_DOCS,
+        help="Number of synthetic documents",
+    )
+    batch_parser.add_argument(
+        "--queries",
+        type=int,
+        default=DEFAULT_BATCH_BENCHMARK_QUERIES,
+        help="Number of queries scored",
+    )
+
+    field_parser = subparsers.add_parser(
+        "field-scoring",
+        help="Compare single-field BM25 with BM25F latency over title and description",
+    )
+    field_parser.add_argument(
+        "--docs",
+        type=int,
+        default=DEFAULT_COMPRESSION_BENCHMARK_DOCS,
+        help="Number of synthetic documents",
+    )
+    field_parser.add_argument(
+        "--queries",
+        type=int,
+        default=DEFAULT_BENCHMARK_QUERIES,
+        help="Number of queries scored",
+    )
+
+    boolean_parser = subparsers.add_parser(
+        "boolean-intersection",
+        help="Compare merging and probing postings for conjunctive queries",
+    )
+    boolean_parser.add_argument(
+        "--docs",
+        type=int,
+        default=DEFAULT_COMPRESSION_BENCHMARK_DOCS,
+        help="Number of synthetic documents",
+    )
+    boolean_parser.add_argument(
+        "--queries",
+        type=int,
+        default=DEFAULT_BENCHMARK_QUERIES,
+        help="Number of queries evaluated",
+    )
+    wildcard_parser = subparsers.add_parser(
+        "wildcard-expansion",
+        help="Compare scanning and bisecting the term dictionary for wildcards",
+    )
+    wildcard_parser.add_argument(
+        "--terms",
+        type=int,
+        default=DEFAULT_WILDCARD_BENCHMARK_TERMS,
+        help="Number of random terms in the dictionary",
+    )
+    wildcard_parser.add_argument(
+        "--queries",
+        type=int,
+        default=DEFAULT_BENCHMARK_QUERIES,
+        help="Number of patterns expanded",
+    )
+    spelling_parser = subparsers.add_parser(
+        "spelling-correction",
+        help="Compare the symmetric-delete index with scanning every term",
+    )
+    spelling_parser.add_argument(
+        "--terms",
+        type=int,
+        default=DEFAULT_SPELLING_BENCHMARK_TERMS,
+        help="Number of random terms in the vocabulary",
+    )
+    spelling_parser.add_argument(
+        "--queries",
+        type=int,
+        default=DEFAULT_SPELLING_BENCHMARK_QUERIES,
+        help="Number of misspelled words corrected",
+    )
+    semantic_parser = subparsers.add_parser(
+        "semantic-scoring",
+        help="Compare a cosine similarity loop with one normalized matrix product",
+    )
+    semantic_parser.add_argument(
+        "--embeddings",
+        type=int,
+        default=DEFAULT_SEMANTIC_BENCHMARK_EMBEDDINGS,
+        help="Number of random embeddings ranked",
+    )
+    semantic_parser.add_argument(
+        "--queries",
+        type=int,
+        default=DEFAULT_SEMANTIC_BENCHMARK_QUERIES,
+        help="Number of query embeddings",
+    )
+
+    aggregation_parser = subparsers.add_parser(
+        "chunk-aggregation",
+        help="Compare a dict pass with segment reductions for per-movie chunk scores",
+    )
+    aggregation_parser.add_argument(
+        "--chunks",
+        type=int,
+        default=DEFAULT_AGGREGATION_BENCHMARK_CHUNKS,
+        help="Number of chunk scores reduced per query",
+    )
+    aggregation_parser.add_argument(
+        "--queries",
+        type=int,
+        default=DEFAULT_SEMANTIC_BENCHMARK_QUERIES,
+        help="Number of score vectors reduced",
+    )
+
+    metadata_parser = subparsers.add_parser(
+        "chunk-metadata",
+        help="Compare loading chunk metadata from indented JSON and from .npy",
+    )
+    metadata_parser.add_argument(
+        "--chunks",
+        type=int,
+        default=DEFAULT_METADATA_BENCHMARK_CHUNKS,
+        help="Number of chunks described",
+    )
+
+    storage_parser = subparsers.add_parser(
+        "embedding-storage",
+        help="Compare float32, float16 and int8 embedding storage",
+    )
+    storage_parser.add_argument(
+        "--embeddings",
+        type=int,
+        default=DEFAULT_SEMANTIC_BENCHMARK_EMBEDDINGS,
+        help="Number of random embeddings stored",
+    )
+    storage_parser.add_argument(
+        "--queries",
+        type=int,
+        default=DEFAULT_STORAGE_BENCHMARK_QUERIES,
+        help="Number of query embeddings",
+    )
+
+    hnsw_parser = subparsers.add_parser(
+        "hnsw",
+        help="Compare HNSW approximate search with exact embedding search",
+    )
+    hnsw_parser.add_argument(
+        "--embeddings",
+        type=int,
+        default=DEFAULT_HNSW_BENCHMARK_EMBEDDINGS,
+        help="Number of random embeddings indexed",
+    )
+    hnsw_parser.add_argument(
+        "--queries",
+        type=int,
+        default=DEFAULT_HNSW_BENCHMARK_QUERIES,
+        help="Number of query embeddings",
+    )
+    hnsw_parser.add_argument(
+        "--m", type=int, default=HNSW_M, help="Neighbours per node"
+    )
+    hnsw_parser.add_argument(
+        "--ef-construction",
+        type=int,
+        default=HNSW_EF_CONSTRUCTION,
+        help="Candidates considered when linking a node",
+    )
+    hnsw_parser.add_argument(
+        "--ef-search",
+        type=int,
+        nargs="+",
+        default=list(BENCHMARK_EF_SEARCHES),
+        help="Candidates kept while searching, one run each",
+    )
+
+    args = parser.parse_args()
+
+    match args.command:
+        case "index-memory":
+            result = index_memory_command(args.docs, args.doc_length, args.vocab_size)
+            print(
+                f"Index memory for {result['num_docs']} documents "
+                f"({result['doc_length']} tokens, {result['vocab_size']} terms):"
+            )
+            for layout, stats in result["layouts"].items():
+                print(
+                    f"  {layout}: retained {format_bytes(stats['retained_bytes'])}, "
+                    f"peak {format_bytes(stats['peak_bytes'])}"
+                )
+        case "postings-compression":
+            result = postings_compression_command(
+                args.docs, args.doc_length, args.vocab_size, args.queries
+            )
+            print(
+                f"Postings compression for {result['num_docs']} documents "
+                f"({result['postings_count']} postings, {result['queries_count']} queries):"
+            )
+            for index_format, stats in result["formats"].items():
+                print(
+                    f"  {index_format}: memory {format_bytes(stats['in_memory_bytes'])}, "
+                    f"disk {format_bytes(stats['on_disk_bytes'])}, "
+                    f"decode {stats['decode_postings_per_second'] / 1e6:.1f}M postings/s, "
+                    f"exhaustive {stats['exhaustive_latency_ms']:.2f} ms, "
+                    f"bmw {stats['bmw_latency_ms']:.2f} ms"
+                )
+        case "parallel-build":
+            result = parallel_build_command(args.docs, args.max_workers)
+            print(
+                f"Index build for {result['num_docs']} documents "
+                f"({result['cpu_count']} CPUs):"
+            )
+            for workers, stats in result["workers"].items():
+                print(
+                    f"  {workers} worker(s): {stats['seconds']:.2f} s, "
+                    f"speedup {stats['speedup']:.2f}x"
+                )
+        case "analyzer-throughput":
+            result = analyzer_throughput_command(args.docs)
+            print(
+                f"Analyzer throughput for {result['num_docs']} documents "
+                f"({result['tokens_count']} tokens):"
+            )
+            for cache, tokens_per_second in result["tokens_per_second"].items():
+                print(f"  {cache} stem cache: {tokens_per_second:,.0f} tokens/s")
+            cache = result["cache"]
+            print(
+                f"  stem cache: {cache['hits']} hits, {cache['misses']} misses, "
+                f"{cache['currsize']}/{cache['maxsize']} entries"
+            )
+        case "batch-scoring":
+            result = batch_scoring_command(args.docs, args.queries)
+            print(
+                f"Batch scoring of {result['queries_count']} queries over "
+                f"{result['num_docs']} documents:"
+            )
+            print(
+                f"  matrix: {format_bytes(result['matrix_bytes'])}, "
+                f"exported in {result['export_seconds']:.2f} s"
+            )
+            print(
+                f"  exhaustive: {result['exhaustive_queries_per_second']:,.0f} queries/s"
+            )
+            print(f"  matrix: {result['matrix_queries_per_second']:,.0f} queries/s")
+            print(f"  identical top-k: {result['identical_top_k']}")
+        case "field-scoring":
+            result = field_scoring_command(args.docs, args.queries)
+            print(
+                f"Field scoring of {result['queries_count']} queries over "
+                f"{result['num_docs']} documents:"
+            )
+            print(f"  field postings: {format_bytes(result['field_bytes'])}")
+            print(f"  bm25: {result['bm25_latency_ms']:.2f} ms/query")
+            print(f"  bm25f: {result['bm25f_latency_ms']:.2f} ms/query")
+        case "boolean-intersection":
+            result = boolean_intersection_command(args.docs, args.queries)
+            postings = result["avg_postings"]
+            print(
+                f"Conjunctive queries over {result['num_docs']} documents "
+                f"({postings['rare']:,.0f} rare and {postings['frequent']:,.0f} "
+                "frequent postings per term):"
+            )
+            for name, stats in result["strategies"].items():
+                print(
+                    f"  {name}: {stats['latency_ms']:.3f} ms/query, "
+                    f"identical: {stats['identical']}"
+                )
+        case "wildcard-expansion":
+            result = wildcard_expansion_command(args.terms, args.queries)
+            print(
+                f"Wildcard patterns over {result['num_terms']} terms "
+                f"({result['avg_expansions']:.1f} expansions per pattern):"
+            )
+            for name, stats in result["strategies"].items():
+                print(
+                    f"  {name}: {stats['latency_ms']:.3f} ms/query, "
+                    f"identical: {stats['identical']}"
+                )
+        case "spelling-correction":
+            result = spelling_correction_command(args.terms, args.queries)
+            print(
+                f"Misspelled words over {result['num_terms']} terms "
+                f"({result['deletes_count']} deletes indexed in "
+                f"{result['build_seconds']:.2f} s, "
+                f"{result['accuracy']:.0%} corrected to the original term):"
+            )
+            for name, stats in result["strategies"].items():
+                print(
+                    f"  {name}: {stats['latency_ms']:.3f} ms/query, "
+                    f"identical: {stats['identical']}"
+                )
+        case "semantic-scoring":
+            result = semantic_scoring_command(args.embeddings, args.queries)
+            print(
+                f"Cosine ranking over {result['num_embeddings']} embeddings of "
+                f"{result['dimensions']} dimensions (normalized in "
+                f"{result['normalize_seconds']:.2f} s):"
+            )
+            for name, stats in result["strategies"].items():
+                print(
+                    f"  {name}: {stats['latency_ms']:.3f} ms/query, "
+                    f"identical: {stats['identical']}"
+                )
+        case "chunk-aggregation":
+            result = chunk_aggregation_command(args.chunks, args.queries)
+            print(
+                f"Per-movie chunk scores over {result['num_chunks']} chunks of "
+                f"{result['num_movies']} movies:"
+            )
+            for name, stats in result["strategies"].items():
+                print(
+                    f"  {name}: {stats['latency_ms']:.3f} ms/query, "
+                    f"identical: {stats['identical']}"
+                )
+            print("Aggregations:")
+            for name, latency_ms in result["aggregations_ms"].items():
+                print(f"  {name}: {latency_ms:.3f} ms/query")
+        case "chunk-metadata":
+            result = chunk_metadata_command(args.chunks)
+            print(
+                f"Metadata of {result['num_chunks']} chunks "
+                f"(converted from JSON in {result['convert_seconds']:.2f} s):"
+            )
+            for name, stats in result["formats"].items():
+                print(
+                    f"  {name}: {stats['bytes'] / 1e6:.1f} MB, "
+                    f"loaded in {stats['load_seconds'] * 1000:.1f} ms"
+                )
+        case "embedding-storage":
+            result = embedding_storage_command(args.embeddings, args.queries)
+            print(
+                f"{result['num_embeddings']} embeddings of {result['dimensions']} "
+                f"dimensions, recall of the float32 top {result['limit']}:"
+            )
+            for name, stats in result["formats"].items():
+                print(
+                    f"  {name}: {stats['bytes'] / 1e6:.1f} MB, "
+                    f"loaded in {stats['load_seconds'] * 1000:.1f} ms, "
+                    f"{stats['latency_ms']:.3f} ms/query, "
+                    f"recall: {stats['recall']:.3f}"
+                )
+        case "hnsw":
+            result = hnsw_command(
+                args.embeddings,
+                args.queries,
+                args.m,
+                args.ef_construction,
+                tuple(args.ef_search),
+            )
+            print(
+                f"HNSW over {result['num_embeddings']} embeddings "
+                f"(m={result['m']}, ef_construction={result['ef_construction']}) "
+                f"built in {result['build_seconds']:.1f} s, "
+                f"recall of the exact top {result['limit']}:"
+            )
+            for name, stats in result["strategies"].items():
+                print(
+                    f"  {name}: {stats['latency_ms']:.3f} ms/query, "
+                    f"recall: {stats['recall']:.3f}"
+                )
+        case _:
+            parser.print_help()
+
+
+if __name__ == "__main__":
+    main()
@@ -8,7 +8,7 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
-from search.evaluation import evaluate_command
+from search.evaluation import embedding_formats_command, evaluate_command
 
 
 def main():
@@ -19,9 +19,32 @@ def main():
         default=5,
         help="Number of results to evaluate (k for precision@k, recall@k)",
     )
+    parser.add_argument(
+        "--enhance",
+        type=str,
+        choices=["spell", "spell-local", "expand", "rewrite", "prf"],
+        help="Query enhancement method applied before searching",
+    )
+
+    parser.add_argument(
+        "--embedding-formats",
+        action="store_true",
+        help="Compare semantic recall over float32, float16 and int8 embeddings",
+    )
 
     args = parser.parse_args()
-    result = evaluate_command(args.limit)
+    if args.embedding_formats:
+        result = embedding_formats_command(args.limit)
+        print(f"Chunked semantic search, k={args.limit}:")
+        for name, stats in result["formats"].items():
+            print(
+                f"  {name}: {stats['bytes'] / 1e6:.1f} MB, "
+                f"Mean Recall@{args.limit}: {stats['mean_recall']:.4f}, "
+                f"overlap with float32: {stats['overlap']:.4f}"
+            )
+        return
+
+    result = evaluate_command(args.limit, args.enhance)
 
     print(f"k={args.limit}\n")
     for query, res in result["results"].items():
@@ -31,8 +54,14 @@ def main():
         print(f"  - F1 Score: {res['f1']:.4f}")
         print(f"  - Retrieved: {', '.join(res['retrieved'])}")
         print(f"  - Relevant: {', '.join(res['relevant'])}")
+        if res["enhanced_query"]:
+            print(f"  - Enhanced query: {res['enhanced_query']}")
         print()
 
+    print(f"Mean Recall@{args.limit}: {result['mean_recall']:.4f}")
+    if result["enhance"]:
+        print(f"Enhancement ({result['enhance']}): {result['enhance_ms']:.1f} ms/query")
+
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
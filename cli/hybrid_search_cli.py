@@ -7,15 +7,26 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+from search.batch import write_jsonl
 from search.hybrid_search import (
+    hybrid_batch_command,
     normalize_scores,
     rrf_search_command,
     weighted_search_command,
 )
+from search.search_client import SEARCH_SERVER_URL, server_request
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Hybrid Search CLI")
+    parser.add_argument(
+        "--server",
+        nargs="?",
+        const=SEARCH_SERVER_URL,
+        metavar="URL",
+        help=f"Ask a running search server (default {SEARCH_SERVER_URL}) "
+        "instead of loading the engines",
+    )
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
     normalize_parser = subparsers.add_parser(
@@ -52,7 +63,7 @@ def main() -> None:
     rrf_parser.add_argument(
         "--enhance",
         type=str,
-        choices=["spell", "expand", "rewrite"],
+        choices=["spell", "spell-local", "expand", "rewrite", "prf"],
         help="Query enhancement method",
     )
     rrf_parser.add_argument(
@@ -65,7 +76,37 @@ def main() -> None:
         "--limit", type=int, default=5, help="Number of results to return (default=5)"
     )
 
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help="Answer JSON Lines queries with hybrid search, one JSON line each",
+    )
+    batch_parser.add_argument(
+        "input",
+        nargs="?",
+        type=argparse.FileType("r"),
+        default=sys.stdin,
+        help='File of {"query": ...} lines (default stdin)',
+    )
+    batch_parser.add_argument(
+        "--method",
+        type=str,
+        choices=["rrf", "weighted"],
+        default="rrf",
+        help="Fusion of the BM25 and semantic results (default=rrf)",
+    )
+    batch_parser.add_argument(
+        "-k", type=int, default=60, help="RRF k parameter (default=60)"
+    )
+    batch_parser.add_argument(
+        "--alpha", type=float, default=0.5, help="Weight for BM25 (default=0.5)"
+    )
+    batch_parser.add_argument(
+        "--limit", type=int, default=5, help="Number of results per query (default=5)"
+    )
+
     args = parser.parse_args()
+    if args.server and args.command in ("normalize", "batch"):
+        parser.error(f"{args.command} cannot be sent to the search server")
 
     match args.command:
         case "normalize":
@@ -73,7 +114,14 @@ def main() -> None:
             for score in normalized:
                 print(f"* {score:.4f}")
         case "weighted-search":
-            result = weighted_search_command(args.query, args.alpha, args.limit)
+            if args.server:
+                result = server_request(
+                    args.server,
+                    "/hybrid/weighted",
+                    {"query": args.query, "alpha": args.alpha, "limit": args.limit},
+                )
+            else:
+                result = weighted_search_command(args.query, args.alpha, args.limit)
 
             print(
                 f"Weighted Hybrid Search Results for '{result['query']}' (alpha={result['alpha']}):"
@@ -92,9 +140,22 @@ def main() -> None:
                 print(f"   {res['document'][:100]}...")
                 print()
         case "rrf-search":
-            result = rrf_search_command(
-                args.query, args.k, args.enhance, args.rerank_method, args.limit
-            )
+            if args.server:
+                result = server_request(
+                    args.server,
+                    "/hybrid/rrf",
+                    {
+                        "query": args.query,
+                        "k": args.k,
+                        "enhance": args.enhance,
+                        "rerank_method": args.rerank_method,
+                        "limit": args.limit,
+                    },
+                )
+            else:
+                result = rrf_search_command(
+                    args.query, args.k, args.enhance, args.rerank_method, args.limit
+                )
 
             if result["enhanced_query"]:
                 print(
@@ -131,6 +192,12 @@ def main() -> None:
                     print(f"   {', '.join(ranks)}")
                 print(f"   {res['document'][:100]}...")
                 print()
+        case "batch":
+            with args.input:
+                results = hybrid_batch_command(
+                    args.input, args.method, args.k, args.alpha, args.limit
+                )
+                write_jsonl(results, sys.stdout)
         case _:
             parser.print_help()
 
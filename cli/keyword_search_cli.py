@@ -1,6 +1,7 @@
 #!/usr/bin/env python3
 
 import argparse
+import json
 import sys
 
 from pathlib import Path
@@ -9,27 +10,110 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+from search.batch import write_jsonl
+from search.bm25 import SCORING_MODES
+from search.boolean_query import BOOLEAN_OPERATORS
 from search.keyword_search import (
     bm25_idf_command,
     bm25_tf_command,
+    bm25fsearch_command,
+    bm25search_batch_command,
     bm25search_command,
     build_command,
+    compare_scoring_modes_command,
+    convert_command,
+    delete_command,
     idf_command,
+    merge_command,
     search_command,
     tf_command,
     tfidf_command,
+    update_command,
 )
-from search.search_utils import BM25_B, BM25_K1
+from search.postings import INDEX_FORMATS
+from search.search_client import SEARCH_SERVER_URL, server_request
+from search.search_utils import BM25_B, BM25_K1, DEFAULT_FIELD_WEIGHTS
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Keyword Search CLI")
+    parser.add_argument(
+        "--server",
+        nargs="?",
+        const=SEARCH_SERVER_URL,
+        metavar="URL",
+        help=f"Ask a running search server (default {SEARCH_SERVER_URL}) "
+        "instead of loading the engines",
+    )
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
-    subparsers.add_parser("build", help="Build the inverted index")
+    build_parser = subparsers.add_parser("build", help="Build the inverted index")
+    build_parser.add_argument(
+        "--quantize",
+        action="store_true",
+        help="Store BM25 impact scores quantized to 8 bits",
+    )
+    build_parser.add_argument(
+        "--format",
+        choices=INDEX_FORMATS,
+        default="arrays",
+        help="On-disk postings format",
+    )
+    build_parser.add_argument(
+        "--workers",
+        type=int,
+        default=1,
+        help="Worker processes used to tokenize the corpus",
+    )
+    build_parser.add_argument(
+        "--positions",
+        action="store_true",
+        help="Store term positions for phrase and proximity queries",
+    )
+    build_parser.add_argument(
+        "--fields",
+        action="store_true",
+        help="Store per-field postings for BM25F over title and description",
+    )
+
+    subparsers.add_parser(
+        "convert", help="Convert a pickled index into the memory-mapped format"
+    )
+
+    update_parser = subparsers.add_parser(
+        "update", help="Add or replace movies from a JSON file in a new segment"
+    )
+    update_parser.add_argument(
+        "path", type=str, help='JSON file shaped like movies.json: {"movies": [...]}'
+    )
+
+    delete_parser = subparsers.add_parser("delete", help="Delete movies from the index")
+    delete_parser.add_argument("doc_ids", type=int, nargs="+", help="Document IDs")
+
+    merge_parser = subparsers.add_parser(
+        "merge", help="Compact index segments with the merge policy"
+    )
+    merge_parser.add_argument(
+        "--all", action="store_true", help="Merge every segment into one"
+    )
 
-    search_parser = subparsers.add_parser("search", help="Search movies using BM25")
-    search_parser.add_argument("query", type=str, help="Search query")
+    search_parser = subparsers.add_parser(
+        "search", help="Search movies with a boolean query"
+    )
+    search_parser.add_argument(
+        "query",
+        type=str,
+        help='Boolean query, e.g. "bear AND (london OR peru) -paddington"',
+    )
+    search_parser.add_argument(
+        "--operator",
+        choices=BOOLEAN_OPERATORS,
+        default="or",
+        help="Operator joining clauses that have none",
+    )
+    search_parser.add_argument(
+        "--rank", action="store_true", help="Rank the matches with BM25"
+    )
 
     tf_parser = subparsers.add_parser(
         "tf", help="Get term frequency for a given document ID and term"
@@ -71,19 +155,109 @@ def main() -> None:
         "bm25search", help="Search movies using full BM25 scoring"
     )
     bm25search_parser.add_argument("query", type=str, help="Search query")
+    bm25search_parser.add_argument(
+        "--mode",
+        type=str,
+        choices=SCORING_MODES,
+        default="exhaustive",
+        help="Top-k strategy: score every match, or prune with WAND / Block-Max WAND",
+    )
+    bm25search_parser.add_argument(
+        "--feedback",
+        action="store_true",
+        help="Expand the query with RM3 pseudo-relevance feedback and search again",
+    )
+
+    bm25fsearch_parser = subparsers.add_parser(
+        "bm25fsearch", help="Search movies using BM25F over title and description"
+    )
+    bm25fsearch_parser.add_argument("query", type=str, help="Search query")
+    bm25fsearch_parser.add_argument(
+        "--weight",
+        type=str,
+        action="append",
+        default=[],
+        metavar="FIELD=WEIGHT",
+        help=f"Field weight, e.g. title=3 (default: {DEFAULT_FIELD_WEIGHTS})",
+    )
+
+    compare_modes_parser = subparsers.add_parser(
+        "compare-modes",
+        help="Compare BM25 scoring modes on the golden dataset queries",
+    )
+    compare_modes_parser.add_argument(
+        "--limit", type=int, default=5, help="Number of results per query"
+    )
+
+    batch_parser = subparsers.add_parser(
+        "batch", help="Answer JSON Lines queries with BM25, one JSON line each"
+    )
+    batch_parser.add_argument(
+        "input",
+        nargs="?",
+        type=argparse.FileType("r"),
+        default=sys.stdin,
+        help='File of {"query": ...} lines (default stdin)',
+    )
+    batch_parser.add_argument(
+        "--limit", type=int, default=5, help="Number of results per query"
+    )
+    batch_parser.add_argument(
+        "--mode", type=str, choices=SCORING_MODES, default="exhaustive"
+    )
+    batch_parser.add_argument(
+        "--feedback", action="store_true", help="Expand each query with RM3 feedback"
+    )
 
     args = parser.parse_args()
+    if args.server and args.command not in ("search", "bm25search"):
+        parser.error(f"{args.command} cannot be sent to the search server")
 
     match args.command:
         case "build":
             print("Building inverted index...")
-            build_command()
+            build_command(
+                args.quantize, args.format, args.workers, args.positions, args.fields
+            )
             print("Inverted index built successfully.")
+        case "convert":
+            print("Converting pickled index...")
+            index_format = convert_command()
+            print(f"Index converted to the {index_format} segment format.")
+        case "update":
+            with open(args.path, "r") as f:
+                movies = json.load(f)["movies"]
+            update_command(movies)
+            print(f"Indexed {len(movies)} movies.")
+        case "delete":
+            delete_command(args.doc_ids)
+            print(f"Deleted {len(args.doc_ids)} movies.")
+        case "merge":
+            segment_count = merge_command(args.all)
+            print(f"Index has {segment_count} segment(s).")
         case "search":
             print("Searching for:", args.query)
-            results = search_command(args.query)
+            if args.server:
+                results = server_request(
+                    args.server,
+                    "/boolean",
+                    {
+                        "query": args.query,
+                        "rank": args.rank,
+                        "default_operator": args.operator,
+                    },
+                )["results"]
+            else:
+                results = search_command(
+                    args.query, rank=args.rank, default_operator=args.operator
+                )
             for i, res in enumerate(results, 1):
-                print(f"{i}. ({res['id']}) {res['title']}")
+                if args.rank:
+                    print(
+                        f"{i}. ({res['id']}) {res['title']} - Score: {res['score']:.2f}"
+                    )
+                else:
+                    print(f"{i}. ({res['id']}) {res['title']}")
         case "tf":
             tf = tf_command(args.doc_id, args.term)
             print(f"Term frequency of '{args.term}' in document '{args.doc_id}': {tf}")
@@ -99,15 +273,52 @@ def main() -> None:
             bm25idf = bm25_idf_command(args.term)
             print(f"BM25 IDF score of '{args.term}': {bm25idf:.2f}")
         case "bm25tf":
-            bm25tf = bm25_tf_command(args.doc_id, args.term, args.k1)
+            bm25tf = bm25_tf_command(args.doc_id, args.term, args.k1, args.b)
             print(
                 f"BM25 TF score of '{args.term}' in document '{args.doc_id}': {bm25tf:.2f}"
             )
         case "bm25search":
             print("Searching for:", args.query)
-            results = bm25search_command(args.query)
+            if args.server:
+                results = server_request(
+                    args.server,
+                    "/keyword",
+                    {"query": args.query, "mode": args.mode, "feedback": args.feedback},
+                )["results"]
+            else:
+                results = bm25search_command(
+                    args.query, mode=args.mode, feedback=args.feedback
+                )
             for i, res in enumerate(results, 1):
                 print(f"{i}. ({res['id']}) {res['title']} - Score: {res['score']:.2f}")
+        case "bm25fsearch":
+            weights = {}
+            for weight in args.weight:
+                field, _, value = weight.partition("=")
+                try:
+                    weights[field] = float(value)
+                except ValueError:
+                    parser.error(f"--weight expects FIELD=WEIGHT, got {weight!r}")
+            print("Searching for:", args.query)
+            results = bm25fsearch_command(args.query, weights=weights)
+            for i, res in enumerate(results, 1):
+                print(f"{i}. ({res['id']}) {res['title']} - Score: {res['score']:.2f}")
+        case "compare-modes":
+            result = compare_scoring_modes_command(args.limit)
+            print(
+                f"Scoring modes over {result['queries_count']} golden queries (limit={result['limit']}):"
+            )
+            for mode, stats in result["modes"].items():
+                print(
+                    f"  {mode}: {stats['avg_latency_ms']:.3f} ms/query, "
+                    f"identical top-k: {stats['identical_top_k']}"
+                )
+        case "batch":
+            with args.input:
+                results = bm25search_batch_command(
+                    args.input, args.limit, args.mode, args.feedback
+                )
+                write_jsonl(results, sys.stdout)
         case _:
             parser.exit(2, parser.format_help())
 
@@ -0,0 +1,36 @@
+import argparse
+import sys
+from pathlib import Path
+
+# Add the parent directory to Python path to find the search module
+project_root = Path(__file__).parent.parent
+sys.path.insert(0, str(project_root))
+
+from search.search_client import SEARCH_SERVER_HOST, SEARCH_SERVER_PORT
+from search.search_server import serve_command
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Serve keyword, semantic and hybrid search over HTTP"
+    )
+    parser.add_argument(
+        "--host", type=str, default=SEARCH_SERVER_HOST, help="Address to listen on"
+    )
+    parser.add_argument(
+        "--port", type=int, default=SEARCH_SERVER_PORT, help="Port to listen on"
+    )
+    parser.add_argument(
+        "--preload",
+        action="store_true",
+        help="Load the index, embeddings and models before the first request",
+    )
+
+    args = parser.parse_args()
+
+    print(f"Serving search on http://{args.host}:{args.port}")
+    serve_command(args.host, args.port, args.preload)
+
+
+if __name__ == "__main__":
+    main()
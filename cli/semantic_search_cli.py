@@ -9,11 +9,24 @@ from pathlib import Path
 project_root = Path(__file__).parent.parent
 sys.path.insert(0, str(project_root))
 
+from search.batch import write_jsonl
+from search.embedding_store import EMBEDDING_FORMATS
+from search.search_client import SEARCH_SERVER_URL, server_request
+from search.search_utils import (
+    DEFAULT_EMBEDDING_FORMAT,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    HNSW_M,
+)
 from search.semantic_search import (
+    CHUNK_AGGREGATIONS,
+    build_hnsw_command,
     chunk_text,
+    convert_embeddings_command,
     embed_chunks_command,
     embed_query_text,
     embed_text,
+    search_chunked_batch_command,
     search_chunked_command,
     semantic_chunk_text,
     semantic_search,
@@ -24,6 +37,14 @@ from search.semantic_search import (
 
 def main() -> None:
     parser = argparse.ArgumentParser(description="Semantic Search CLI")
+    parser.add_argument(
+        "--server",
+        nargs="?",
+        const=SEARCH_SERVER_URL,
+        metavar="URL",
+        help=f"Ask a running search server (default {SEARCH_SERVER_URL}) "
+        "instead of loading the engines",
+    )
     subparsers = parser.add_subparsers(dest="command", help="Available commands")
 
     subparsers.add_parser("verify", help="Verify that the embedding model is loaded")
@@ -81,9 +102,39 @@ def main() -> None:
         help="Number of sentences to overlap between chunks",
     )
 
-    subparsers.add_parser(
+    embed_chunks_parser = subparsers.add_parser(
         "embed_chunks", help="Generate embeddings for chunked documents"
     )
+    embed_chunks_parser.add_argument(
+        "--embedding-format",
+        type=str,
+        choices=EMBEDDING_FORMATS,
+        default=DEFAULT_EMBEDDING_FORMAT,
+        help="Storage precision of newly built embeddings; saved ones are loaded "
+        f"as they are (default: {DEFAULT_EMBEDDING_FORMAT})",
+    )
+
+    convert_embeddings_parser = subparsers.add_parser(
+        "convert_embeddings",
+        help="Rewrite the saved embeddings in another storage precision",
+    )
+    convert_embeddings_parser.add_argument(
+        "embedding_format", type=str, choices=EMBEDDING_FORMATS
+    )
+
+    build_hnsw_parser = subparsers.add_parser(
+        "build_hnsw", help="Build the HNSW graph of the chunk embeddings"
+    )
+    build_hnsw_parser.add_argument(
+        "--m", type=int, default=HNSW_M, help=f"Neighbours per node (default: {HNSW_M})"
+    )
+    build_hnsw_parser.add_argument(
+        "--ef-construction",
+        type=int,
+        default=HNSW_EF_CONSTRUCTION,
+        help="Candidates considered when linking a node "
+        f"(default: {HNSW_EF_CONSTRUCTION})",
+    )
 
     search_chunked_parser = subparsers.add_parser(
         "search_chunked", help="Search using chunked embeddings"
@@ -92,8 +143,50 @@ def main() -> None:
     search_chunked_parser.add_argument(
         "--limit", type=int, default=5, help="Number of results to return"
     )
+    search_chunked_parser.add_argument(
+        "--aggregation",
+        type=str,
+        choices=CHUNK_AGGREGATIONS,
+        default="max",
+        help="How a movie's chunk scores are combined (default: max)",
+    )
+    search_chunked_parser.add_argument(
+        "--ann",
+        action="store_true",
+        help="Look chunks up in the HNSW graph instead of scoring them all",
+    )
+    search_chunked_parser.add_argument(
+        "--ef-search",
+        type=int,
+        default=HNSW_EF_SEARCH,
+        help=f"Candidates kept by --ann searches (default: {HNSW_EF_SEARCH})",
+    )
+
+    batch_parser = subparsers.add_parser(
+        "batch",
+        help="Answer JSON Lines queries with chunked search, one JSON line each",
+    )
+    batch_parser.add_argument(
+        "input",
+        nargs="?",
+        type=argparse.FileType("r"),
+        default=sys.stdin,
+        help='File of {"query": ...} lines (default stdin)',
+    )
+    batch_parser.add_argument(
+        "--limit", type=int, default=5, help="Number of results per query"
+    )
+    batch_parser.add_argument(
+        "--aggregation", type=str, choices=CHUNK_AGGREGATIONS, default="max"
+    )
+    batch_parser.add_argument("--ann", action="store_true")
+    batch_parser.add_argument("--ef-search", type=int, default=HNSW_EF_SEARCH)
 
     args = parser.parse_args()
+    if args.server and args.command != "search_chunked":
+        parser.error(f"{args.command} cannot be sent to the search server")
+    if args.server and args.ann:
+        parser.error("--ann cannot be sent to the search server")
 
     match args.command:
         case "verify":
@@ -111,15 +204,57 @@ def main() -> None:
         case "semantic_chunk":
             semantic_chunk_text(args.text, args.max_chunk_size, args.overlap)
         case "embed_chunks":
-            embeddings = embed_chunks_command()
-            print(f"Generated {len(embeddings)} chunked embeddings")
+            embeddings = embed_chunks_command(args.embedding_format)
+            print(
+                f"Generated {len(embeddings)} chunked embeddings "
+                f"({embeddings.embedding_format})"
+            )
+        case "convert_embeddings":
+            for path, embeddings in convert_embeddings_command(
+                args.embedding_format
+            ).items():
+                print(
+                    f"{path}: {len(embeddings)} {embeddings.embedding_format} embeddings"
+                )
+        case "build_hnsw":
+            hnsw = build_hnsw_command(args.m, args.ef_construction)
+            print(
+                f"Built an HNSW graph of {len(hnsw)} chunks in {len(hnsw.nodes)} layers"
+            )
         case "search_chunked":
-            result = search_chunked_command(args.query, args.limit)
+            if args.server:
+                result = server_request(
+                    args.server,
+                    "/semantic",
+                    {
+                        "query": args.query,
+                        "limit": args.limit,
+                        "aggregation": args.aggregation,
+                    },
+                )
+            else:
+                result = search_chunked_command(
+                    args.query,
+                    args.limit,
+                    aggregation=args.aggregation,
+                    ann=args.ann,
+                    ef_search=args.ef_search,
+                )
             print(f"Query: {result['query']}")
             print("Results:")
             for i, res in enumerate(result["results"], 1):
                 print(f"\n{i}. {res['title']} (score: {res['score']:.4f})")
                 print(f"   {res['document']}...")
+        case "batch":
+            with args.input:
+                results = search_chunked_batch_command(
+                    args.input,
+                    args.limit,
+                    aggregation=args.aggregation,
+                    ann=args.ann,
+                    ef_search=args.ef_search,
+                )
+                write_jsonl(results, sys.stdout)
         case _:
             parser.print_help()
 
@@ -0,0 +1,54 @@
+import functools
+import string
+from collections.abc import Iterable
+
+from nltk.stem import PorterStemmer
+
+STEM_CACHE_SIZE = 1 << 16
+
+
+class Analyzer:
+    """Turns text into index terms
+
+    Text is lowercased, stripped of punctuation, split on whitespace, filtered
+    against the stopwords and stemmed, in a single pass over the words. Term
+    distributions are heavily skewed, so stems are memoized in a bounded LRU
+    cache and most words skip the Porter stemmer entirely.
+    """
+
+    def __init__(
+        self, stopwords: Iterable[str], stem_cache_size: int = STEM_CACHE_SIZE
+    ) -> None:
+        self.stopwords = frozenset(stopwords)
+        self.punctuation = str.maketrans("", "", string.punctuation)
+        self.stem = functools.lru_cache(maxsize=stem_cache_size)(PorterStemmer().stem)
+
+    def analyze(self, text: str) -> list[str]:
+        stopwords = self.stopwords
+        stem = self.stem
+        words = text.lower().translate(self.punctuation).split()
+        return [stem(word) for word in words if word not in stopwords]
+
+    def analyze_positions(self, text: str) -> tuple[list[str], list[int]]:
+        """Terms of `text` and the word position of each
+
+        Positions count every word, stopwords included, so a phrase keeps its
+        shape: "winnie the pooh" is "winnie" at 0 and "pooh" at 2.
+        """
+        stopwords = self.stopwords
+        stem = self.stem
+        words = text.lower().translate(self.punctuation).split()
+        tokens = []
+        positions = []
+        for position, word in enumerate(words):
+            if word not in stopwords:
+                tokens.append(stem(word))
+                positions.append(position)
+        return tokens, positions
+
+
+@functools.cache
+def load_analyzer(stopwords_path: str) -> Analyzer:
+    """Build the analyzer for a stopwords file once per process"""
+    with open(stopwords_path, "r") as f:
+        return Analyzer(f.read().splitlines())
@@ -0,0 +1,73 @@
+import itertools
+import json
+from collections.abc import Callable, Iterable, Iterator
+from typing import Any, TextIO
+
+import numpy as np
+
+from search.search_utils import BATCH_QUERY_SIZE
+
+
+def read_queries(lines: Iterable[str]) -> Iterator[dict]:
+    """Parse a JSON Lines stream of queries
+
+    Each line holds an object with a "query" string, whose other keys such
+    as an "id" are passed through to the output, or a bare JSON string.
+    Blank lines are skipped. A line that is not JSON raises ValueError and
+    one without a "query" string raises TypeError.
+    """
+    for number, line in enumerate(lines, 1):
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except json.JSONDecodeError as e:
+            raise ValueError(f"line {number}: {e}") from e
+        if isinstance(record, str):
+            record = {"query": record}
+        if not isinstance(record, dict) or not isinstance(record.get("query"), str):
+            raise TypeError(f'line {number}: expected an object with a "query"')
+        yield record
+
+
+def search_batches(
+    records: Iterable[dict],
+    search: Callable[[list[str]], list[list[dict]]],
+    batch_size: int = BATCH_QUERY_SIZE,
+) -> Iterator[dict]:
+    """Answer queries a batch at a time, streaming the answers in input order
+
+    Args:
+        records: Parsed query lines, see `read_queries`
+        search: Results of every query of a batch, in the same order
+        batch_size: Number of queries handed to `search` at once
+
+    Returns:
+        Iterator over the records with their "results" added
+    """
+    for batch in itertools.batched(records, batch_size):
+        answers = search([record["query"] for record in batch])
+        for record, results in zip(batch, answers, strict=True):
+            yield {**record, "results": results}
+
+
+def write_jsonl(records: Iterable[dict], out: TextIO) -> int:
+    """Write records as JSON Lines, flushing after every batch-sized chunk
+
+    Returns:
+        Number of records written
+    """
+    count = 0
+    for count, record in enumerate(records, 1):
+        out.write(json.dumps(record, default=json_default) + "\n")
+        if count % BATCH_QUERY_SIZE == 0:
+            out.flush()
+    out.flush()
+    return count
+
+
+def json_default(value: Any) -> Any:
+    # Scores computed with NumPy come back as NumPy scalars.
+    if isinstance(value, np.generic):
+        return value.item()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
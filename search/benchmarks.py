@@ -0,0 +1,896 @@
+import fnmatch
+import functools
+import json
+import os
+import pickle
+import re
+import string
+import tempfile
+import time
+import tracemalloc
+from collections import Counter, defaultdict
+from collections.abc import Callable, Iterator
+from typing import Any
+
+import numpy as np
+
+from search.analyzer import Analyzer
+from search.bm25 import (
+    ArrayImpactBlocks,
+    CompressedImpactBlocks,
+    ImpactMatrix,
+    accumulate_impacts,
+    average_doc_length,
+    average_field_lengths,
+    block_max_impacts,
+    bm25f_impacts,
+    compute_impacts,
+    dynamic_pruning_top_k,
+    field_length_norms,
+    length_norms,
+    top_k,
+)
+from search.boolean_query import Clauses, Term, evaluate_query
+from search.embedding_store import EMBEDDING_FORMATS, EmbeddingMatrix
+from search.hnsw import HNSWIndex
+from search.keyword_search import build_postings
+from search.postings import PostingsBuilder, compress_index
+from search.search_utils import (
+    DEFAULT_EMBEDDING_FORMAT,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_M,
+    load_stopwords,
+)
+from search.segment import TermDictionary
+from search.semantic_search import (
+    CHUNK_AGGREGATIONS,
+    aggregate_chunk_scores,
+    convert_chunk_metadata,
+    cosine_similarities,
+    cosine_similarity,
+    movie_segments,
+    normalize_embeddings,
+)
+from search.spelling import MAX_EDIT_DISTANCE, SpellingIndex, edit_distance
+from search.wildcard import MAX_EXPANSIONS, expand_pattern
+
+DEFAULT_BENCHMARK_DOCS = 1_000_000
+DEFAULT_BENCHMARK_DOC_LENGTH = 40
+DEFAULT_BENCHMARK_VOCAB_SIZE = 50_000
+SYNTHETIC_BATCH_SIZE = 1_000
+DEFAULT_COMPRESSION_BENCHMARK_DOCS = 200_000
+DEFAULT_BENCHMARK_QUERIES = 200
+DEFAULT_BATCH_BENCHMARK_QUERIES = 2_000
+DEFAULT_PARALLEL_BENCHMARK_DOCS = 20_000
+DEFAULT_ANALYZER_BENCHMARK_DOCS = 20_000
+DEFAULT_WILDCARD_BENCHMARK_TERMS = 500_000
+DEFAULT_SPELLING_BENCHMARK_TERMS = 50_000
+DEFAULT_SPELLING_BENCHMARK_QUERIES = 50
+DEFAULT_SEMANTIC_BENCHMARK_EMBEDDINGS = 100_000
+DEFAULT_SEMANTIC_BENCHMARK_QUERIES = 10
+BENCHMARK_EMBEDDING_DIMENSIONS = 384
+DEFAULT_AGGREGATION_BENCHMARK_CHUNKS = 1_000_000
+BENCHMARK_MAX_CHUNKS_PER_MOVIE = 8
+DEFAULT_METADATA_BENCHMARK_CHUNKS = 1_000_000
+DEFAULT_STORAGE_BENCHMARK_QUERIES = 50
+BENCHMARK_EMBEDDING_CLUSTERS = 1000
+DEFAULT_HNSW_BENCHMARK_EMBEDDINGS = 20_000
+DEFAULT_HNSW_BENCHMARK_QUERIES = 100
+BENCHMARK_EF_SEARCHES = (16, 32, 64, 128)
+BENCHMARK_QUERY_TERMS = 3
+BENCHMARK_TITLE_LENGTH = 4
+BENCHMARK_TOP_K = 10
+
+
+def synthetic_corpus(
+    num_docs: int,
+    doc_length: int = DEFAULT_BENCHMARK_DOC_LENGTH,
+    vocab_size: int = DEFAULT_BENCHMARK_VOCAB_SIZE,
+    seed: int = 0,
+) -> Iterator[tuple[int, list[str]]]:
+    """Yield (doc_id, tokens) pairs with Zipf-distributed terms
+
+    The same arguments always produce the same corpus, so two index layouts
+    can be measured on identical input without holding it in memory.
+    """
+    rng = np.random.default_rng(seed)
+    vocab = [f"term{i}" for i in range(vocab_size)]
+    weights = 1 / np.arange(1, vocab_size + 1)
+    weights /= weights.sum()
+
+    doc_id = 1
+    while doc_id <= num_docs:
+        batch = min(SYNTHETIC_BATCH_SIZE, num_docs - doc_id + 1)
+        term_ids = rng.choice(vocab_size, size=(batch, doc_length), p=weights)
+        for row in term_ids.tolist():
+            yield doc_id, [vocab[term_id] for term_id in row]
+            doc_id += 1
+
+
+def traced_memory(build: Callable[[], Any]) -> tuple[Any, int, int]:
+    """Run `build` and measure the memory it leaves allocated
+
+    Returns:
+        The built object, the bytes still allocated once it returns and the
+        peak bytes allocated while it ran
+    """
+    tracemalloc.start()
+    try:
+        baseline = tracemalloc.get_traced_memory()[0]
+        result = build()
+        current, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return result, current - baseline, peak - baseline
+
+
+def _build_set_and_counter_index(corpus: Iterator[tuple[int, list[str]]]) -> tuple:
+    index = defaultdict(set)
+    term_frequencies = defaultdict(Counter)
+    doc_lengths = {}
+    for doc_id, tokens in corpus:
+        for token in set(tokens):
+            index[token].add(doc_id)
+        term_frequencies[doc_id].update(tokens)
+        doc_lengths[doc_id] = len(tokens)
+    return index, term_frequencies, doc_lengths
+
+
+def _build_array_index(corpus: Iterator[tuple[int, list[str]]]) -> tuple:
+    builder = PostingsBuilder()
+    for doc_id, tokens in corpus:
+        builder.add_document(doc_id, tokens)
+    index, doc_ids, doc_lengths, *_ = builder.build()
+    return index, doc_ids, doc_lengths
+
+
+def index_memory_command(
+    num_docs: int = DEFAULT_BENCHMARK_DOCS,
+    doc_length: int = DEFAULT_BENCHMARK_DOC_LENGTH,
+    vocab_size: int = DEFAULT_BENCHMARK_VOCAB_SIZE,
+) -> dict:
+    layouts = {
+        "set_and_counter": _build_set_and_counter_index,
+        "array_postings": _build_array_index,
+    }
+
+    report = {}
+    for name, build in layouts.items():
+        corpus = synthetic_corpus(num_docs, doc_length, vocab_size)
+        index, retained, peak = traced_memory(functools.partial(build, corpus))
+        del index
+        report[name] = {"retained_bytes": retained, "peak_bytes": peak}
+
+    return {
+        "num_docs": num_docs,
+        "doc_length": doc_length,
+        "vocab_size": vocab_size,
+        "layouts": report,
+    }
+
+
+def _index_bytes(index: dict) -> tuple[int, int]:
+    in_memory = 0
+    for postings in index.values():
+        if isinstance(postings, tuple):
+            in_memory += sum(array.nbytes for array in postings)
+        else:
+            in_memory += postings.nbytes
+    return in_memory, len(pickle.dumps(index, protocol=pickle.HIGHEST_PROTOCOL))
+
+
+def _time_queries(
+    run_query: Callable[[list[str]], Any], queries: list[list[str]]
+) -> float:
+    start = time.perf_counter()
+    for query in queries:
+        run_query(query)
+    return (time.perf_counter() - start) / len(queries) * 1000
+
+
+def _benchmark_queries(
+    index: dict[str, tuple[np.ndarray, np.ndarray]], num_queries: int
+) -> list[list[str]]:
+    # Queries mix frequent and mid-frequency terms, like real keyword queries.
+    rng = np.random.default_rng(1)
+    terms = sorted(index, key=lambda term: -len(index[term][0]))[:1000]
+    return [
+        [terms[i] for i in rng.choice(len(terms), BENCHMARK_QUERY_TERMS, replace=False)]
+        for _ in range(num_queries)
+    ]
+
+
+def postings_compression_command(
+    num_docs: int = DEFAULT_COMPRESSION_BENCHMARK_DOCS,
+    doc_length: int = DEFAULT_BENCHMARK_DOC_LENGTH,
+    vocab_size: int = DEFAULT_BENCHMARK_VOCAB_SIZE,
+    num_queries: int = DEFAULT_BENCHMARK_QUERIES,
+) -> dict:
+    """Compare array and block-compressed postings on a synthetic corpus
+
+    Reports index size in memory and pickled, how fast each form decodes
+    back to (ordinals, frequencies) arrays, and the average latency of
+    exhaustive and Block-Max WAND top-k queries.
+    """
+    index, _, doc_lengths = _build_array_index(
+        synthetic_corpus(num_docs, doc_length, vocab_size)
+    )
+    avg_doc_length = average_doc_length(doc_lengths)
+    term_idf, impacts = compute_impacts(index, doc_lengths, avg_doc_length)
+    block_maxes = block_max_impacts(impacts)
+    norms = length_norms(doc_lengths, avg_doc_length)
+    compressed = compress_index(index)
+    postings_count = sum(len(ordinals) for ordinals, _ in index.values())
+
+    queries = _benchmark_queries(index, num_queries)
+
+    def array_blocks(query: list[str]) -> dict:
+        return {
+            term: ArrayImpactBlocks(index[term][0], impacts[term]) for term in query
+        }
+
+    def compressed_blocks(query: list[str]) -> dict:
+        return {
+            term: CompressedImpactBlocks(compressed[term], norms, term_idf[term])
+            for term in query
+        }
+
+    formats = {}
+    for name, form, blocks in [
+        ("arrays", index, array_blocks),
+        ("compressed", compressed, compressed_blocks),
+    ]:
+        in_memory, on_disk = _index_bytes(form)
+
+        start = time.perf_counter()
+        for postings in form.values():
+            if isinstance(postings, tuple):
+                np.copy(postings[0]), np.copy(postings[1])
+            else:
+                postings.decode()
+        decode_seconds = time.perf_counter() - start
+
+        def exhaustive(query: list[str], blocks=blocks) -> None:
+            postings = {term: b.decode() for term, b in blocks(query).items()}
+            top_k(*accumulate_impacts(postings, query, num_docs), BENCHMARK_TOP_K)
+
+        def bmw(query: list[str], blocks=blocks) -> None:
+            dynamic_pruning_top_k(
+                blocks(query), block_maxes, query, BENCHMARK_TOP_K, use_block_max=True
+            )
+
+        formats[name] = {
+            "in_memory_bytes": in_memory,
+            "on_disk_bytes": on_disk,
+            "decode_postings_per_second": postings_count / decode_seconds,
+            "exhaustive_latency_ms": _time_queries(exhaustive, queries),
+            "bmw_latency_ms": _time_queries(bmw, queries),
+        }
+
+    return {
+        "num_docs": num_docs,
+        "postings_count": postings_count,
+        "queries_count": num_queries,
+        "formats": formats,
+    }
+
+
+def batch_scoring_command(
+    num_docs: int = DEFAULT_COMPRESSION_BENCHMARK_DOCS,
+    num_queries: int = DEFAULT_BATCH_BENCHMARK_QUERIES,
+    doc_length: int = DEFAULT_BENCHMARK_DOC_LENGTH,
+    vocab_size: int = DEFAULT_BENCHMARK_VOCAB_SIZE,
+) -> dict:
+    """Compare query-at-a-time exhaustive scoring with batched matrix scoring"""
+    index, _, doc_lengths = _build_array_index(
+        synthetic_corpus(num_docs, doc_length, vocab_size)
+    )
+    _, impacts = compute_impacts(index, doc_lengths, average_doc_length(doc_lengths))
+    queries = _benchmark_queries(index, num_queries)
+
+    start = time.perf_counter()
+    matrix = ImpactMatrix.from_postings(
+        ((term, (index[term][0], impacts[term])) for term in index), num_docs
+    )
+    export_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    expected = []
+    for query in queries:
+        postings = {term: (index[term][0], impacts[term]) for term in query}
+        ranked = top_k(*accumulate_impacts(postings, query, num_docs), BENCHMARK_TOP_K)
+        expected.append(ranked)
+    exhaustive_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rankings = matrix.top_k(queries, BENCHMARK_TOP_K)
+    matrix_seconds = time.perf_counter() - start
+
+    return {
+        "num_docs": num_docs,
+        "queries_count": num_queries,
+        "matrix_bytes": matrix.nbytes,
+        "export_seconds": export_seconds,
+        "exhaustive_queries_per_second": num_queries / exhaustive_seconds,
+        "matrix_queries_per_second": num_queries / matrix_seconds,
+        "identical_top_k": rankings == expected,
+    }
+
+
+def field_scoring_command(
+    num_docs: int = DEFAULT_COMPRESSION_BENCHMARK_DOCS,
+    num_queries: int = DEFAULT_BENCHMARK_QUERIES,
+    doc_length: int = DEFAULT_BENCHMARK_DOC_LENGTH,
+    vocab_size: int = DEFAULT_BENCHMARK_VOCAB_SIZE,
+) -> dict:
+    """Compare exhaustive BM25 over whole documents with BM25F over two fields
+
+    The first `BENCHMARK_TITLE_LENGTH` tokens of every synthetic document are
+    its title and the rest its description.
+    """
+    builder = PostingsBuilder(field_count=2)
+    for doc_id, tokens in synthetic_corpus(num_docs, doc_length, vocab_size):
+        title_length = min(BENCHMARK_TITLE_LENGTH, len(tokens))
+        builder.add_document(
+            doc_id, tokens, field_lengths=[title_length, len(tokens) - title_length]
+        )
+    index, _, doc_lengths, _, field_frequencies, field_lengths = builder.build()
+    term_idf, impacts = compute_impacts(
+        index, doc_lengths, average_doc_length(doc_lengths)
+    )
+    norms = field_length_norms(field_lengths, average_field_lengths(field_lengths))
+    weights = np.array([2.0, 1.0])
+    queries = _benchmark_queries(index, num_queries)
+
+    def bm25(query: list[str]) -> None:
+        postings = {term: (index[term][0], impacts[term]) for term in query}
+        top_k(*accumulate_impacts(postings, query, num_docs), BENCHMARK_TOP_K)
+
+    def bm25f(query: list[str]) -> None:
+        postings = {}
+        for term in query:
+            ordinals = index[term][0]
+            postings[term] = (
+                ordinals,
+                bm25f_impacts(
+                    field_frequencies[term], norms[ordinals], weights, term_idf[term]
+                ),
+            )
+        top_k(*accumulate_impacts(postings, query, num_docs), BENCHMARK_TOP_K)
+
+    return {
+        "num_docs": num_docs,
+        "queries_count": num_queries,
+        "field_bytes": sum(f.nbytes for f in field_frequencies.values())
+        + field_lengths.nbytes,
+        "bm25_latency_ms": _time_queries(bm25, queries),
+        "bm25f_latency_ms": _time_queries(bm25f, queries),
+    }
+
+
+def boolean_intersection_command(
+    num_docs: int = DEFAULT_COMPRESSION_BENCHMARK_DOCS,
+    num_queries: int = DEFAULT_BENCHMARK_QUERIES,
+    doc_length: int = DEFAULT_BENCHMARK_DOC_LENGTH,
+    vocab_size: int = DEFAULT_BENCHMARK_VOCAB_SIZE,
+) -> dict:
+    """Time conjunctive queries of one rare and two frequent terms
+
+    Compares merging fully decoded postings with probing the longer lists
+    for the candidates of the rarest one, on array and compressed postings.
+    """
+    index, _, _ = _build_array_index(synthetic_corpus(num_docs, doc_length, vocab_size))
+    compressed = compress_index(index)
+    by_frequency = sorted(index, key=lambda term: -len(index[term][0]))
+    rng = np.random.default_rng(1)
+    frequent = by_frequency[:20]
+    rare = by_frequency[1000:2000]
+    queries = [
+        [rare[rng.integers(len(rare))], *rng.choice(frequent, 2, replace=False)]
+        for _ in range(num_queries)
+    ]
+
+    def merge(postings: dict) -> Callable[[list[str]], np.ndarray]:
+        def run(query: list[str]) -> np.ndarray:
+            result = postings[query[0]]()
+            for term in query[1:]:
+                result = np.intersect1d(result, postings[term](), assume_unique=True)
+            return result
+
+        return run
+
+    def probe(postings: dict) -> Callable[[list[str]], np.ndarray]:
+        def run(query: list[str]) -> np.ndarray:
+            return evaluate_query(
+                Clauses(must=[Term(term) for term in query]),
+                postings.get,
+                lambda: np.arange(num_docs),
+            )
+
+        return run
+
+    arrays = {term: ordinals for term, (ordinals, _) in index.items()}
+    strategies = {
+        "merge_arrays": merge({t: lambda o=o: o for t, o in arrays.items()}),
+        "probe_arrays": probe(arrays),
+        "merge_compressed": merge(
+            {t: lambda p=p: p.decode()[0] for t, p in compressed.items()}
+        ),
+        "probe_compressed": probe(compressed),
+    }
+    expected = [strategies["merge_arrays"](query).tolist() for query in queries]
+    return {
+        "num_docs": num_docs,
+        "queries_count": num_queries,
+        "avg_postings": {
+            "rare": float(np.mean([len(index[q[0]][0]) for q in queries])),
+            "frequent": float(np.mean([len(index[q[1]][0]) for q in queries])),
+        },
+        "strategies": {
+            name: {
+                "latency_ms": _time_queries(run, queries),
+                "identical": [run(query).tolist() for query in queries] == expected,
+            }
+            for name, run in strategies.items()
+        },
+    }
+
+
+def _random_terms(num_terms: int, rng: np.random.Generator) -> list[str]:
+    letters = np.array(list(string.ascii_lowercase))
+    return sorted(
+        {
+            "".join(letters[rng.integers(26, size=length)])
+            for length in rng.integers(4, 11, size=num_terms)
+        }
+    )
+
+
+def wildcard_expansion_command(
+    num_terms: int = DEFAULT_WILDCARD_BENCHMARK_TERMS,
+    num_queries: int = DEFAULT_BENCHMARK_QUERIES,
+) -> dict:
+    """Time wildcard expansion by scanning every term and by bisecting
+
+    Patterns are a three-letter prefix followed by * or by ? and *. Terms
+    are random lowercase words, kept in a sorted list and in the on-disk
+    term dictionary of a segment.
+    """
+    rng = np.random.default_rng(0)
+    letters = np.array(list(string.ascii_lowercase))
+    terms = _random_terms(num_terms, rng)
+    encoded = [term.encode() for term in terms]
+    dictionary = TermDictionary(
+        np.frombuffer(b"".join(encoded), dtype=np.uint8),
+        np.cumsum([0] + [len(term) for term in encoded]),
+    )
+    queries = [
+        "".join(letters[rng.integers(26, size=3)]) + ("*" if i % 2 else "?a*")
+        for i in range(num_queries)
+    ]
+
+    def scan(pattern: str) -> list[str]:
+        matcher = re.compile(fnmatch.translate(pattern))
+        return [term for term in terms if matcher.match(term)][:MAX_EXPANSIONS]
+
+    strategies = {
+        "scan": scan,
+        "bisect_list": lambda pattern: expand_pattern(terms, pattern),
+        "bisect_dictionary": lambda pattern: expand_pattern(dictionary, pattern),
+    }
+    expected = [scan(query) for query in queries]
+    return {
+        "num_terms": len(terms),
+        "queries_count": num_queries,
+        "avg_expansions": float(np.mean([len(terms) for terms in expected])),
+        "strategies": {
+            name: {
+                "latency_ms": _time_queries(run, queries),
+                "identical": [run(query) for query in queries] == expected,
+            }
+            for name, run in strategies.items()
+        },
+    }
+
+
+def spelling_correction_command(
+    num_terms: int = DEFAULT_SPELLING_BENCHMARK_TERMS,
+    num_queries: int = DEFAULT_SPELLING_BENCHMARK_QUERIES,
+) -> dict:
+    """Time correcting misspelled words with the symmetric-delete index
+
+    Words are random terms with one or two random edits. The index lookup is
+    compared with computing the edit distance to every term, and accuracy is
+    the share of words corrected back to the term they were made from.
+    """
+    rng = np.random.default_rng(0)
+    terms = _random_terms(num_terms, rng)
+    weights = 1 / np.arange(1, len(terms) + 1)
+    frequencies = dict(zip(terms, (weights * 1e6).astype(int).tolist()))
+    start = time.perf_counter()
+    spelling = SpellingIndex(frequencies)
+    build_seconds = time.perf_counter() - start
+
+    letters = string.ascii_lowercase
+    originals = [terms[i] for i in rng.integers(len(terms), size=num_queries)]
+    queries = []
+    for term in originals:
+        for _ in range(rng.integers(1, MAX_EDIT_DISTANCE + 1)):
+            i = int(rng.integers(len(term)))
+            letter = letters[rng.integers(26)]
+            term = [
+                term[:i] + letter + term[i + 1 :],
+                term[:i] + term[i + 1 :],
+                term[:i] + letter + term[i:],
+                term[:i] + term[i + 1 : i + 2] + term[i : i + 1] + term[i + 2 :],
+            ][rng.integers(4)]
+        queries.append(term)
+
+    def scan(word: str) -> str | None:
+        suggestions = []
+        for term, count in frequencies.items():
+            distance = edit_distance(word, term, MAX_EDIT_DISTANCE)
+            if distance is not None:
+                suggestions.append((distance, -count, term))
+        return min(suggestions)[2] if suggestions else None
+
+    strategies = {"scan": scan, "symmetric_delete": spelling.correct}
+    expected = [scan(query) for query in queries]
+    return {
+        "num_terms": len(terms),
+        "queries_count": num_queries,
+        "build_seconds": build_seconds,
+        "deletes_count": len(spelling.deletes),
+        "accuracy": float(np.mean([a == b for a, b in zip(expected, originals)])),
+        "strategies": {
+            name: {
+                "latency_ms": _time_queries(run, queries),
+                "identical": [run(query) for query in queries] == expected,
+            }
+            for name, run in strategies.items()
+        },
+    }
+
+
+def semantic_scoring_command(
+    num_embeddings: int = DEFAULT_SEMANTIC_BENCHMARK_EMBEDDINGS,
+    num_queries: int = DEFAULT_SEMANTIC_BENCHMARK_QUERIES,
+    dimensions: int = BENCHMARK_EMBEDDING_DIMENSIONS,
+    limit: int = 10,
+) -> dict:
+    """Time ranking random embeddings by cosine similarity to a query
+
+    A Python loop over `cosine_similarity` and a full sort is compared with
+    one product against embeddings normalized up front and a partial sort.
+    """
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((num_embeddings, dimensions), dtype=np.float32)
+    queries = list(rng.standard_normal((num_queries, dimensions), dtype=np.float32))
+    start = time.perf_counter()
+    normalized = normalize_embeddings(embeddings)
+    normalize_seconds = time.perf_counter() - start
+    ordinals = np.arange(num_embeddings)
+
+    def loop(query: np.ndarray) -> list[tuple[int, float]]:
+        scores = [
+            (i, cosine_similarity(query, embedding))
+            for i, embedding in enumerate(embeddings)
+        ]
+        scores.sort(key=lambda x: x[1], reverse=True)
+        return [(i, float(score)) for i, score in scores[:limit]]
+
+    def matrix(query: np.ndarray) -> list[tuple[int, float]]:
+        return top_k(ordinals, cosine_similarities(normalized, query), limit)
+
+    def same_ranking(ranked: list[tuple[int, float]], expected: list) -> bool:
+        return [i for i, _ in ranked] == [i for i, _ in expected] and np.allclose(
+            [score for _, score in ranked], [score for _, score in expected], atol=1e-6
+        )
+
+    strategies = {"loop": loop, "matrix": matrix}
+    expected = [loop(query) for query in queries]
+    return {
+        "num_embeddings": num_embeddings,
+        "dimensions": dimensions,
+        "queries_count": num_queries,
+        "normalize_seconds": normalize_seconds,
+        "strategies": {
+            name: {
+                "latency_ms": _time_queries(run, queries),
+                "identical": all(
+                    same_ranking(run(query), ranked)
+                    for query, ranked in zip(queries, expected)
+                ),
+            }
+            for name, run in strategies.items()
+        },
+    }
+
+
+def chunk_aggregation_command(
+    num_chunks: int = DEFAULT_AGGREGATION_BENCHMARK_CHUNKS,
+    num_queries: int = DEFAULT_SEMANTIC_BENCHMARK_QUERIES,
+) -> dict:
+    """Time reducing chunk similarities to the best chunk score of every movie
+
+    Movies have 1 to `BENCHMARK_MAX_CHUNKS_PER_MOVIE` chunks. The dict pass
+    over chunk metadata is compared with segment reductions over the chunk
+    scores, and the alternative aggregations are timed alongside.
+    """
+    rng = np.random.default_rng(0)
+    chunks_per_movie = rng.integers(1, BENCHMARK_MAX_CHUNKS_PER_MOVIE + 1, num_chunks)
+    chunk_movies = np.repeat(np.arange(num_chunks), chunks_per_movie)[:num_chunks]
+    chunk_metadata = [{"movie_idx": movie} for movie in chunk_movies.tolist()]
+    starts = movie_segments(chunk_movies)
+    queries = list(rng.random((num_queries, num_chunks), dtype=np.float32))
+
+    def dict_max(scores: np.ndarray) -> list[float]:
+        movie_scores = {}
+        for chunk, score in zip(chunk_metadata, scores.tolist()):
+            movie_idx = chunk["movie_idx"]
+            if movie_idx not in movie_scores or score > movie_scores[movie_idx]:
+                movie_scores[movie_idx] = score
+        return list(movie_scores.values())
+
+    aggregations = {
+        aggregation: functools.partial(
+            aggregate_chunk_scores, starts=starts, aggregation=aggregation
+        )
+        for aggregation in CHUNK_AGGREGATIONS
+    }
+    strategies = {"dict_max": dict_max, "reduceat_max": aggregations["max"]}
+    expected = [dict_max(scores) for scores in queries]
+    return {
+        "num_chunks": num_chunks,
+        "num_movies": len(starts),
+        "queries_count": num_queries,
+        "strategies": {
+            name: {
+                "latency_ms": _time_queries(run, queries),
+                "identical": all(
+                    np.array_equal(run(scores), movie_scores)
+                    for scores, movie_scores in zip(queries, expected)
+                ),
+            }
+            for name, run in strategies.items()
+        },
+        "aggregations_ms": {
+            name: _time_queries(run, queries) for name, run in aggregations.items()
+        },
+    }
+
+
+def chunk_metadata_command(
+    num_chunks: int = DEFAULT_METADATA_BENCHMARK_CHUNKS,
+) -> dict:
+    """Compare loading chunk metadata from indented JSON and from `.npy`
+
+    The JSON file is written the way earlier versions did, then converted;
+    loading the array memory-maps it and reads the movie of every chunk.
+    """
+    rng = np.random.default_rng(0)
+    chunks = []
+    movie_idx = 0
+    while len(chunks) < num_chunks:
+        total = int(rng.integers(1, BENCHMARK_MAX_CHUNKS_PER_MOVIE + 1))
+        chunks.extend(
+            {"movie_idx": movie_idx, "chunk_idx": i, "total_chunks": total}
+            for i in range(total)
+        )
+        movie_idx += 1
+    chunks = chunks[:num_chunks]
+
+    with tempfile.TemporaryDirectory() as directory:
+        json_path = os.path.join(directory, "chunk_metadata.json")
+        path = os.path.join(directory, "chunk_metadata.npy")
+        with open(json_path, "w") as f:
+            json.dump({"chunks": chunks, "total_chunks": len(chunks)}, f, indent=2)
+        del chunks
+
+        start = time.perf_counter()
+        with open(json_path, "r") as f:
+            loaded = json.load(f)["chunks"]
+        json_movies = [chunk["movie_idx"] for chunk in loaded]
+        json_seconds = time.perf_counter() - start
+        del loaded
+
+        start = time.perf_counter()
+        convert_chunk_metadata(json_path, path)
+        convert_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        npy_movies = np.load(path, mmap_mode="r")["movie_idx"].astype(np.int64)
+        npy_seconds = time.perf_counter() - start
+
+        return {
+            "num_chunks": num_chunks,
+            "convert_seconds": convert_seconds,
+            "formats": {
+                "json": {
+                    "bytes": os.path.getsize(json_path),
+                    "load_seconds": json_seconds,
+                },
+                "npy": {
+                    "bytes": os.path.getsize(path),
+                    "load_seconds": npy_seconds,
+                    "identical": npy_movies.tolist() == json_movies,
+                },
+            },
+        }
+
+
+def embedding_storage_command(
+    num_embeddings: int = DEFAULT_SEMANTIC_BENCHMARK_EMBEDDINGS,
+    num_queries: int = DEFAULT_STORAGE_BENCHMARK_QUERIES,
+    dimensions: int = BENCHMARK_EMBEDDING_DIMENSIONS,
+    limit: int = 10,
+) -> dict:
+    """Compare the size, load time, latency and recall of each embedding format
+
+    Embeddings are noisy copies of random cluster centers, so every query
+    has close neighbours whose order quantization can disturb. Recall is
+    the share of the float32 top `limit` found by each format.
+    """
+    embeddings, queries = _clustered_embeddings(num_embeddings, num_queries, dimensions)
+    ordinals = np.arange(num_embeddings)
+
+    report = {}
+    expected = None
+    with tempfile.TemporaryDirectory() as directory:
+        for embedding_format in EMBEDDING_FORMATS:
+            path = os.path.join(directory, f"{embedding_format}.npy")
+            EmbeddingMatrix.from_embeddings(embeddings, embedding_format).save(path)
+            start = time.perf_counter()
+            matrix = EmbeddingMatrix.load(path)
+            load_seconds = time.perf_counter() - start
+
+            def search(query: np.ndarray, matrix=matrix) -> set[int]:
+                ranked = top_k(ordinals, matrix.similarities(query), limit)
+                return {ordinal for ordinal, _ in ranked}
+
+            found = [search(query) for query in queries]
+            expected = expected or found
+            report[embedding_format] = {
+                "bytes": os.path.getsize(path),
+                "load_seconds": load_seconds,
+                "latency_ms": _time_queries(search, queries),
+                "recall": float(
+                    np.mean([len(a & b) / limit for a, b in zip(found, expected)])
+                ),
+            }
+
+    return {
+        "num_embeddings": num_embeddings,
+        "dimensions": dimensions,
+        "queries_count": num_queries,
+        "limit": limit,
+        "formats": report,
+    }
+
+
+def hnsw_command(
+    num_embeddings: int = DEFAULT_HNSW_BENCHMARK_EMBEDDINGS,
+    num_queries: int = DEFAULT_HNSW_BENCHMARK_QUERIES,
+    m: int = HNSW_M,
+    ef_construction: int = HNSW_EF_CONSTRUCTION,
+    ef_searches: tuple[int, ...] = BENCHMARK_EF_SEARCHES,
+    dimensions: int = BENCHMARK_EMBEDDING_DIMENSIONS,
+    limit: int = BENCHMARK_TOP_K,
+) -> dict:
+    """Compare HNSW search with exact search over clustered embeddings
+
+    Both score the same embeddings, stored in the default format, and recall
+    is the share of the exact top `limit` that HNSW finds at each `ef`.
+    """
+    embeddings, queries = _clustered_embeddings(num_embeddings, num_queries, dimensions)
+    matrix = EmbeddingMatrix.from_embeddings(embeddings, DEFAULT_EMBEDDING_FORMAT)
+    ordinals = np.arange(num_embeddings)
+
+    start = time.perf_counter()
+    hnsw = HNSWIndex.build(
+        normalize_embeddings(matrix.to_float32()), m, ef_construction
+    )
+    build_seconds = time.perf_counter() - start
+
+    def exact(query: np.ndarray) -> set[int]:
+        ranked = top_k(ordinals, matrix.similarities(query), limit)
+        return {ordinal for ordinal, _ in ranked}
+
+    expected = [exact(query) for query in queries]
+    strategies = {"exact": {"latency_ms": _time_queries(exact, queries), "recall": 1.0}}
+    for ef in ef_searches:
+
+        def approximate(query: np.ndarray, ef=ef) -> set[int]:
+            prepared = matrix.prepare_query(query)
+            found = hnsw.search(lambda rows: matrix.dot(prepared, rows), limit, ef)
+            return {ordinal for ordinal, _ in found}
+
+        found = [approximate(query) for query in queries]
+        strategies[f"hnsw_ef{ef}"] = {
+            "latency_ms": _time_queries(approximate, queries),
+            "recall": float(
+                np.mean([len(a & b) / limit for a, b in zip(found, expected)])
+            ),
+        }
+
+    return {
+        "num_embeddings": num_embeddings,
+        "dimensions": dimensions,
+        "queries_count": num_queries,
+        "limit": limit,
+        "m": m,
+        "ef_construction": ef_construction,
+        "build_seconds": build_seconds,
+        "strategies": strategies,
+    }
+
+
+def _clustered_embeddings(
+    num_embeddings: int, num_queries: int, dimensions: int
+) -> tuple[np.ndarray, list[np.ndarray]]:
+    """Noisy copies of random cluster centers, and queries drawn the same way"""
+    rng = np.random.default_rng(0)
+    centers = rng.standard_normal((BENCHMARK_EMBEDDING_CLUSTERS, dimensions))
+    clusters = rng.integers(BENCHMARK_EMBEDDING_CLUSTERS, size=num_embeddings)
+    embeddings = centers[clusters] + rng.standard_normal((num_embeddings, dimensions))
+    query_clusters = rng.integers(BENCHMARK_EMBEDDING_CLUSTERS, size=num_queries)
+    queries = list(
+        centers[query_clusters] + rng.standard_normal((num_queries, dimensions))
+    )
+    return embeddings, queries
+
+
+def parallel_build_command(
+    num_docs: int = DEFAULT_PARALLEL_BENCHMARK_DOCS,
+    max_workers: int | None = None,
+    doc_length: int = DEFAULT_BENCHMARK_DOC_LENGTH,
+    vocab_size: int = DEFAULT_BENCHMARK_VOCAB_SIZE,
+) -> dict:
+    """Time tokenizing a synthetic corpus into postings with 1 to N workers"""
+    max_workers = max_workers or os.cpu_count() or 1
+    movies = [
+        {"id": doc_id, "title": tokens[0], "description": " ".join(tokens[1:])}
+        for doc_id, tokens in synthetic_corpus(num_docs, doc_length, vocab_size)
+    ]
+
+    timings = {}
+    for workers in range(1, max_workers + 1):
+        start = time.perf_counter()
+        build_postings(movies, workers)
+        timings[workers] = time.perf_counter() - start
+
+    return {
+        "num_docs": num_docs,
+        "cpu_count": os.cpu_count(),
+        "workers": {
+            workers: {"seconds": seconds, "speedup": timings[1] / seconds}
+            for workers, seconds in timings.items()
+        },
+    }
+
+
+def analyzer_throughput_command(
+    num_docs: int = DEFAULT_ANALYZER_BENCHMARK_DOCS,
+    doc_length: int = DEFAULT_BENCHMARK_DOC_LENGTH,
+    vocab_size: int = DEFAULT_BENCHMARK_VOCAB_SIZE,
+) -> dict:
+    """Measure analyzer throughput with a cold and then a warm stem cache"""
+    texts = [
+        " ".join(tokens)
+        for _, tokens in synthetic_corpus(num_docs, doc_length, vocab_size)
+    ]
+    analyzer = Analyzer(load_stopwords())
+
+    passes = {}
+    for name in ("cold", "warm"):
+        start = time.perf_counter()
+        for text in texts:
+            analyzer.analyze(text)
+        passes[name] = num_docs * doc_length / (time.perf_counter() - start)
+
+    return {
+        "num_docs": num_docs,
+        "tokens_count": num_docs * doc_length,
+        "cache": analyzer.stem.cache_info()._asdict(),
+        "tokens_per_second": passes,
+    }
@@ -0,0 +1,608 @@
+import bisect
+import heapq
+import math
+import operator
+from collections import Counter
+from collections.abc import Iterable, Mapping
+
+import numpy as np
+
+from search.postings import POSTINGS_BLOCK_SIZE, CompressedPostings
+from search.search_utils import BM25_B, BM25_K1
+
+IMPACT_LEVELS = 255
+MATRIX_SCORES_PER_CHUNK = 1 << 22
+SCORING_MODES = ("exhaustive", "wand", "bmw")
+
+# Upper bounds are inflated by a hair so float rounding in their sums can
+# never prune a document that would have tied its way into the top k.
+_BOUND_SLACK = 1 + 1e-9
+
+
+def bm25_idf(doc_count: int, term_doc_count: int) -> float:
+    return math.log((doc_count - term_doc_count + 0.5) / (term_doc_count + 0.5) + 1)
+
+
+def bm25_tf(
+    tf: int,
+    doc_length: int,
+    avg_doc_length: float,
+    k1: float = BM25_K1,
+    b: float = BM25_B,
+) -> float:
+    if avg_doc_length > 0:
+        length_norm = 1 - b + b * (doc_length / avg_doc_length)
+    else:
+        length_norm = 1
+    return (tf * (k1 + 1)) / (tf + k1 * length_norm)
+
+
+def top_k(
+    ordinals: np.ndarray, scores: np.ndarray, limit: int
+) -> list[tuple[int, float]]:
+    """Select the best scoring documents
+
+    Ties are broken by ascending ordinal, i.e. ascending document ID,
+    matching the order a full stable sort over the document map would produce.
+
+    Args:
+        ordinals: Ordinals of the scored documents
+        scores: Score of each document in `ordinals`
+        limit: Maximum number of documents to return
+
+    Returns:
+        (ordinal, score) pairs, best first
+    """
+    if limit <= 0 or len(scores) == 0:
+        return []
+    if len(scores) > limit:
+        kth = len(scores) - limit
+        keep = scores >= np.partition(scores, kth)[kth]
+        ordinals, scores = ordinals[keep], scores[keep]
+    order = np.lexsort((ordinals, -scores))[:limit]
+    return list(zip(ordinals[order].tolist(), scores[order].tolist()))
+
+
+def keep_matches(
+    ordinals: np.ndarray, scores: np.ndarray, matches: np.ndarray | None
+) -> tuple[np.ndarray, np.ndarray]:
+    """Restrict scored documents to the ordinals in `matches`, all if None"""
+    if matches is None:
+        return ordinals, scores
+    keep = np.isin(ordinals, matches, assume_unique=True)
+    return ordinals[keep], scores[keep]
+
+
+def pad_with_unmatched(
+    ranked: list[tuple[int, float]], doc_ids, limit: int
+) -> list[tuple[int, float]]:
+    """Fill up a ranking with zero-score documents
+
+    A full scan scores every document, so callers asking for more results
+    than there are matches also get the non-matching documents in document
+    map order. Only walk as many documents as are needed to reach `limit`.
+    """
+    if len(ranked) >= limit:
+        return ranked
+    matched = {doc_id for doc_id, _ in ranked}
+    padded = list(ranked)
+    for doc_id in doc_ids:
+        if doc_id in matched:
+            continue
+        padded.append((doc_id, 0.0))
+        if len(padded) >= limit:
+            break
+    return padded
+
+
+def average_doc_length(doc_lengths: np.ndarray) -> float:
+    if len(doc_lengths) == 0:
+        return 0.0
+    return int(doc_lengths.sum()) / len(doc_lengths)
+
+
+def length_norms(
+    doc_lengths: np.ndarray, avg_doc_length: float, b: float = BM25_B
+) -> np.ndarray:
+    """BM25 length normalization of every document, indexed by ordinal"""
+    if avg_doc_length > 0:
+        return 1 - b + b * (doc_lengths / avg_doc_length)
+    return np.ones(len(doc_lengths))
+
+
+def posting_impacts(
+    frequencies: np.ndarray, norms: np.ndarray, idf: float, k1: float = BM25_K1
+) -> np.ndarray:
+    """Vectorized `bm25_tf` * `bm25_idf` for a run of postings"""
+    return (frequencies * (k1 + 1)) / (frequencies + k1 * norms) * idf
+
+
+def average_field_lengths(field_lengths: np.ndarray) -> np.ndarray:
+    """Mean length of every field over the rows of a (documents, fields) array"""
+    if len(field_lengths) == 0:
+        return np.zeros(field_lengths.shape[1])
+    return field_lengths.sum(axis=0) / len(field_lengths)
+
+
+def field_length_norms(
+    field_lengths: np.ndarray, avg_field_lengths: np.ndarray, b: float = BM25_B
+) -> np.ndarray:
+    """BM25F length normalization of every field, shaped like `field_lengths`"""
+    averages = np.where(avg_field_lengths > 0, avg_field_lengths, 1)
+    norms = 1 - b + b * (field_lengths / averages)
+    return np.where(avg_field_lengths > 0, norms, 1)
+
+
+def bm25f_impacts(
+    field_frequencies: np.ndarray,
+    norms: np.ndarray,
+    weights: np.ndarray,
+    idf: float,
+    k1: float = BM25_K1,
+) -> np.ndarray:
+    """BM25F contribution of a run of postings
+
+    The term frequency of every field is normalized by that field's length,
+    weighted and summed into one pseudo-frequency that is saturated once, so
+    a term repeated across fields cannot outscore a focused match the way
+    summing per-field BM25 scores would. With a single field of weight 1 this
+    is `posting_impacts`.
+
+    Args:
+        field_frequencies: (postings, fields) term frequencies
+        norms: (postings, fields) field length norms of the posting documents
+        weights: Weight of every field
+        idf: BM25 IDF of the term over whole documents
+        k1: BM25 term frequency saturation
+    """
+    frequencies = (field_frequencies / norms) @ weights
+    return frequencies * (k1 + 1) / (frequencies + k1) * idf
+
+
+def quantize_levels(impacts: np.ndarray, scale: float) -> np.ndarray:
+    return np.maximum(1, np.rint(impacts / scale)).astype(np.uint8)
+
+
+def compute_impacts(
+    index: dict[str, tuple[np.ndarray, np.ndarray]],
+    doc_lengths: np.ndarray,
+    avg_doc_length: float,
+    k1: float = BM25_K1,
+    b: float = BM25_B,
+) -> tuple[dict[str, float], dict[str, np.ndarray]]:
+    """Precompute the BM25 contribution of every posting
+
+    Args:
+        index: (ordinals, term frequencies) postings per term
+        doc_lengths: Token count per ordinal
+        avg_doc_length: Mean of `doc_lengths`
+        k1: BM25 term frequency saturation
+        b: BM25 length normalization
+
+    Returns:
+        The IDF of every term and, per term, the impact score of every
+        posting, aligned with the term's postings arrays
+    """
+    doc_count = len(doc_lengths)
+    norms = length_norms(doc_lengths, avg_doc_length, b)
+
+    term_idf = {}
+    impacts = {}
+    for term, (ordinals, frequencies) in index.items():
+        idf = bm25_idf(doc_count, len(ordinals))
+        term_idf[term] = idf
+        impacts[term] = posting_impacts(frequencies, norms[ordinals], idf, k1)
+    return term_idf, impacts
+
+
+def quantize_impacts(
+    impacts: dict[str, np.ndarray],
+) -> tuple[dict[str, np.ndarray], float]:
+    """Map impact scores onto 8-bit integers with a single global scale
+
+    Returns:
+        The quantized impacts and the scale that turns them back into scores
+    """
+    max_impact = 0.0
+    for term_impacts in impacts.values():
+        max_impact = max(max_impact, float(term_impacts.max()))
+    scale = max_impact / IMPACT_LEVELS if max_impact > 0 else 1.0
+
+    quantized = {}
+    for term, term_impacts in impacts.items():
+        quantized[term] = quantize_levels(term_impacts, scale)
+    return quantized, scale
+
+
+def block_max_impacts(
+    impacts: dict[str, np.ndarray],
+    block_size: int = POSTINGS_BLOCK_SIZE,
+) -> dict[str, np.ndarray]:
+    """Highest impact within every fixed-size block of each postings list"""
+    block_maxes = {}
+    for term, term_impacts in impacts.items():
+        starts = np.arange(0, len(term_impacts), block_size)
+        block_maxes[term] = np.maximum.reduceat(term_impacts, starts)
+    return block_maxes
+
+
+def accumulate_impacts(
+    postings: dict[str, tuple[np.ndarray, np.ndarray]],
+    query_tokens: list[str],
+    doc_count: int,
+    scale: float | None = None,
+    weights: Mapping[str, float] | None = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Exhaustive term-at-a-time scoring of every document matching the query
+
+    Args:
+        postings: (ordinals, impacts) of every query term found in the index
+        query_tokens: Processed query tokens, repeats included
+        doc_count: Number of documents in the index
+        scale: Dequantization scale for 8-bit impacts, None if unquantized
+        weights: Query weight of each token, 1 for tokens left out
+
+    Returns:
+        The ordinals of the matching documents and their scores
+    """
+    scores = np.zeros(doc_count)
+    matched = []
+    for token in query_tokens:
+        term_postings = postings.get(token)
+        if term_postings is None:
+            continue
+        ordinals, term_impacts = term_postings
+        if scale is not None:
+            term_impacts = term_impacts * scale
+        if weights is not None:
+            term_impacts = term_impacts * weights.get(token, 1.0)
+        scores[ordinals] += term_impacts
+        matched.append(ordinals)
+
+    if not matched:
+        return np.empty(0, dtype=np.int64), np.empty(0)
+    ordinals = np.unique(np.concatenate(matched))
+    return ordinals, scores[ordinals]
+
+
+class ArrayImpactBlocks:
+    """Block-wise view of a term's uncompressed ordinals and impacts"""
+
+    def __init__(self, ordinals: np.ndarray, impacts: np.ndarray) -> None:
+        last_docs = ordinals[POSTINGS_BLOCK_SIZE - 1 :: POSTINGS_BLOCK_SIZE]
+        if len(ordinals) % POSTINGS_BLOCK_SIZE:
+            last_docs = np.append(last_docs, ordinals[-1])
+        self.last_docs = np.ascontiguousarray(last_docs)
+        self.ordinals = ordinals
+        self.impacts = impacts
+
+    def block(self, block: int) -> tuple[np.ndarray, np.ndarray]:
+        start = block * POSTINGS_BLOCK_SIZE
+        end = start + POSTINGS_BLOCK_SIZE
+        return self.ordinals[start:end], self.impacts[start:end]
+
+    def decode(self) -> tuple[np.ndarray, np.ndarray]:
+        return self.ordinals, self.impacts
+
+
+class CompressedImpactBlocks:
+    """Block-wise impacts of a compressed term, decoded only when visited"""
+
+    def __init__(
+        self,
+        postings: CompressedPostings,
+        norms: np.ndarray,
+        idf: float,
+        k1: float = BM25_K1,
+        scale: float | None = None,
+    ) -> None:
+        self.last_docs = postings.last_docs
+        self.postings = postings
+        self.norms = norms
+        self.idf = idf
+        self.k1 = k1
+        self.scale = scale
+
+    def block(self, block: int) -> tuple[np.ndarray, np.ndarray]:
+        ordinals, frequencies = self.postings.decode_block(block)
+        impacts = posting_impacts(frequencies, self.norms[ordinals], self.idf, self.k1)
+        if self.scale is not None:
+            impacts = quantize_levels(impacts, self.scale)
+        return ordinals, impacts
+
+    def decode(self) -> tuple[np.ndarray, np.ndarray]:
+        blocks = [self.block(block) for block in range(len(self.last_docs))]
+        ordinals, impacts = zip(*blocks)
+        return np.concatenate(ordinals), np.concatenate(impacts)
+
+
+class _PostingsCursor:
+    __slots__ = (
+        "block",
+        "block_maxes",
+        "blocks",
+        "bound_factor",
+        "doc",
+        "impacts",
+        "last_docs",
+        "max_score",
+        "ordinals",
+        "pos",
+    )
+
+    def __init__(
+        self,
+        blocks: ArrayImpactBlocks | CompressedImpactBlocks,
+        block_maxes: np.ndarray,
+        bound_factor: float,
+    ) -> None:
+        # memoryviews index to plain Python numbers without copying, which is
+        # much cheaper than NumPy scalar access in this per-document loop.
+        self.blocks = blocks
+        self.last_docs = memoryview(blocks.last_docs)
+        self.block_maxes = memoryview(np.ascontiguousarray(block_maxes))
+        self.bound_factor = bound_factor
+        self.max_score = float(block_maxes.max()) * bound_factor
+        self.load_block(0)
+
+    def load_block(self, block: int) -> None:
+        self.block = block
+        self.pos = 0
+        if block >= len(self.last_docs):
+            self.doc = math.inf
+            return
+        ordinals, impacts = self.blocks.block(block)
+        self.ordinals = memoryview(ordinals)
+        self.impacts = memoryview(impacts)
+        self.doc = self.ordinals[0]
+
+    def next(self) -> None:
+        self.pos += 1
+        if self.pos < len(self.ordinals):
+            self.doc = self.ordinals[self.pos]
+        else:
+            self.load_block(self.block + 1)
+
+    def seek(self, target: int) -> None:
+        if self.doc >= target:
+            return
+        if self.last_docs[self.block] < target:
+            # Skip data: jump straight to the first block that can hold target.
+            self.load_block(bisect.bisect_left(self.last_docs, target, self.block + 1))
+            if self.doc >= target:
+                return
+        self.pos = bisect.bisect_left(self.ordinals, target, self.pos + 1)
+        self.doc = self.ordinals[self.pos]
+
+    def block_bound(self, target: int) -> tuple[float, int]:
+        """Score bound and last document of the block that would hold `target`"""
+        block = self.block
+        if self.last_docs[block] < target:
+            block = bisect.bisect_left(self.last_docs, target, block + 1)
+        if block == len(self.last_docs):
+            return 0.0, math.inf
+        return self.block_maxes[block] * self.bound_factor, self.last_docs[block]
+
+
+def dynamic_pruning_top_k(
+    postings: dict[str, ArrayImpactBlocks | CompressedImpactBlocks],
+    block_maxes: dict[str, np.ndarray],
+    query_tokens: list[str],
+    limit: int,
+    scale: float | None = None,
+    use_block_max: bool = False,
+) -> list[tuple[int, float]]:
+    """Document-at-a-time top-k with WAND or Block-Max WAND pruning
+
+    Documents whose score upper bound cannot beat the lowest score in the
+    current top-k heap are skipped without being scored. Scores are summed in
+    query token order so they are bit-identical to `accumulate_impacts`, and
+    the ranking matches `top_k` over the exhaustive scores.
+
+    Args:
+        postings: Block-wise ordinals and impacts of every query term found
+            in the index
+        block_maxes: Per-block maximum impact per term
+        query_tokens: Processed query tokens, repeats included
+        limit: Number of documents to return
+        scale: Dequantization scale for 8-bit impacts, None if unquantized
+        use_block_max: Also check per-block bounds (BMW) before scoring
+
+    Returns:
+        (ordinal, score) pairs, best first
+    """
+    if limit <= 0:
+        return []
+
+    unit = scale if scale is not None else 1.0
+    cursors = {}
+    for token, count in Counter(query_tokens).items():
+        blocks = postings.get(token)
+        if blocks is not None:
+            cursors[token] = _PostingsCursor(
+                blocks, block_maxes[token], count * unit * _BOUND_SLACK
+            )
+    heap: list[tuple[float, int]] = []
+    threshold = -math.inf
+    active = list(cursors.values())
+    by_doc = operator.attrgetter("doc")
+    while active:
+        active.sort(key=by_doc)
+        while active and active[-1].doc == math.inf:
+            active.pop()
+        if not active:
+            break
+
+        upper_bound = 0.0
+        pivot = None
+        for i, cursor in enumerate(active):
+            upper_bound += cursor.max_score
+            if upper_bound > threshold:
+                pivot = i
+                break
+        if pivot is None:
+            break
+        pivot_doc = active[pivot].doc
+        while pivot + 1 < len(active) and active[pivot + 1].doc == pivot_doc:
+            pivot += 1
+
+        if use_block_max:
+            block_bound = 0.0
+            next_doc = active[pivot + 1].doc if pivot + 1 < len(active) else math.inf
+            for cursor in active[: pivot + 1]:
+                bound, last_doc = cursor.block_bound(pivot_doc)
+                block_bound += bound
+                next_doc = min(next_doc, last_doc + 1)
+            if block_bound <= threshold:
+                for cursor in active[: pivot + 1]:
+                    cursor.seek(next_doc)
+                continue
+
+        if active[0].doc != pivot_doc:
+            for cursor in active[:pivot]:
+                cursor.seek(pivot_doc)
+            continue
+
+        score = 0.0
+        for token in query_tokens:
+            cursor = cursors.get(token)
+            if cursor is not None and cursor.doc == pivot_doc:
+                impact = cursor.impacts[cursor.pos]
+                score += impact * scale if scale is not None else impact
+        if len(heap) < limit:
+            heapq.heappush(heap, (score, -pivot_doc))
+        elif score > heap[0][0]:
+            heapq.heapreplace(heap, (score, -pivot_doc))
+        if len(heap) == limit:
+            threshold = heap[0][0]
+
+        for cursor in active[: pivot + 1]:
+            cursor.next()
+
+    ranked = sorted(heap, key=lambda x: (-x[0], -x[1]))
+    return [(-neg_ordinal, score) for score, neg_ordinal in ranked]
+
+
+class ImpactMatrix:
+    """Document-term matrix of BM25 impacts for scoring batches of queries
+
+    The matrix is stored in compressed sparse column layout, one column per
+    term: the rows of column j are `indices[indptr[j]:indptr[j + 1]]` with
+    impacts `data[indptr[j]:indptr[j + 1]]`. This is the layout of
+    `scipy.sparse.csc_matrix((data, indices, indptr), shape)`, built from
+    plain NumPy arrays. A batch of queries is scored as one sparse product
+    of the query-term count matrix with the transposed impact matrix, so
+    the only Python work left per query is gathering its columns.
+    """
+
+    def __init__(
+        self,
+        columns: dict[str, int],
+        indptr: np.ndarray,
+        indices: np.ndarray,
+        data: np.ndarray,
+        doc_count: int,
+    ) -> None:
+        self.columns = columns
+        self.indptr = indptr
+        self.indices = indices
+        self.data = data
+        self.shape = (doc_count, len(columns))
+
+    @classmethod
+    def from_postings(
+        cls,
+        postings: Iterable[tuple[str, tuple[np.ndarray, np.ndarray]]],
+        doc_count: int,
+        scale: float | None = None,
+    ) -> "ImpactMatrix":
+        """Stack (ordinals, impacts) postings into columns
+
+        Args:
+            postings: (term, (ordinals, impacts)) pairs
+            doc_count: Number of documents in the index
+            scale: Dequantization scale for 8-bit impacts, None if unquantized
+        """
+        columns = {}
+        indices = []
+        data = []
+        lengths = [0]
+        for term, (ordinals, impacts) in postings:
+            columns[term] = len(columns)
+            indices.append(ordinals)
+            data.append(impacts * scale if scale is not None else impacts)
+            lengths.append(len(ordinals))
+        if not columns:
+            return cls({}, np.zeros(1, dtype=np.int64), np.empty(0), np.empty(0), 0)
+        return cls(
+            columns,
+            np.cumsum(lengths, dtype=np.int64),
+            np.concatenate(indices).astype(np.int64, copy=False),
+            np.concatenate(data).astype(np.float64, copy=False),
+            doc_count,
+        )
+
+    @property
+    def nbytes(self) -> int:
+        return self.indptr.nbytes + self.indices.nbytes + self.data.nbytes
+
+    def score(self, queries: list[list[str]]) -> np.ndarray:
+        """Score every document for every query
+
+        Args:
+            queries: Processed tokens of each query, repeats included
+
+        Returns:
+            A (len(queries), doc_count) array of BM25 scores
+        """
+        doc_count = self.shape[0]
+        rows = []
+        weights = []
+        for query, query_tokens in enumerate(queries):
+            for token in query_tokens:
+                column = self.columns.get(token)
+                if column is None:
+                    continue
+                start, end = self.indptr[column], self.indptr[column + 1]
+                rows.append(self.indices[start:end] + query * doc_count)
+                weights.append(self.data[start:end])
+
+        size = len(queries) * doc_count
+        if not rows:
+            return np.zeros((len(queries), doc_count))
+        # bincount sums each document's impacts in query token order, the
+        # same order `accumulate_impacts` adds them in, so scores match it
+        # bit for bit.
+        scores = np.bincount(
+            np.concatenate(rows), weights=np.concatenate(weights), minlength=size
+        )
+        return scores.reshape(len(queries), doc_count)
+
+    def top_k(
+        self, queries: list[list[str]], limit: int
+    ) -> list[list[tuple[int, float]]]:
+        """Best matching (ordinal, score) pairs of every query
+
+        Queries are scored in chunks of at most `MATRIX_SCORES_PER_CHUNK`
+        scores. Rows are mostly zeros, which make a selection over a full row
+        degenerate, so the matched documents of the whole chunk are found in
+        one pass and only those are partitioned per query, with ties broken
+        by ordinal like `top_k`.
+        """
+        doc_count = self.shape[0]
+        if limit <= 0 or doc_count == 0:
+            return [[] for _ in queries]
+        chunk_size = max(1, MATRIX_SCORES_PER_CHUNK // doc_count)
+
+        ranked = []
+        for chunk_start in range(0, len(queries), chunk_size):
+            chunk = queries[chunk_start : chunk_start + chunk_size]
+            scores = self.score(chunk).ravel()
+            matched = np.flatnonzero(scores > 0)
+            row_starts = np.arange(len(chunk) + 1) * doc_count
+            bounds = np.searchsorted(matched, row_starts)
+            for row in range(len(chunk)):
+                positions = matched[bounds[row] : bounds[row + 1]]
+                ordinals = positions - row_starts[row]
+                ranked.append(top_k(ordinals, scores[positions], limit))
+        return ranked
@@ -0,0 +1,255 @@
+import re
+from collections.abc import Callable, Iterator
+
+import numpy as np
+
+from search.postings import (
+    ORDINAL_DTYPE,
+    CompressedPostings,
+    contains_ordinals,
+)
+from search.search_utils import get_analyzer
+from search.wildcard import WILDCARDS, is_wildcard, normalize_pattern
+
+BOOLEAN_OPERATORS = ("or", "and")
+
+# Parentheses, a + or - prefix glued to the clause it applies to, or a word.
+# Hyphens inside words are left to the analyzer.
+QUERY_TOKEN_PATTERN = re.compile(r"[()]|[+-](?=[^\s()])|[^\s()]+")
+
+Postings = np.ndarray | CompressedPostings
+
+
+class Term:
+    """A single analyzed query term"""
+
+    def __init__(self, token: str) -> None:
+        self.token = token
+
+
+class Clauses:
+    """A group of clauses documents must, should and must not match
+
+    Documents have to match every `must` clause and no `must_not` clause.
+    `should` clauses only decide matching when there is no `must` clause, in
+    which case at least one of them has to match. A group of `must_not`
+    clauses alone matches every other document.
+    """
+
+    def __init__(
+        self,
+        must: list["QueryNode"] | None = None,
+        should: list["QueryNode"] | None = None,
+        must_not: list["QueryNode"] | None = None,
+    ) -> None:
+        self.must = must or []
+        self.should = should or []
+        self.must_not = must_not or []
+
+
+QueryNode = Term | Clauses
+
+
+def parse_boolean_query(
+    query: str,
+    default_operator: str = "or",
+    expand: Callable[[str], list[str]] | None = None,
+) -> QueryNode | None:
+    """Parse a boolean query into a tree of clauses
+
+    Supports AND, OR and NOT (case-sensitive, as in Lucene), parentheses,
+    and + / - prefixes marking required and excluded clauses. Clauses next
+    to each other without an operator are joined with `default_operator`,
+    and AND binds tighter than OR. As in Lucene, optional clauses only
+    decide matching in a group without required clauses: "bear +london"
+    matches every document with "london", and "bear" only adds to its rank.
+
+    Words are analyzed like indexed text, so stopwords drop out of the query.
+    Words with * or ? wildcards match any of the terms `expand` returns for
+    them; without `expand`, the wildcards are stripped like punctuation.
+
+    Returns:
+        The query tree, or None if no clause is left after analysis
+    """
+    if default_operator not in BOOLEAN_OPERATORS:
+        raise ValueError(
+            f"default_operator must be one of {', '.join(BOOLEAN_OPERATORS)}"
+        )
+    tokens = QUERY_TOKEN_PATTERN.findall(query)
+    parser = _Parser(tokens, default_operator == "and", expand)
+    node = parser.parse_or()
+    if parser.position < len(tokens):
+        raise ValueError(f"unexpected {tokens[parser.position]!r} in query")
+    return node
+
+
+class _Parser:
+    def __init__(
+        self,
+        tokens: list[str],
+        required_by_default: bool,
+        expand: Callable[[str], list[str]] | None,
+    ) -> None:
+        self.tokens = tokens
+        self.position = 0
+        self.required_by_default = required_by_default
+        self.expand = expand
+
+    def peek(self) -> str | None:
+        if self.position < len(self.tokens):
+            return self.tokens[self.position]
+        return None
+
+    def next(self) -> str:
+        token = self.tokens[self.position]
+        self.position += 1
+        return token
+
+    def parse_or(self) -> QueryNode | None:
+        nodes = [self.parse_and()]
+        while self.peek() == "OR":
+            self.next()
+            nodes.append(self.parse_and())
+        nodes = [node for node in nodes if node is not None]
+        if len(nodes) <= 1:
+            return nodes[0] if nodes else None
+        return Clauses(should=nodes)
+
+    def parse_and(self) -> QueryNode | None:
+        must, should, must_not = [], [], []
+        required = self.required_by_default
+        last = None
+        while self.peek() not in (None, ")", "OR"):
+            if self.peek() == "AND":
+                self.next()
+                # "a AND b" requires both sides, even when clauses default
+                # to optional.
+                if last is should:
+                    must.append(should.pop())
+                required = True
+                continue
+            clauses = must if required else should
+            required = self.required_by_default
+            while self.peek() in ("+", "-", "NOT"):
+                clauses = must if self.next() == "+" else must_not
+            node = self.parse_primary()
+            last = None
+            if node is not None:
+                clauses.append(node)
+                last = clauses
+        if len(must) + len(should) + len(must_not) == 1 and not must_not:
+            return (must or should)[0]
+        if not (must or should or must_not):
+            return None
+        return Clauses(must, should, must_not)
+
+    def parse_primary(self) -> QueryNode | None:
+        token = self.peek()
+        if token is None:
+            raise ValueError("query ends where a clause was expected")
+        if token == ")":
+            raise ValueError("unexpected ')' in query")
+        self.next()
+        if token == "(":
+            node = self.parse_or()
+            if self.peek() != ")":
+                raise ValueError("unbalanced '(' in query")
+            self.next()
+            return node
+        if self.expand is not None and is_wildcard(token):
+            pattern = normalize_pattern(token)
+            if not pattern.strip(WILDCARDS):
+                return None
+            return Clauses(should=[Term(term) for term in self.expand(pattern)])
+        terms = [Term(term) for term in get_analyzer().analyze(token)]
+        if len(terms) <= 1:
+            return terms[0] if terms else None
+        return Clauses(must=terms)
+
+
+def positive_terms(node: QueryNode | None) -> list[str]:
+    """Tokens of the terms a match may contain, i.e. not under a must_not"""
+    return list(_positive_terms(node))
+
+
+def _positive_terms(node: QueryNode | None) -> Iterator[str]:
+    if isinstance(node, Term):
+        yield node.token
+    elif isinstance(node, Clauses):
+        for child in node.must + node.should:
+            yield from _positive_terms(child)
+
+
+def evaluate_query(
+    node: QueryNode,
+    postings: Callable[[str], Postings | None],
+    universe: Callable[[], np.ndarray],
+) -> np.ndarray:
+    """Sorted ordinals of the documents matching a query tree
+
+    Required clauses are intersected starting from the shortest postings
+    list: its ordinals are the candidates, and every other list is only
+    probed for those candidates, by binary search or, for compressed
+    postings, through the block skip data. A conjunction therefore costs
+    about as much as its rarest term, however common the others are.
+    Excluded terms are probed the same way.
+
+    Args:
+        node: Parsed query
+        postings: Sorted ordinals or compressed postings of a term, None if
+            the term is not indexed
+        universe: Ordinals of every document, for purely negative groups
+    """
+    if isinstance(node, Term):
+        return _ordinals(postings(node.token))
+
+    if node.must:
+        required = sorted(
+            (_clause_postings(child, postings, universe) for child in node.must),
+            key=len,
+        )
+        candidates = _ordinals(required[0])
+        for other in required[1:]:
+            if len(candidates) == 0:
+                break
+            candidates = candidates[contains_ordinals(other, candidates)]
+    elif node.must_not and not node.should:
+        candidates = universe()
+    else:
+        # A wildcard with no expansion is a group with no clause at all, and
+        # matches nothing.
+        candidates = np.unique(
+            np.concatenate(
+                [evaluate_query(child, postings, universe) for child in node.should]
+                + [np.empty(0, dtype=ORDINAL_DTYPE)]
+            )
+        )
+
+    for child in node.must_not:
+        if len(candidates) == 0:
+            break
+        excluded = _clause_postings(child, postings, universe)
+        candidates = candidates[~contains_ordinals(excluded, candidates)]
+    return candidates.astype(ORDINAL_DTYPE, copy=False)
+
+
+def _clause_postings(
+    node: QueryNode,
+    postings: Callable[[str], Postings | None],
+    universe: Callable[[], np.ndarray],
+) -> Postings:
+    # Terms stay as stored, so only the blocks probed get decoded.
+    if isinstance(node, Term):
+        term_postings = postings(node.token)
+        if term_postings is None:
+            return np.empty(0, dtype=ORDINAL_DTYPE)
+        return term_postings
+    return evaluate_query(node, postings, universe)
+
+
+def _ordinals(postings: Postings | None) -> np.ndarray:
+    if postings is None:
+        return np.empty(0, dtype=ORDINAL_DTYPE)
+    if isinstance(postings, CompressedPostings):
+        return postings.decode()[0]
+    return postings
@@ -1,51 +1,70 @@
 import json
+from collections.abc import Iterable
+from itertools import batched
 
 import numpy as np
 
-from search.impl.semantic_search_impl import SemanticSearch, cosine_similarity
-from search.impl.search_utils_impl import PROJECT_ROOT, MOVIES_DATA_PATH, load_movies, SCORE_PRECISION, \
-    DEFAULT_SEARCH_LIMIT, _semantic_chunk_text
+from search.bm25 import top_k
+from search.embedding_store import normalize_embeddings
+from search.impl.semantic_search_impl import SemanticSearch
+from search.impl.search_utils_impl import PROJECT_ROOT, MOVIES_DATA_PATH, SCORE_PRECISION, \
+    DEFAULT_SEARCH_LIMIT, EMBEDDING_BATCH_SIZE, _semantic_chunk_text, iter_movies
 
 
 class ChunkedSemanticSearch(SemanticSearch):
     def __init__(self, model_name="all-MiniLM-L6-v2") -> None:
         super().__init__(model_name)
         self.chunk_embeddings = None
+        self.normalized_chunk_embeddings = None
         self.chunk_metadata = None
+        self.chunk_movies = None
 
 
-    def build_chunk_embeddings(self, documents: list[dict]):
-        self.documents = documents
+    def build_chunk_embeddings(self, documents: Iterable[dict]):
+        """
+        Chunks and encodes the documents in batches of EMBEDDING_BATCH_SIZE as they are streamed in.
+        :param documents: Movies, e.g. from iter_movies
+        :return: The chunk embeddings
+        """
+        self.documents = []
 
         self.document_map = {}
 
-        for document in documents:
-            self.document_map[document["id"]] = document
-
-        chunks: list[str] = []
         metadata: list[dict] = []
-
-        for idx, document in enumerate(documents):
-            document_description = document.get("description", "")
-            if not document_description.strip():
-                continue
-
-            chunked_descriptions = _semantic_chunk_text(document_description,
-                                                       chunk_size=4,
-                                                       overlap=1)
-            total_chunks = len(chunked_descriptions)
-
-            for chunk_id, chunked_description in enumerate(chunked_descriptions):
-                chunks.append(chunked_description)
-
-                metadata.append({
-                    "movie_idx": idx,
-                    "chunk_idx": chunk_id,
-                    "total_chunks": total_chunks
-                })
-
-        self.chunk_embeddings = self.model.encode(chunks)
+        batch_embeddings = []
+
+        for batch in batched(documents, EMBEDDING_BATCH_SIZE):
+            chunks: list[str] = []
+            for document in batch:
+                idx = len(self.documents)
+                self.documents.append(document)
+                self.document_map[document["id"]] = document
+
+                document_description = document.get("description", "")
+                if not document_description.strip():
+                    continue
+
+                chunked_descriptions = _semantic_chunk_text(document_description,
+                                                           chunk_size=4,
+                                                           overlap=1)
+                total_chunks = len(chunked_descriptions)
+
+                for chunk_id, chunked_description in enumerate(chunked_descriptions):
+                    chunks.append(chunked_description)
+
+                    metadata.append({
+                        "movie_idx": idx,
+                        "chunk_idx": chunk_id,
+                        "total_chunks": total_chunks
+                    })
+
+            if chunks:
+                batch_embeddings.append(self.model.encode(chunks))
+
+        self.chunk_embeddings = np.concatenate(batch_embeddings)
+        self.normalized_chunk_embeddings = normalize_embeddings(self.chunk_embeddings)
         self.chunk_metadata = metadata
+        self.chunk_movies = np.array([chunk["movie_idx"] for chunk in metadata], dtype=np.int64)
 
         chunk_embeddings_file = PROJECT_ROOT / "cache" / "chunk_embeddings.npy"
         np.save(chunk_embeddings_file, self.chunk_embeddings)
@@ -54,29 +73,33 @@ class ChunkedSemanticSearch(SemanticSearch):
         with open(chunk_metadata_file, 'w') as f:
             json.dump(
                 {"chunks": metadata,
-                 "total_chunks": len(chunks)},
+                 "total_chunks": len(metadata)},
                 f,
                 indent=2)
 
         return self.chunk_embeddings
 
 
-    def load_or_create_chunk_embeddings(self, documents: list[dict]) -> np.ndarray:
-        self.documents = documents
-
-        self.document_map = {}
-
-        for document in documents:
-            self.document_map[document["id"]] = document
-
+    def load_or_create_chunk_embeddings(self, documents: Iterable[dict]) -> np.ndarray:
         chunk_embeddings_file = PROJECT_ROOT / "cache" / "chunk_embeddings.npy"
         chunk_metadata_file = PROJECT_ROOT / "cache" / "chunk_metadata.json"
 
         if chunk_embeddings_file.is_file() and chunk_metadata_file.is_file():
+            self.documents = list(documents)
+
+            self.document_map = {}
+
+            for document in self.documents:
+                self.document_map[document["id"]] = document
+
             self.chunk_embeddings = np.load(chunk_embeddings_file)
+            self.normalized_chunk_embeddings = normalize_embeddings(self.chunk_embeddings)
             with open(chunk_metadata_file, 'r') as f:
                 data = json.load(f)
                 self.chunk_metadata = data["chunks"]
+            self.chunk_movies = np.array(
+                [chunk["movie_idx"] for chunk in self.chunk_metadata], dtype=np.int64
+            )
 
             return self.chunk_embeddings
         else:
@@ -89,29 +112,14 @@ class ChunkedSemanticSearch(SemanticSearch):
 
         query_embed = self.generate_embedding(query)
 
-        chunk_scores: list[dict] = []
-
-        for i, chunk_embedding in enumerate(self.chunk_embeddings):
-            similarity = cosine_similarity(query_embed, chunk_embedding)
-            chunk_scores.append({
-                "chunk_idx": i,
-                "movie_idx": self.chunk_metadata[i]["movie_idx"],
-                "score": similarity
-            })
-
-        movie_scores = {}
-        for chunk_score in chunk_scores:
-            movie_idx = chunk_score["movie_idx"]
-            if (
-                movie_idx not in movie_scores or
-                chunk_score["score"] > movie_scores[movie_idx]
-            ):
-                movie_scores[movie_idx] = chunk_score["score"]
-
-        sorted_movies = sorted(movie_scores.items(), key=lambda x: x[1], reverse=True)
+        # One product over unit-length rows, then the best chunk of each movie
+        chunk_scores = self.normalized_chunk_embeddings @ normalize_embeddings(query_embed)
+        movie_scores = np.full(len(self.documents), -np.inf, dtype=chunk_scores.dtype)
+        np.maximum.at(movie_scores, self.chunk_movies, chunk_scores)
+        movies = np.flatnonzero(np.isfinite(movie_scores))
 
         results = []
-        for movie_idx, score in sorted_movies[:limit]:
+        for movie_idx, score in top_k(movies, movie_scores[movies], limit):
             doc = self.documents[movie_idx]
             results.append(
                 {
@@ -126,7 +134,7 @@ class ChunkedSemanticSearch(SemanticSearch):
 
 
 def embed_chunks_command():
-    documents = load_movies(MOVIES_DATA_PATH)
+    documents = iter_movies(MOVIES_DATA_PATH)
 
     chunked_semantic_search = ChunkedSemanticSearch()
 
@@ -134,7 +142,7 @@ def embed_chunks_command():
 
 
 def search_chunked_command(query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> dict:
-    documents = load_movies(MOVIES_DATA_PATH)
+    documents = iter_movies(MOVIES_DATA_PATH)
 
     chunked_semantic_search = ChunkedSemanticSearch()
     chunked_semantic_search.load_or_create_chunk_embeddings(documents)
@@ -0,0 +1,65 @@
+import json
+import re
+from collections.abc import Iterator
+from typing import TextIO
+
+READ_CHUNK_SIZE = 1 << 16
+
+_WHITESPACE = re.compile(r"[\s,]*")
+
+
+def iter_json_lines(f: TextIO) -> Iterator[dict]:
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def iter_json_array(f: TextIO, key: str) -> Iterator[dict]:
+    """Stream the items of the array stored under `key` in a JSON object
+
+    Only the item being decoded and one read chunk are held in memory, so
+    a corpus file of any size can be consumed item by item.
+    """
+    decoder = json.JSONDecoder()
+    array_start = re.compile(r'(?<!\\)"' + re.escape(key) + r'"\s*:\s*\[')
+    buffer = ""
+    position = 0
+
+    def read() -> bool:
+        # Decoded items are dropped here, once per read, rather than by
+        # copying the rest of the buffer after every item.
+        nonlocal buffer, position
+        chunk = f.read(READ_CHUNK_SIZE)
+        buffer = buffer[position:] + chunk
+        position = 0
+        return bool(chunk)
+
+    while (match := array_start.search(buffer)) is None:
+        if not read():
+            raise ValueError(f'no "{key}" array found')
+    position = match.end()
+
+    while True:
+        position = _WHITESPACE.match(buffer, position).end()
+        if position == len(buffer):
+            if not read():
+                raise ValueError(f'unterminated "{key}" array')
+            continue
+        if buffer[position] == "]":
+            return
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if not read():
+                raise
+            continue
+        yield item
+
+
+def iter_documents(path: str, key: str) -> Iterator[dict]:
+    """Stream documents from a JSON Lines file or the `key` array of a JSON file"""
+    with open(path, "r") as f:
+        if str(path).endswith(".jsonl"):
+            yield from iter_json_lines(f)
+        else:
+            yield from iter_json_array(f, key)
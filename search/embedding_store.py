@@ -0,0 +1,158 @@
+import os
+
+import numpy as np
+
+from search.search_utils import EMBEDDING_SCORE_BLOCK_ROWS
+
+EMBEDDING_FORMATS = ("float32", "float16", "int8")
+INT8_LEVELS = 127
+
+
+class EmbeddingMatrix:
+    """Unit-length embeddings, stored at reduced precision
+
+    float16 rows are half the size of float32 ones. int8 rows are a quarter,
+    with one scale per dimension: a component is `vectors[i, d] * scales[d]`.
+    Saved float16 and int8 matrices are memory-mapped, so processes share
+    the page cache instead of each reading a private copy, and similarities
+    are computed in float32 one block of rows at a time.
+    """
+
+    def __init__(self, vectors: np.ndarray, scales: np.ndarray | None = None) -> None:
+        self.vectors = vectors
+        self.scales = scales
+
+    @classmethod
+    def from_embeddings(
+        cls, embeddings: np.ndarray, embedding_format: str = "float32"
+    ) -> "EmbeddingMatrix":
+        """Normalize embeddings and store them in the given format"""
+        normalized = normalize_embeddings(np.asarray(embeddings, dtype=np.float32))
+        if embedding_format == "int8":
+            return cls(*quantize_int8(normalized))
+        if embedding_format not in EMBEDDING_FORMATS:
+            raise ValueError(
+                f"embedding format must be one of {', '.join(EMBEDDING_FORMATS)}"
+            )
+        return cls(normalized.astype(embedding_format, copy=False))
+
+    @classmethod
+    def load(cls, path: str) -> "EmbeddingMatrix":
+        """Open embeddings saved by `save`
+
+        float32 files may predate normalization on save, so they are read
+        into memory and normalized; the other formats are memory-mapped.
+        """
+        vectors = np.asarray(np.load(path, mmap_mode="r"))
+        if vectors.dtype == np.int8:
+            return cls(vectors, np.load(scales_path(path)))
+        if vectors.dtype == np.float16:
+            return cls(vectors)
+        return cls(normalize_embeddings(np.array(vectors, dtype=np.float32)))
+
+    def save(self, path: str) -> None:
+        # Written aside and renamed, so a matrix still mapped from the old
+        # file keeps reading the old contents.
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        if self.scales is not None:
+            save_array(scales_path(path), self.scales)
+        elif os.path.exists(scales_path(path)):
+            os.remove(scales_path(path))
+        save_array(path, self.vectors)
+
+    @property
+    def embedding_format(self) -> str:
+        return "int8" if self.scales is not None else self.vectors.dtype.name
+
+    @property
+    def shape(self) -> tuple[int, ...]:
+        return self.vectors.shape
+
+    def __len__(self) -> int:
+        return len(self.vectors)
+
+    def __getitem__(self, rows) -> "EmbeddingMatrix":
+        return EmbeddingMatrix(self.vectors[rows], self.scales)
+
+    def similarities(self, query_embedding: np.ndarray) -> np.ndarray:
+        """Cosine similarity of a query with every row, in float32"""
+        return self.dot(self.prepare_query(query_embedding))
+
+    def prepare_query(self, query_embedding: np.ndarray) -> np.ndarray:
+        """Normalize a query for `dot`, folding in the int8 scales"""
+        query = normalize_embeddings(np.asarray(query_embedding, dtype=np.float32))
+        if self.scales is not None:
+            # Scaling the query once replaces dequantizing every row.
+            query = query * self.scales
+        return query
+
+    def dot(self, query: np.ndarray, rows: np.ndarray | None = None) -> np.ndarray:
+        """Similarity of a prepared query with the given rows, or every row"""
+        if rows is not None:
+            return self.vectors[rows].astype(np.float32, copy=False) @ query
+        if self.vectors.dtype == np.float32:
+            return self.vectors @ query
+        scores = np.empty(len(self.vectors), dtype=np.float32)
+        for start in range(0, len(self.vectors), EMBEDDING_SCORE_BLOCK_ROWS):
+            block = self.vectors[start : start + EMBEDDING_SCORE_BLOCK_ROWS]
+            np.matmul(
+                block.astype(np.float32),
+                query,
+                out=scores[start : start + len(block)],
+            )
+        return scores
+
+    def to_float32(self) -> np.ndarray:
+        """The embeddings as stored, widened back to float32"""
+        vectors = self.vectors.astype(np.float32)
+        return vectors * self.scales if self.scales is not None else vectors
+
+
+def convert_embeddings(path: str, embedding_format: str) -> EmbeddingMatrix:
+    """Rewrite saved embeddings in another format and load them
+
+    Conversion starts from the stored vectors rather than re-encoding, so
+    it only loses precision: float16 or int8 files never go back to the
+    float32 embeddings they came from. Loading never converts, which is
+    why this is a separate, explicit step.
+    """
+    embeddings = EmbeddingMatrix.load(path)
+    if embeddings.embedding_format != embedding_format:
+        EmbeddingMatrix.from_embeddings(embeddings.to_float32(), embedding_format).save(
+            path
+        )
+        embeddings = EmbeddingMatrix.load(path)
+    return embeddings
+
+
+def normalize_embeddings(embeddings: np.ndarray) -> np.ndarray:
+    """Scale embeddings to unit length along their last axis
+
+    Zero vectors stay zero, so they score 0 like in `cosine_similarity`.
+    """
+    norms = np.linalg.norm(embeddings, axis=-1, keepdims=True)
+    return np.divide(embeddings, norms, out=np.zeros_like(embeddings), where=norms > 0)
+
+
+def quantize_int8(embeddings: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Scalar-quantize embeddings to int8 with a symmetric scale per dimension
+
+    Returns:
+        int8 vectors and the float32 scale of each dimension
+    """
+    if embeddings.size == 0:
+        return embeddings.astype(np.int8), np.ones(embeddings.shape[-1], np.float32)
+    peaks = np.abs(embeddings).max(axis=0)
+    scales = np.where(peaks > 0, peaks / INT8_LEVELS, 1).astype(np.float32)
+    vectors = np.rint(embeddings / scales).clip(-INT8_LEVELS, INT8_LEVELS)
+    return vectors.astype(np.int8), scales
+
+
+def scales_path(path: str) -> str:
+    return f"{os.path.splitext(path)[0]}_scales.npy"
+
+
+def save_array(path: str, array: np.ndarray) -> None:
+    with open(f"{path}.tmp", "wb") as f:
+        np.save(f, array, allow_pickle=False)
+    os.replace(f"{path}.tmp", path)
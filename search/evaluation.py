@@ -1,9 +1,21 @@
+import os
+import tempfile
+import time
+
+import numpy as np
+
+from search.embedding_store import EMBEDDING_FORMATS, EmbeddingMatrix
 from search.hybrid_search import HybridSearch
 from search.search_utils import (
+    EMBEDDING_BATCH_SIZE,
     load_golden_dataset,
     load_movies,
 )
-from search.semantic_search import SemanticSearch
+from search.semantic_search import (
+    ChunkedSemanticSearch,
+    SemanticSearch,
+    movie_chunks,
+)
 
 
 def precision_at_k(
@@ -28,7 +40,7 @@ def recall_at_k(
     return relevant_count / len(relevant_docs)
 
 
-def evaluate_command(limit: int = 5) -> dict:
+def evaluate_command(limit: int = 5, enhance: str | None = None) -> dict:
     movies = load_movies()
     golden_data = load_golden_dataset()
     test_cases = golden_data["test_cases"]
@@ -38,10 +50,16 @@ def evaluate_command(limit: int = 5) -> dict:
     hybrid_search = HybridSearch(movies)
 
     total_precision = 0
+    total_recall = 0
+    enhance_seconds = 0.0
     results_by_query = {}
     for test_case in test_cases:
         query = test_case["query"]
         relevant_docs = set(test_case["relevant_docs"])
+        if enhance:
+            start = time.perf_counter()
+            query = hybrid_search.enhance_query(query, enhance)
+            enhance_seconds += time.perf_counter() - start
         search_results = hybrid_search.rrf_search(query, k=60, limit=limit)
         retrieved_docs = []
         for result in search_results:
@@ -54,18 +72,83 @@ def evaluate_command(limit: int = 5) -> dict:
 
         f1 = 2 * (precision * recall) / (precision + recall)
 
-        results_by_query[query] = {
+        results_by_query[test_case["query"]] = {
             "precision": precision,
             "recall": recall,
             "f1": f1,
             "retrieved": retrieved_docs[:limit],
             "relevant": list(relevant_docs),
+            "enhanced_query": query if enhance else None,
         }
 
         total_precision += precision
+        total_recall += recall
 
     return {
         "test_cases_count": len(test_cases),
         "limit": limit,
+        "enhance": enhance,
+        "mean_recall": total_recall / len(test_cases),
+        "enhance_ms": enhance_seconds / len(test_cases) * 1000,
         "results": results_by_query,
     }
+
+
+def embedding_formats_command(limit: int = 5) -> dict:
+    """Compare chunked semantic search over each embedding storage format
+
+    Every format is stored from the float32 chunk embeddings in a temporary
+    directory, leaving the saved ones untouched. A saved file that is
+    already float16 or int8 no longer holds them, so the chunks are encoded
+    again. Recall is measured against the golden dataset, and overlap is
+    the share of the float32 results each format returns.
+    """
+    movies = load_movies()
+    test_cases = load_golden_dataset()["test_cases"]
+    searcher = ChunkedSemanticSearch()
+    searcher.load_or_create_chunk_embeddings(movies)
+    saved = searcher.chunk_embeddings
+    if saved.embedding_format == "float32":
+        embeddings = saved.to_float32()
+    else:
+        chunks = [chunk for movie in movies for chunk in movie_chunks(movie)]
+        embeddings = searcher.model.encode(chunks, batch_size=EMBEDDING_BATCH_SIZE)
+
+    formats = {}
+    baseline = None
+    with tempfile.TemporaryDirectory() as directory:
+        for embedding_format in EMBEDDING_FORMATS:
+            path = os.path.join(directory, f"{embedding_format}.npy")
+            EmbeddingMatrix.from_embeddings(embeddings, embedding_format).save(path)
+            searcher.chunk_embeddings = EmbeddingMatrix.load(path)
+            searcher.result_cache.clear()
+            retrieved = [
+                [
+                    result["title"]
+                    for result in searcher.search_chunks(tc["query"], limit)
+                ]
+                for tc in test_cases
+            ]
+            baseline = baseline or retrieved
+            formats[embedding_format] = {
+                "bytes": os.path.getsize(path),
+                "mean_recall": float(
+                    np.mean(
+                        [
+                            recall_at_k(docs, set(tc["relevant_docs"]), limit)
+                            for docs, tc in zip(retrieved, test_cases)
+                        ]
+                    )
+                ),
+                "overlap": float(
+                    np.mean(
+                        [
+                            len(set(docs) & set(expected)) / max(len(expected), 1)
+                            for docs, expected in zip(retrieved, baseline)
+                        ]
+                    )
+                ),
+            }
+        searcher.chunk_embeddings = saved
+
+    return {"test_cases_count": len(test_cases), "limit": limit, "formats": formats}
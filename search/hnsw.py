@@ -0,0 +1,276 @@
+import heapq
+import math
+import os
+from collections.abc import Callable
+
+import numpy as np
+
+from search.search_utils import HNSW_EF_CONSTRUCTION, HNSW_EF_SEARCH, HNSW_M
+
+NO_NEIGHBOR = -1
+
+
+class HNSWIndex:
+    """Hierarchical navigable small world graph over unit-length embeddings
+
+    Every embedding is a node of layer 0, and each higher layer keeps an
+    exponentially smaller random subset of the one below. A search descends
+    greedily from the entry point on the top layer, then keeps the `ef` best
+    nodes found while walking layer 0, so it scores a few thousand
+    embeddings however many there are (Malkov & Yashunin, 2018).
+
+    Layer `l` is a table with one row of neighbour ordinals per node in
+    `nodes[l]`, padded with `NO_NEIGHBOR`; layer 0 holds every node in
+    ordinal order and has room for twice as many neighbours.
+    """
+
+    def __init__(
+        self,
+        levels: np.ndarray,
+        nodes: list[np.ndarray],
+        tables: list[np.ndarray],
+        entry_point: int,
+        m: int = HNSW_M,
+        ef_construction: int = HNSW_EF_CONSTRUCTION,
+    ) -> None:
+        self.levels = levels
+        self.nodes = nodes
+        self.tables = tables
+        self.entry_point = entry_point
+        self.m = m
+        self.ef_construction = ef_construction
+
+    @classmethod
+    def build(
+        cls,
+        vectors: np.ndarray,
+        m: int = HNSW_M,
+        ef_construction: int = HNSW_EF_CONSTRUCTION,
+        seed: int = 0,
+    ) -> "HNSWIndex":
+        """Insert unit-length float32 vectors one by one, in ordinal order
+
+        Args:
+            vectors: Normalized embeddings, one row per node
+            m: Neighbours kept per node on the upper layers, twice as many
+                on layer 0
+            ef_construction: Candidates considered when linking a new node
+            seed: Seed of the random node levels
+        """
+        rng = np.random.default_rng(seed)
+        level_scale = 1 / math.log(max(m, 2))
+        levels = np.floor(-np.log1p(-rng.random(len(vectors))) * level_scale)
+        levels = levels.astype(np.int32)
+        top = int(levels.max()) if len(levels) else 0
+        nodes = [np.flatnonzero(levels >= level) for level in range(top + 1)]
+        tables = [
+            np.full(
+                (len(level_nodes), 2 * m if level == 0 else m), NO_NEIGHBOR, np.int32
+            )
+            for level, level_nodes in enumerate(nodes)
+        ]
+        index = cls(levels, nodes, tables, 0, m, ef_construction)
+        index.__visited = np.zeros(len(vectors), dtype=bool)
+        for node in range(1, len(vectors)):
+            index.__insert(vectors, node)
+        del index.__visited
+        return index
+
+    @classmethod
+    def load(cls, path: str) -> "HNSWIndex":
+        with np.load(path) as data:
+            top = int(data["top"])
+            return cls(
+                data["levels"],
+                [data[f"nodes_{level}"] for level in range(top + 1)],
+                [data[f"table_{level}"] for level in range(top + 1)],
+                int(data["entry_point"]),
+                int(data["m"]),
+                int(data["ef_construction"]),
+            )
+
+    def save(self, path: str) -> None:
+        layers = {}
+        for level, (level_nodes, table) in enumerate(zip(self.nodes, self.tables)):
+            layers[f"nodes_{level}"] = level_nodes
+            layers[f"table_{level}"] = table
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(f"{path}.tmp", "wb") as f:
+            np.savez(
+                f,
+                levels=self.levels,
+                top=len(self.nodes) - 1,
+                entry_point=self.entry_point,
+                m=self.m,
+                ef_construction=self.ef_construction,
+                **layers,
+            )
+        os.replace(f"{path}.tmp", path)
+
+    def __len__(self) -> int:
+        return len(self.levels)
+
+    def search(
+        self,
+        scores: Callable[[np.ndarray], np.ndarray],
+        k: int,
+        ef: int = HNSW_EF_SEARCH,
+    ) -> list[tuple[int, float]]:
+        """Approximate the `k` nodes most similar to a query
+
+        Args:
+            scores: Similarity of the query with the nodes of an ordinal array
+            k: Number of nodes to return
+            ef: Candidates kept on layer 0, at least `k`; larger is slower
+                but finds more of the true nearest neighbours
+
+        Returns:
+            (ordinal, similarity) pairs, best first
+        """
+        if len(self) == 0 or k <= 0:
+            return []
+        found = self.__search_layers(scores, 0, max(ef, k))
+        found.sort(key=lambda pair: (-pair[0], pair[1]))
+        return [(node, score) for score, node in found[:k]]
+
+    def __search_layers(
+        self, scores: Callable[[np.ndarray], np.ndarray], bottom: int, ef: int
+    ) -> list[tuple[float, int]]:
+        visited = np.zeros(len(self), dtype=bool)
+        entry = [(float(scores(np.array([self.entry_point]))[0]), self.entry_point)]
+        for level in range(int(self.levels[self.entry_point]), bottom, -1):
+            entry = self.__search_layer(scores, entry, 1, level, visited)
+        return self.__search_layer(scores, entry, ef, bottom, visited)
+
+    def __search_layer(
+        self,
+        scores: Callable[[np.ndarray], np.ndarray],
+        entry: list[tuple[float, int]],
+        ef: int,
+        level: int,
+        visited: np.ndarray,
+    ) -> list[tuple[float, int]]:
+        """Best-first walk of one layer, keeping the `ef` best nodes found
+
+        `visited` is all False on entry and is reset before returning, so
+        one mask serves every layer without clearing all of it.
+        """
+        candidates = [(-score, node) for score, node in entry]
+        heapq.heapify(candidates)
+        found = list(entry)
+        heapq.heapify(found)
+        touched = [np.array([node for _, node in entry])]
+        visited[touched[0]] = True
+        while candidates:
+            negative_score, node = heapq.heappop(candidates)
+            if len(found) >= ef and -negative_score < found[0][0]:
+                break
+            neighbors = self.__neighbors(level, node)
+            neighbors = neighbors[~visited[neighbors]]
+            if not len(neighbors):
+                continue
+            visited[neighbors] = True
+            touched.append(neighbors)
+            neighbor_scores = scores(neighbors)
+            if len(found) >= ef:
+                # The worst score kept only rises, so weaker neighbours never enter.
+                better = neighbor_scores > found[0][0]
+                neighbors, neighbor_scores = neighbors[better], neighbor_scores[better]
+            for score, neighbor in zip(neighbor_scores.tolist(), neighbors.tolist()):
+                if len(found) < ef or score > found[0][0]:
+                    heapq.heappush(candidates, (-score, neighbor))
+                    heapq.heappush(found, (score, neighbor))
+                    if len(found) > ef:
+                        heapq.heappop(found)
+        visited[np.concatenate(touched)] = False
+        return found
+
+    def __row(self, level: int, node: int) -> int:
+        if level == 0:
+            return node
+        return int(np.searchsorted(self.nodes[level], node))
+
+    def __neighbors(self, level: int, node: int) -> np.ndarray:
+        neighbors = self.tables[level][self.__row(level, node)]
+        return neighbors[neighbors != NO_NEIGHBOR]
+
+    def __insert(self, vectors: np.ndarray, node: int) -> None:
+        def scores(ordinals: np.ndarray) -> np.ndarray:
+            return vectors[ordinals] @ vectors[node]
+
+        level = int(self.levels[node])
+        entry_level = int(self.levels[self.entry_point])
+        visited = self.__visited
+        entry = [(float(scores(np.array([self.entry_point]))[0]), self.entry_point)]
+        for current in range(entry_level, level, -1):
+            entry = self.__search_layer(scores, entry, 1, current, visited)
+
+        for current in range(min(level, entry_level), -1, -1):
+            entry = self.__search_layer(
+                scores, entry, self.ef_construction, current, visited
+            )
+            candidates = np.array([found for _, found in entry])
+            width = self.tables[current].shape[1]
+            neighbors = select_neighbors(
+                vectors, candidates, scores(candidates), self.m
+            )
+            self.tables[current][self.__row(current, node), : len(neighbors)] = (
+                neighbors
+            )
+            for neighbor in neighbors.tolist():
+                self.__link(vectors, current, neighbor, node, width)
+
+        if level > entry_level:
+            self.entry_point = node
+
+    def __link(
+        self, vectors: np.ndarray, level: int, node: int, neighbor: int, width: int
+    ) -> None:
+        row = self.tables[level][self.__row(level, node)]
+        free = np.flatnonzero(row == NO_NEIGHBOR)
+        if len(free):
+            row[free[0]] = neighbor
+            return
+        candidates = np.append(row, neighbor)
+        kept = select_neighbors(
+            vectors, candidates, vectors[candidates] @ vectors[node], width
+        )
+        row[:] = NO_NEIGHBOR
+        row[: len(kept)] = kept
+
+
+def select_neighbors(
+    vectors: np.ndarray, candidates: np.ndarray, scores: np.ndarray, m: int
+) -> np.ndarray:
+    """Pick up to `m` diverse neighbours among the candidates of a node
+
+    A candidate is kept when it is more similar to the node than to every
+    neighbour already kept, so links spread out in different directions
+    instead of all pointing into the nearest cluster. Remaining room is
+    filled with the best candidates that were passed over.
+
+    Args:
+        vectors: Normalized embeddings of every node
+        candidates: Ordinals of the candidate neighbours
+        scores: Similarity of each candidate with the node
+        m: Maximum number of neighbours
+    """
+    order = np.argsort(-scores, kind="stable")
+    candidates, scores = candidates[order], scores[order]
+    if len(candidates) <= m:
+        return candidates
+    pairwise = vectors[candidates] @ vectors[candidates].T
+    # Similarity of every candidate to its closest kept neighbour so far.
+    closest = np.full(len(candidates), -np.inf, dtype=pairwise.dtype)
+    kept = []
+    passed = []
+    for i, score in enumerate(scores.tolist()):
+        if score > closest[i]:
+            kept.append(i)
+            if len(kept) == m:
+                break
+            np.maximum(closest, pairwise[i], out=closest)
+        else:
+            passed.append(i)
+    kept += passed[: m - len(kept)]
+    return candidates[kept]
@@ -1,9 +1,10 @@
 import os
-from typing import Optional
+from collections.abc import Iterable, Iterator
 
+from search.batch import read_queries, search_batches
 from search.keyword_search import InvertedIndex
-from search.llm_query import enhance_query
 from search.reranking import rerank
+from search.result_cache import ResultCache, normalize_query
 from search.search_utils import (
     DEFAULT_ALPHA,
     DEFAULT_SEARCH_LIMIT,
@@ -16,21 +17,62 @@ from search.semantic_search import ChunkedSemanticSearch
 
 
 class HybridSearch:
-    def __init__(self, documents: list[dict]) -> None:
+    def __init__(
+        self,
+        documents: list[dict],
+        result_cache: ResultCache | None = None,
+        semantic_search: ChunkedSemanticSearch | None = None,
+        idx: InvertedIndex | None = None,
+    ) -> None:
+        """Load both engines, or share ones that are already loaded"""
         self.documents = documents
-        self.semantic_search = ChunkedSemanticSearch()
-        self.semantic_search.load_or_create_chunk_embeddings(documents)
-
-        self.idx = InvertedIndex()
-        if not os.path.exists(self.idx.index_path):
-            self.idx.build()
-            self.idx.save()
+        self.result_cache = result_cache if result_cache is not None else ResultCache()
+        if semantic_search is None:
+            semantic_search = ChunkedSemanticSearch()
+            semantic_search.load_or_create_chunk_embeddings(documents)
+        self.semantic_search = semantic_search
+
+        if idx is None:
+            idx = InvertedIndex()
+            if not os.path.exists(idx.segment_path):
+                idx.build()
+                idx.save()
+            idx.load()
+        self.idx = idx
 
     def _bm25_search(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> list[dict]:
-        self.idx.load()
         return self.idx.bm25_search(query, limit)
 
+    def enhance_query(self, query: str, method: str) -> str:
+        """Rewrite a query with a local or an LLM enhancement method"""
+        match method:
+            case "spell-local":
+                return self.idx.correct_spelling(query)
+            case "prf":
+                return self.idx.feedback_query(query)
+            case _:
+                # Imported here so that local searches never set up the
+                # Gemini client.
+                from search.llm_query import enhance_query
+
+                return enhance_query(query, method=method)
+
+    def _cache_key(self, method: str, query: str, *params) -> tuple:
+        # Fused results go stale whenever either engine is rebuilt, which
+        # bumps the generation of its own cache.
+        generations = (
+            self.idx.result_cache.generation,
+            self.semantic_search.result_cache.generation,
+        )
+        return (method, normalize_query(query), *params, generations)
+
     def weighted_search(self, query: str, alpha: float, limit: int = 5) -> list[dict]:
+        key = self._cache_key("weighted", query, alpha, limit)
+        return self.result_cache.get_or_compute(
+            key, lambda: self._weighted_search(query, alpha, limit)
+        )
+
+    def _weighted_search(self, query: str, alpha: float, limit: int) -> list[dict]:
         bm25_results = self._bm25_search(query, limit * 500)
         semantic_results = self.semantic_search.search_chunks(query, limit * 500)
 
@@ -38,12 +80,56 @@ class HybridSearch:
         return combined[:limit]
 
     def rrf_search(self, query: str, k: int, limit: int = 10) -> list[dict]:
+        key = self._cache_key("rrf", query, k, limit)
+        return self.result_cache.get_or_compute(
+            key, lambda: self._rrf_search(query, k, limit)
+        )
+
+    def _rrf_search(self, query: str, k: int, limit: int) -> list[dict]:
         bm25_results = self._bm25_search(query, limit * 500)
         semantic_results = self.semantic_search.search_chunks(query, limit * 500)
 
         fused = reciprocal_rank_fusion(bm25_results, semantic_results, k)
         return fused[:limit]
 
+    def weighted_search_batch(
+        self, queries: list[str], alpha: float, limit: int = 5
+    ) -> list[list[dict]]:
+        """`weighted_search` for many queries, with their embeddings batched"""
+        keys = [self._cache_key("weighted", query, alpha, limit) for query in queries]
+
+        def search_missing(positions: list[int]) -> list[list[dict]]:
+            bm25, semantic = self._search_batch([queries[i] for i in positions], limit)
+            return [
+                combine_search_results(bm25_results, semantic_results, alpha)[:limit]
+                for bm25_results, semantic_results in zip(bm25, semantic)
+            ]
+
+        return self.result_cache.get_or_compute_batch(keys, search_missing)
+
+    def rrf_search_batch(
+        self, queries: list[str], k: int, limit: int = 10
+    ) -> list[list[dict]]:
+        """`rrf_search` for many queries, with their embeddings batched"""
+        keys = [self._cache_key("rrf", query, k, limit) for query in queries]
+
+        def search_missing(positions: list[int]) -> list[list[dict]]:
+            bm25, semantic = self._search_batch([queries[i] for i in positions], limit)
+            return [
+                reciprocal_rank_fusion(bm25_results, semantic_results, k)[:limit]
+                for bm25_results, semantic_results in zip(bm25, semantic)
+            ]
+
+        return self.result_cache.get_or_compute_batch(keys, search_missing)
+
+    def _search_batch(
+        self, queries: list[str], limit: int
+    ) -> tuple[list[list[dict]], list[list[dict]]]:
+        return (
+            self.idx.bm25_search_batch(queries, limit * 500),
+            self.semantic_search.search_chunks_batch(queries, limit * 500),
+        )
+
 
 def normalize_scores(scores: list[float]) -> list[float]:
     if not scores:
@@ -181,10 +267,13 @@ def reciprocal_rank_fusion(
 
 
 def weighted_search_command(
-    query: str, alpha: float = DEFAULT_ALPHA, limit: int = DEFAULT_SEARCH_LIMIT
+    query: str,
+    alpha: float = DEFAULT_ALPHA,
+    limit: int = DEFAULT_SEARCH_LIMIT,
+    searcher: HybridSearch | None = None,
 ) -> dict:
-    movies = load_movies()
-    searcher = HybridSearch(movies)
+    if searcher is None:
+        searcher = HybridSearch(load_movies())
 
     original_query = query
 
@@ -202,17 +291,18 @@ def weighted_search_command(
 def rrf_search_command(
     query: str,
     k: int = RRF_K,
-    enhance: Optional[str] = None,
-    rerank_method: Optional[str] = None,
+    enhance: str | None = None,
+    rerank_method: str | None = None,
     limit: int = DEFAULT_SEARCH_LIMIT,
+    searcher: HybridSearch | None = None,
 ) -> dict:
-    movies = load_movies()
-    searcher = HybridSearch(movies)
+    if searcher is None:
+        searcher = HybridSearch(load_movies())
 
     original_query = query
     enhanced_query = None
     if enhance:
-        enhanced_query = enhance_query(query, method=enhance)
+        enhanced_query = searcher.enhance_query(query, enhance)
         query = enhanced_query
 
     search_limit = limit * SEARCH_MULTIPLIER if rerank_method else limit
@@ -233,3 +323,23 @@ def rrf_search_command(
         "reranked": reranked,
         "results": results,
     }
+
+
+def hybrid_batch_command(
+    lines: Iterable[str],
+    method: str = "rrf",
+    k: int = RRF_K,
+    alpha: float = DEFAULT_ALPHA,
+    limit: int = DEFAULT_SEARCH_LIMIT,
+    searcher: HybridSearch | None = None,
+) -> Iterator[dict]:
+    """Answer a JSON Lines stream of queries with RRF or weighted search"""
+    if searcher is None:
+        searcher = HybridSearch(load_movies())
+
+    def search(queries: list[str]) -> list[list[dict]]:
+        if method == "rrf":
+            return searcher.rrf_search_batch(queries, k, limit)
+        return searcher.weighted_search_batch(queries, alpha, limit)
+
+    return search_batches(read_queries(lines), search)
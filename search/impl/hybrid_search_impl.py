@@ -17,12 +17,12 @@ class HybridSearch:
         self.semantic_search.load_or_create_chunk_embeddings(documents)
 
         self.idx = InvertedIndex()
-        if not os.path.exists(self.idx.index_path):
+        if not os.path.exists(self.idx.segment_path):
             self.idx.build()
             self.idx.save()
+        self.idx.load()
 
     def _bm25_search(self, query, limit: int):
-        self.idx.load()
         return self.idx.bm25_search(query, limit)
 
     def weighted_search(self, query, alpha, limit=5) -> list[dict]:
@@ -2,11 +2,14 @@ import json
 import re
 import os
 
+from collections.abc import Iterator
 from pathlib import Path
 from typing import Any
 from google import genai
 from dotenv import load_dotenv
 
+from search.corpus import iter_documents
+
 load_dotenv()
 
 DEFAULT_SEARCH_LIMIT = 5
@@ -18,15 +21,24 @@ DOCUMENT_PREVIEW_LENGTH = 100
 PROJECT_ROOT = Path(__file__).parent.parent
 MOVIES_DATA_PATH = PROJECT_ROOT / "data" / "movies.json"
 EVAL_DATA_PATH = PROJECT_ROOT / "data" / "golden_dataset.json"
+STOP_WORDS_PATH = PROJECT_ROOT / "data" / "stopwords.txt"
 
 BM25_K1 = 1.5
 BM25_B = 0.7
+EMBEDDING_BATCH_SIZE = 256
+
+
+def iter_movies(data_path) -> Iterator[dict[int, str]]:
+    """
+    Streams movies one at a time from a JSON file with a "movies" array or a JSON Lines file.
+    :param data_path: Path to the movies file
+    :return: Iterator over the movies in file order
+    """
+    return iter_documents(data_path, "movies")
 
 
 def load_movies(data_path) -> list[dict[int, str]]:
-    with open(data_path, "r") as f:
-        data = json.load(f)
-    return data["movies"]
+    return list(iter_movies(data_path))
 
 def load_golden_dataset(data_path) -> list[dict[int, str]]:
     with open(data_path, "r") as f:
@@ -35,8 +47,7 @@ def load_golden_dataset(data_path) -> list[dict[int, str]]:
 
 
 def load_stop_words() -> list:
-    data_path = PROJECT_ROOT / "data" / "stopwords.txt"
-    with open(data_path, "r") as f:
+    with open(STOP_WORDS_PATH, "r") as f:
         data = f.read().splitlines()
 
     return data
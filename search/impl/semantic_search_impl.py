@@ -1,3 +1,5 @@
+from collections.abc import Iterable
+from itertools import batched
 from typing import Any
 
 import numpy as np
@@ -5,13 +7,17 @@ from numpy import ndarray, dtype
 
 from sentence_transformers import SentenceTransformer
 
-from search.impl.search_utils_impl import PROJECT_ROOT, MOVIES_DATA_PATH, load_movies, _semantic_chunk_text
+from search.bm25 import top_k
+from search.embedding_store import normalize_embeddings
+from search.impl.search_utils_impl import PROJECT_ROOT, MOVIES_DATA_PATH, _semantic_chunk_text, \
+    EMBEDDING_BATCH_SIZE, iter_movies
 
 
 class SemanticSearch:
     def __init__(self, model_name: str):
         self.model = SentenceTransformer(model_name)
         self.embeddings = None
+        self.normalized_embeddings = None
         self.documents = None
         self.document_map = {}
 
@@ -22,51 +28,58 @@ class SemanticSearch:
 
         query_embedding = self.generate_embedding(query)
 
-        results = []
+        # One product over unit-length rows instead of a cosine per movie
+        similarities = self.normalized_embeddings @ normalize_embeddings(query_embedding)
 
-        for idx, embedding in enumerate(self.embeddings):
-            similarity = cosine_similarity(query_embedding, embedding)
-            results.append(
-                (similarity, self.documents[idx])
-            )
+        return [
+            (similarity, self.documents[idx])
+            for idx, similarity in top_k(np.arange(len(similarities)), similarities, limit)
+        ]
 
-        results.sort(key=lambda x: x[0], reverse=True)
-
-        return results[: limit]
-
-    def build_embeddings(self, documents: list[dict]) -> ndarray[tuple[Any, ...], dtype[Any]]:
-        self.documents = documents
-
-        movies = []
-        for document in documents:
-            doc_id = document["id"]
-            doc_description = document["description"]
-            doc_title = document["title"]
-            self.document_map[doc_id] = {
-                "title": doc_title,
-                "description": doc_description
-            }
-
-            movie = f"{document['title']}: {document['description']}"
-            movies.append(movie)
+    def build_embeddings(self, documents: Iterable[dict]) -> ndarray[tuple[Any, ...], dtype[Any]]:
+        """
+        Encodes the documents in batches of EMBEDDING_BATCH_SIZE as they are streamed in.
+        :param documents: Movies, e.g. from iter_movies
+        :return: The movie embeddings
+        """
+        self.documents = []
+
+        batch_embeddings = []
+        for batch in batched(documents, EMBEDDING_BATCH_SIZE):
+            movies = []
+            for document in batch:
+                doc_id = document["id"]
+                doc_description = document["description"]
+                doc_title = document["title"]
+                self.documents.append(document)
+                self.document_map[doc_id] = {
+                    "title": doc_title,
+                    "description": doc_description
+                }
+
+                movie = f"{document['title']}: {document['description']}"
+                movies.append(movie)
+
+            batch_embeddings.append(self.model.encode(movies))
 
         movies_embeddings_file = PROJECT_ROOT / "cache" / "movie_embeddings.npy"
 
-        movies_embeddings = self.model.encode(movies)
+        movies_embeddings = np.concatenate(batch_embeddings)
         np.save(movies_embeddings_file, movies_embeddings)
 
         self.embeddings = movies_embeddings
+        self.normalized_embeddings = normalize_embeddings(movies_embeddings)
 
         return self.embeddings
 
 
-    def load_or_create_embeddings(self, documents: list[dict]) -> ndarray[tuple[Any, ...], dtype[Any]] | None | Any:
-        self.documents = documents
-
+    def load_or_create_embeddings(self, documents: Iterable[dict]) -> ndarray[tuple[Any, ...], dtype[Any]] | None | Any:
         movie_embeddings_file = PROJECT_ROOT / "cache" / "movie_embeddings.npy"
 
         if movie_embeddings_file.is_file():
+            self.documents = list(documents)
             self.embeddings = np.load(movie_embeddings_file)
+            self.normalized_embeddings = normalize_embeddings(self.embeddings)
             if len(self.embeddings) == len(self.documents):
                 return self.embeddings
         else:
@@ -118,11 +131,11 @@ def embedd_text(text):
 def verify_embeddings():
     semantic_search = SemanticSearch('all-MiniLM-L6-v2')
 
-    movies = load_movies(MOVIES_DATA_PATH)
+    movies = iter_movies(MOVIES_DATA_PATH)
 
     semantic_search.load_or_create_embeddings(movies)
 
-    print(f"Number of docs:   {len(movies)}")
+    print(f"Number of docs:   {len(semantic_search.documents)}")
     print(f"Embeddings shape: {semantic_search.embeddings.shape[0]} vectors in "
           f"{semantic_search.embeddings.shape[1]} dimensions")
 
@@ -139,7 +152,7 @@ def embed_query_text(query):
 def search_query(query: str, limit: int) -> None:
     semantic_search = SemanticSearch('all-MiniLM-L6-v2')
 
-    movies = load_movies(MOVIES_DATA_PATH)
+    movies = iter_movies(MOVIES_DATA_PATH)
 
     semantic_search.load_or_create_embeddings(movies)
 
@@ -1,71 +1,81 @@
-import pickle
 import math
-from collections import defaultdict, Counter
 
+import numpy as np
 
+from search.bm25 import SCORING_MODES, ArrayImpactBlocks, accumulate_impacts, average_doc_length, \
+    block_max_impacts, bm25_idf, bm25_tf, compute_impacts, dynamic_pruning_top_k, pad_with_unmatched, \
+    quantize_impacts, top_k
+from search.postings import DOC_ID_DTYPE, TF_DTYPE, PostingsBuilder, find_ordinal, term_frequency
+from search.segment import Segment, write_segment
 from search.text_processor import process_text
-from search.impl.search_utils_impl import PROJECT_ROOT, BM25_K1, BM25_B, load_movies, DEFAULT_SEARCH_LIMIT, \
+from search.impl.search_utils_impl import PROJECT_ROOT, BM25_K1, BM25_B, iter_movies, DEFAULT_SEARCH_LIMIT, \
     SCORE_PRECISION, MOVIES_DATA_PATH
 
 
 class InvertedIndex:
     def __init__(self):
-        self.index = defaultdict(set)
+        self.index: dict[str, tuple[np.ndarray, np.ndarray]] = {}
         self.docmap: dict[int, dict] = {}
-        self.term_frequencies: dict[int, Counter] = defaultdict(Counter)
-        self.doc_lengths: dict[int, int] = {}
-        self.index_path = PROJECT_ROOT / "cache" / "index.pkl"
-        self.docmap_path = PROJECT_ROOT / "cache" / "docmap.pkl"
-        self.term_frequencies_path = PROJECT_ROOT / "cache" / "term_frequencies.pkl"
-        self.doc_lengths_path = PROJECT_ROOT / "cache" / "doc_lengths.pkl"
-
-    def build(self):
-        movies = load_movies(MOVIES_DATA_PATH)
+        self.doc_ids: np.ndarray = np.empty(0, dtype=DOC_ID_DTYPE)
+        self.doc_lengths: np.ndarray = np.empty(0, dtype=TF_DTYPE)
+        self.segment_path = PROJECT_ROOT / "cache" / "index"
+        self.avg_doc_length: float = 0.0
+        self.term_idf: dict[str, float] = {}
+        self.impacts: dict[str, np.ndarray] = {}
+        self.block_max_impacts: dict[str, np.ndarray] = {}
+        self.impact_scale: float | None = None
+
+    def build(self, quantize: bool = False):
+        movies = iter_movies(MOVIES_DATA_PATH)
+        builder = PostingsBuilder()
         for movie in movies:
             doc_id = movie["id"]
             doc_description = f"{movie['title']} {movie['description']}"
             self.docmap[doc_id] = movie
-            self.__add_document(doc_id, doc_description)
+            builder.add_document(doc_id, process_text(doc_description))
+
+        self.index, self.doc_ids, self.doc_lengths, *_ = builder.build()
+        self.__compute_bm25_stats(quantize)
 
     def save(self):
-        with open(self.index_path, "wb") as i:
-            pickle.dump(self.index, i)
-        with open(self.docmap_path, "wb") as d:
-            pickle.dump(self.docmap, d)
-        with open(self.term_frequencies_path, "wb") as tf:
-            pickle.dump(self.term_frequencies, tf)
-        with open(self.doc_lengths_path, "wb") as dlp:
-            pickle.dump(self.doc_lengths, dlp)
+        write_segment(str(self.segment_path), self.index, self.doc_ids, self.doc_lengths, self.docmap, self.term_idf,
+                      self.impacts, self.block_max_impacts, self.avg_doc_length, self.impact_scale)
 
     def load(self) -> None:
         try:
-            with open(self.index_path, "rb") as f:
-                self.index = pickle.load(f)
-            with open(self.docmap_path, "rb") as f:
-                self.docmap = pickle.load(f)
-            with open(self.term_frequencies_path, "rb") as tf:
-                self.term_frequencies = pickle.load(tf)
-            with open(self.doc_lengths_path, "rb") as dlp:
-                self.doc_lengths = pickle.load(dlp)
-
+            segment = Segment(str(self.segment_path))
         except FileNotFoundError as e:
             print(e)
             raise FileNotFoundError("Index File des not exists")
 
+        self.index = segment.index
+        self.docmap = segment.docmap
+        self.doc_ids = segment.doc_ids
+        self.doc_lengths = segment.doc_lengths
+        self.avg_doc_length = segment.avg_doc_length
+        self.term_idf = segment.term_idf
+        self.impacts = segment.impacts
+        self.block_max_impacts = segment.block_max_impacts
+        self.impact_scale = segment.impact_scale
+
     def get_documents(self, query) -> list:
-        doc_ids = self.index.get(query, set())
-        return sorted(list(doc_ids))
+        postings = self.index.get(query)
+        if postings is None:
+            return []
+
+        return self.doc_ids[postings[0]].tolist()
 
     def get_tf(self, doc_id: int, term: str) -> int:
         token = self._tokenize_term(term)
 
-        return self.term_frequencies[doc_id].get(token, 0)
+        return term_frequency(self.index.get(token), find_ordinal(self.doc_ids, doc_id))
 
     def get_idf(self, term: str) -> float:
         token = self._tokenize_term(term)
 
         doc_count = len(self.docmap)
-        term_doc_count = len(self.index.get(token, []))
+        postings = self.index.get(token)
+        term_doc_count = len(postings[0]) if postings is not None else 0
 
         return math.log((doc_count + 1) / (term_doc_count + 1))
 
@@ -79,24 +89,19 @@ class InvertedIndex:
     def get_bm25_idf(self, term: str) -> float:
         token = self._tokenize_term(term)
 
-        doc_count = len(self.docmap)
-        term_doc_count = len(self.index.get(token, []))
+        if token in self.term_idf:
+            return self.term_idf[token]
 
-        return math.log((doc_count - term_doc_count + 0.5) / (term_doc_count + 0.5) + 1)
+        return bm25_idf(len(self.docmap), 0)
 
     def get_bm25_tf(self, doc_id, term, k1=BM25_K1, b=BM25_B) -> float:
 
         tf = self.get_tf(doc_id, term)
 
-        doc_length = self.doc_lengths.get(doc_id, 0)
-        avg_doc_length = self.__get_avg_doc_length()
-
-        if avg_doc_length > 0:
-            length_norm = 1 - b + b * (doc_length / avg_doc_length)
-        else:
-            length_norm = 1
+        ordinal = find_ordinal(self.doc_ids, doc_id)
+        doc_length = int(self.doc_lengths[ordinal]) if ordinal is not None else 0
 
-        return (tf * (k1 + 1)) / (tf + k1 * length_norm)
+        return bm25_tf(tf, doc_length, self.avg_doc_length, k1, b)
 
     def bm25(self, doc_id: int, term: str) -> float:
         tf_component = self.get_bm25_tf(doc_id, term)
@@ -104,20 +109,27 @@ class InvertedIndex:
         return tf_component * idf_component
 
 
-    def bm25_search(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> list[dict]:
+    def bm25_search(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT, mode: str = "exhaustive") -> list[dict]:
         query_tokens = process_text(query)
+        blocks = {token: ArrayImpactBlocks(self.index[token][0], self.impacts[token])
+                  for token in set(query_tokens) if token in self.index}
+
+        if mode == "exhaustive":
+            postings = {token: b.decode() for token, b in blocks.items()}
+            ordinals, scores = accumulate_impacts(postings, query_tokens, len(self.doc_ids), self.impact_scale)
+            ranked = top_k(ordinals, scores, limit)
+        elif mode in ("wand", "bmw"):
+            ranked = dynamic_pruning_top_k(blocks, self.block_max_impacts, query_tokens, limit,
+                                           self.impact_scale, use_block_max=mode == "bmw")
+        else:
+            raise ValueError(f"mode must be one of {', '.join(SCORING_MODES)}")
 
-        scores = {}
-        for doc_id in self.docmap:
-            score = 0.0
-            for token in query_tokens:
-                score += self.bm25(doc_id, token)
-            scores[doc_id] = score
+        ranked = [(int(self.doc_ids[ordinal]), score) for ordinal, score in ranked]
 
-        sorted_docs = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+        ranked = pad_with_unmatched(ranked, self.docmap, limit)
 
         results = []
-        for doc_id, score in sorted_docs[:limit]:
+        for doc_id, score in ranked:
             doc = self.docmap[doc_id]
             formatted_result = {
                 "id": doc["id"],
@@ -139,18 +151,11 @@ class InvertedIndex:
 
         return token
 
-    def __add_document(self, doc_id: int, doc_description: str) -> None:
-        tokens: list = process_text(doc_description)
-        for token in set(tokens):
-            self.index[token].add(doc_id)
-
-        self.doc_lengths[doc_id] = len(tokens)
-        self.term_frequencies[doc_id].update(tokens)
-
-    def __get_avg_doc_length(self) -> float:
-        if not self.doc_lengths or len(self.doc_lengths) == 0:
-            return 0.0
-        total_length = 0
-        for length in self.doc_lengths.values():
-            total_length += length
-        return total_length / len(self.doc_lengths)
+    def __compute_bm25_stats(self, quantize: bool = False) -> None:
+        self.avg_doc_length = average_doc_length(self.doc_lengths)
+        self.term_idf, self.impacts = compute_impacts(self.index, self.doc_lengths, self.avg_doc_length,
+                                                      BM25_K1, BM25_B)
+        self.impact_scale = None
+        if quantize:
+            self.impacts, self.impact_scale = quantize_impacts(self.impacts)
+        self.block_max_impacts = block_max_impacts(self.impacts)
@@ -1,79 +1,501 @@
+import itertools
 import math
 import os
 import pickle
 import string
-from collections import Counter, defaultdict
+import threading
+import time
+from collections import Counter, deque
+from collections.abc import Callable, Iterable, Iterator, Mapping, Sequence
+from concurrent.futures import ProcessPoolExecutor
 
-from nltk.stem import PorterStemmer
+import numpy as np
 
+from search.batch import read_queries, search_batches
+from search.bm25 import (
+    SCORING_MODES,
+    ArrayImpactBlocks,
+    CompressedImpactBlocks,
+    ImpactMatrix,
+    accumulate_impacts,
+    average_doc_length,
+    average_field_lengths,
+    block_max_impacts,
+    bm25_idf,
+    bm25_tf,
+    bm25f_impacts,
+    compute_impacts,
+    dynamic_pruning_top_k,
+    field_length_norms,
+    keep_matches,
+    length_norms,
+    pad_with_unmatched,
+    posting_impacts,
+    quantize_impacts,
+    top_k,
+)
+from search.boolean_query import (
+    QueryNode,
+    evaluate_query,
+    parse_boolean_query,
+    positive_terms,
+)
+from search.phrases import PHRASE_PATTERN, match_phrases, parse_phrases
+from search.postings import (
+    DOC_ID_DTYPE,
+    INDEX_FORMATS,
+    ORDINAL_DTYPE,
+    TF_DTYPE,
+    CompressedPostings,
+    PostingsBuilder,
+    decompress_index,
+    find_ordinal,
+    merge_postings,
+    term_frequency,
+)
+from search.result_cache import ResultCache
 from search.search_utils import (
     BM25_B,
     BM25_K1,
     CACHE_DIR,
+    DEFAULT_FIELD_WEIGHTS,
     DEFAULT_SEARCH_LIMIT,
+    FEEDBACK_DOCS,
+    FEEDBACK_ORIGINAL_WEIGHT,
+    FEEDBACK_TERMS,
+    INDEX_BATCH_SIZE,
+    INDEX_FIELDS,
     format_search_result,
-    load_movies,
-    load_stopwords,
+    get_analyzer,
+    iter_movies,
+    load_golden_dataset,
+)
+from search.segment import (
+    SEGMENT_PREFIX,
+    SEGMENTS_MANIFEST,
+    LiveDocumentMap,
+    Segment,
+    TermMapping,
+    build_segment,
+    merge_segments,
+    open_segments,
+    read_manifest,
+    remove_unreferenced,
+    select_merge,
+    write_deletes,
+    write_manifest,
+    write_segment,
+)
+from search.spelling import SpellingIndex
+from search.wildcard import (
+    MAX_EXPANSIONS,
+    expand_pattern,
+    normalize_pattern,
+    parse_wildcards,
 )
 
 
 class InvertedIndex:
-    def __init__(self) -> None:
-        self.index = defaultdict(set)
+    def __init__(
+        self, cache_dir: str = CACHE_DIR, result_cache: ResultCache | None = None
+    ) -> None:
+        self.index: dict[str, tuple[np.ndarray, np.ndarray] | CompressedPostings] = {}
+        self.index_format = "arrays"
         self.docmap: dict[int, dict] = {}
-        self.index_path = os.path.join(CACHE_DIR, "index.pkl")
-        self.docmap_path = os.path.join(CACHE_DIR, "docmap.pkl")
-        self.tf_path = os.path.join(CACHE_DIR, "term_frequencies.pkl")
-        self.doc_lengths_path = os.path.join(CACHE_DIR, "doc_lengths.pkl")
-        self.term_frequencies = defaultdict(Counter)
-        self.doc_lengths = {}
-
-    def build(self) -> None:
-        movies = load_movies()
+        self.segment_path = os.path.join(cache_dir, "index")
+        self.index_path = os.path.join(cache_dir, "index.pkl")
+        self.docmap_path = os.path.join(cache_dir, "docmap.pkl")
+        self.term_frequencies_path = os.path.join(cache_dir, "term_frequencies.pkl")
+        self.doc_lengths_path = os.path.join(cache_dir, "doc_lengths.pkl")
+        self.bm25_stats_path = os.path.join(cache_dir, "bm25_stats.pkl")
+        self.doc_ids = np.empty(0, dtype=DOC_ID_DTYPE)
+        self.doc_lengths = np.empty(0, dtype=TF_DTYPE)
+        self.avg_doc_length = 0.0
+        self.term_idf: dict[str, float] = {}
+        self.impacts: dict[str, np.ndarray] = {}
+        self.block_max_impacts: dict[str, np.ndarray] = {}
+        self.impact_scale: float | None = None
+        self.length_norms = np.empty(0)
+        self.matrix: ImpactMatrix | None = None
+        self.sorted_terms: list[str] | None = None
+        self.spelling: SpellingIndex | None = None
+        self.result_cache = result_cache if result_cache is not None else ResultCache()
+        self.positions: Mapping[str, np.ndarray] | None = None
+        self.fields: tuple[str, ...] = ()
+        self.field_frequencies: Mapping[str, np.ndarray] | None = None
+        self.field_lengths = np.empty((0, 0), dtype=TF_DTYPE)
+        self.avg_field_lengths = np.empty(0)
+        self.field_norms: np.ndarray | None = None
+        self.segments: list[Segment] = []
+        self.segmented = False
+        self.pending_documents: dict[int, dict] = {}
+        self.pending_deletes: set[int] = set()
+        self.lock = threading.Lock()
+        self.merging: set[str] = set()
+        self.reserved: set[str] = set()
+
+    def build(
+        self,
+        quantize: bool = False,
+        workers: int = 1,
+        positions: bool = False,
+        fields: bool = False,
+    ) -> None:
+        self.docmap = {}
+        (
+            self.index,
+            self.doc_ids,
+            self.doc_lengths,
+            term_positions,
+            field_frequencies,
+            field_lengths,
+        ) = build_postings(
+            self.__record_documents(iter_movies()), workers, positions, fields
+        )
+        self.positions = term_positions if positions else None
+        self.__set_fields(
+            INDEX_FIELDS if fields else (), field_frequencies, field_lengths
+        )
+        self.index_format = "arrays"
+        self.segments = []
+        self.segmented = False
+        self.__compute_bm25_stats(quantize)
+
+    def __set_fields(
+        self,
+        fields: tuple[str, ...],
+        field_frequencies: Mapping[str, np.ndarray] | None,
+        field_lengths: np.ndarray | None,
+    ) -> None:
+        self.fields = fields
+        self.field_frequencies = field_frequencies if fields else None
+        if not fields:
+            field_lengths = np.empty((len(self.doc_ids), 0), dtype=TF_DTYPE)
+        self.field_lengths = field_lengths
+        self.avg_field_lengths = average_field_lengths(field_lengths)
+        self.field_norms = None
+
+    def __record_documents(self, movies: Iterable[dict]) -> Iterator[dict]:
         for m in movies:
-            doc_id = m["id"]
-            doc_description = f"{m['title']} {m['description']}"
-            self.docmap[doc_id] = m
-            self.__add_document(doc_id, doc_description)
-
-    def save(self) -> None:
-        os.makedirs(CACHE_DIR, exist_ok=True)
-        with open(self.index_path, "wb") as f:
-            pickle.dump(self.index, f)
-        with open(self.docmap_path, "wb") as f:
-            pickle.dump(self.docmap, f)
-        with open(self.tf_path, "wb") as f:
-            pickle.dump(self.term_frequencies, f)
-        with open(self.doc_lengths_path, "wb") as f:
-            pickle.dump(self.doc_lengths, f)
+            self.docmap[m["id"]] = m
+            yield m
+
+    def save(self, index_format: str = "arrays") -> None:
+        """Write the index as a memory-mappable segment in the cache directory"""
+        if index_format not in INDEX_FORMATS:
+            raise ValueError(f"index_format must be one of {', '.join(INDEX_FORMATS)}")
+        if self.segmented:
+            self.merge(everything=True)
+        if self.index_format == "compressed":
+            self.index = decompress_index(self.index)
+            self.index_format = "arrays"
+            if index_format == "arrays":
+                self.__compute_bm25_stats(quantize=self.impact_scale is not None)
+
+        os.makedirs(self.segment_path, exist_ok=True)
+        with self.lock:
+            manifest = self.__read_manifest()
+            name = self.__new_segment_name(manifest)
+            write_segment(
+                os.path.join(self.segment_path, name),
+                self.index,
+                self.doc_ids,
+                self.doc_lengths,
+                self.docmap,
+                self.term_idf,
+                self.impacts,
+                self.block_max_impacts,
+                self.avg_doc_length,
+                self.impact_scale,
+                index_format,
+                self.positions,
+                self.fields,
+                self.field_frequencies,
+                self.field_lengths,
+            )
+            manifest["segments"] = [{"name": name, "deletes": None}]
+            self.__write_manifest(manifest)
 
     def load(self) -> None:
+        """Open the saved segments, memory-mapping their postings and documents"""
+        self.matrix = None
+        self.sorted_terms = None
+        self.spelling = None
+        self.result_cache.clear()
+        self.segments = open_segments(
+            self.segment_path, read_manifest(self.segment_path)
+        )
+        self.segmented = len(self.segments) != 1 or self.segments[0].live is not None
+        if self.segmented:
+            self.__load_segmented()
+            return
+
+        segment = self.segments[0]
+        self.index = segment.index
+        self.index_format = segment.index_format
+        self.docmap = segment.docmap
+        self.doc_ids = segment.doc_ids
+        self.doc_lengths = segment.doc_lengths
+        self.avg_doc_length = segment.avg_doc_length
+        self.term_idf = segment.term_idf
+        self.impacts = segment.impacts
+        self.block_max_impacts = segment.block_max_impacts
+        self.impact_scale = segment.impact_scale
+        self.positions = segment.positions
+        self.__set_fields(
+            segment.fields, segment.field_frequencies, segment.field_lengths
+        )
+        if self.index_format == "compressed":
+            self.length_norms = length_norms(self.doc_lengths, self.avg_doc_length)
+
+    def add_document(self, movie: dict) -> None:
+        """Queue a document for the next commit, replacing any with the same ID"""
+        self.pending_documents[movie["id"]] = movie
+        self.pending_deletes.add(movie["id"])
+
+    def delete_document(self, doc_id: int) -> None:
+        """Queue the deletion of a document for the next commit"""
+        self.pending_documents.pop(doc_id, None)
+        self.pending_deletes.add(doc_id)
+
+    def commit(self, merge: bool = True) -> threading.Thread | None:
+        """Write queued changes as a new segment, masking old documents"""
+        with self.lock:
+            manifest = self.__read_manifest()
+            segments = open_segments(self.segment_path, manifest)
+            generation = manifest["generation"] + 1
+            for entry, segment in zip(manifest["segments"], segments):
+                ordinals = [
+                    segment.live_ordinal(doc_id) for doc_id in self.pending_deletes
+                ]
+                ordinals = [ordinal for ordinal in ordinals if ordinal is not None]
+                if not ordinals:
+                    continue
+                live = segment.live.copy() if segment.live is not None else None
+                if live is None:
+                    live = np.ones(len(segment.doc_ids), dtype=bool)
+                live[ordinals] = False
+                entry["deletes"] = f"{entry['name']}_deletes_{generation}.npy"
+                write_deletes(os.path.join(self.segment_path, entry["deletes"]), live)
+
+            if self.pending_documents:
+                positional = bool(segments) and all(
+                    s.positions is not None for s in segments
+                )
+                fielded = bool(segments) and all(s.fields for s in segments)
+                index, doc_ids, doc_lengths, positions, field_frequencies, lengths = (
+                    build_postings(
+                        list(self.pending_documents.values()),
+                        positions=positional,
+                        fields=fielded,
+                    )
+                )
+                name = self.__new_segment_name(manifest)
+                build_segment(
+                    os.path.join(self.segment_path, name),
+                    index,
+                    doc_ids,
+                    doc_lengths,
+                    self.pending_documents,
+                    quantize=any(s.impact_scale is not None for s in segments),
+                    positions=positions if positional else None,
+                    fields=INDEX_FIELDS if fielded else (),
+                    field_frequencies=field_frequencies,
+                    field_lengths=lengths,
+                )
+                manifest["segments"].append({"name": name, "deletes": None})
+
+            self.__write_manifest(manifest)
+            self.pending_documents = {}
+            self.pending_deletes = set()
+
+        self.load()
+        if merge:
+            return self.merge(background=True)
+        return None
+
+    def merge(
+        self, background: bool = False, everything: bool = False
+    ) -> threading.Thread | None:
+        """Compact the segments chosen by the merge policy, or all, into one"""
+        with self.lock:
+            manifest = self.__read_manifest()
+            segments = open_segments(self.segment_path, manifest)
+            positions = [
+                position
+                for position in (
+                    range(len(segments)) if everything else select_merge(segments)
+                )
+                if manifest["segments"][position]["name"] not in self.merging
+            ]
+            if not positions or (
+                len(positions) == 1 and segments[positions[0]].live is None
+            ):
+                return None
+            sources = [manifest["segments"][position] for position in positions]
+            name = self.__new_segment_name(manifest)
+            self.__write_manifest(manifest)
+            self.reserved.add(name)
+            self.merging.update(entry["name"] for entry in sources)
+
+        source_segments = [segments[position] for position in positions]
+        if background:
+            thread = threading.Thread(
+                target=self.__merge, args=(sources, source_segments, name)
+            )
+            thread.start()
+            return thread
+        self.__merge(sources, source_segments, name)
+        self.load()
+        return None
+
+    def __merge(
+        self, sources: list[dict], source_segments: list[Segment], name: str
+    ) -> None:
+        try:
+            merge_segments(source_segments, os.path.join(self.segment_path, name))
+            with self.lock:
+                manifest = self.__read_manifest()
+                merged = Segment(os.path.join(self.segment_path, name))
+                # Deletions committed while the merge ran are carried over.
+                live = np.ones(len(merged.doc_ids), dtype=bool)
+                current = {entry["name"]: entry for entry in manifest["segments"]}
+                for source, segment in zip(sources, source_segments):
+                    entry = current[source["name"]]
+                    if entry["deletes"] == source["deletes"]:
+                        continue
+                    latest = Segment(
+                        segment.directory,
+                        os.path.join(self.segment_path, entry["deletes"]),
+                    )
+                    was_live = segment.live if segment.live is not None else True
+                    for doc_id in segment.doc_ids[was_live & ~latest.live].tolist():
+                        live[find_ordinal(merged.doc_ids, doc_id)] = False
+
+                deletes = None
+                if not live.all():
+                    deletes = f"{name}_deletes_{manifest['generation'] + 1}.npy"
+                    write_deletes(os.path.join(self.segment_path, deletes), live)
+                source_names = {source["name"] for source in sources}
+                position = next(
+                    i
+                    for i, entry in enumerate(manifest["segments"])
+                    if entry["name"] in source_names
+                )
+                remaining = [
+                    entry
+                    for entry in manifest["segments"]
+                    if entry["name"] not in source_names
+                ]
+                remaining.insert(position, {"name": name, "deletes": deletes})
+                manifest["segments"] = remaining
+                self.__write_manifest(manifest)
+        finally:
+            with self.lock:
+                self.reserved.discard(name)
+                self.merging.difference_update(source["name"] for source in sources)
+
+    def __read_manifest(self) -> dict:
+        if not os.path.exists(os.path.join(self.segment_path, SEGMENTS_MANIFEST)):
+            return {"generation": 0, "next_segment": 0, "segments": []}
+        return read_manifest(self.segment_path)
+
+    def __write_manifest(self, manifest: dict) -> None:
+        manifest["generation"] += 1
+        write_manifest(self.segment_path, manifest)
+        remove_unreferenced(self.segment_path, manifest, self.reserved)
+
+    def __new_segment_name(self, manifest: dict) -> str:
+        manifest["next_segment"] += 1
+        return f"{SEGMENT_PREFIX}{manifest['next_segment']}"
+
+    def __load_segmented(self) -> None:
+        # Impacts stored in each segment were computed from that segment's
+        # own statistics, so searches over several segments recompute them
+        # from term frequencies and the statistics of all live documents.
+        self.index = {}
+        self.index_format = "arrays"
+        self.positions = None
+        self.docmap = LiveDocumentMap(self.segments)
+        fields = self.segments[0].fields if self.segments else ()
+        if any(s.fields != fields for s in self.segments):
+            fields = ()
+        self.doc_ids = np.empty(0, dtype=DOC_ID_DTYPE)
+        self.doc_lengths = np.empty(0, dtype=TF_DTYPE)
+        self.term_idf = {}
+        self.impacts = {}
+        self.block_max_impacts = {}
+        self.impact_scale = None
+        live_lengths = [
+            s.doc_lengths[s.live] if s.live is not None else s.doc_lengths
+            for s in self.segments
+        ]
+        self.avg_doc_length = average_doc_length(
+            np.concatenate(live_lengths) if live_lengths else self.doc_lengths
+        )
+        self.__set_fields((), None, None)
+        if fields:
+            self.fields = fields
+            self.avg_field_lengths = average_field_lengths(
+                np.concatenate(
+                    [
+                        s.field_lengths[s.live]
+                        if s.live is not None
+                        else s.field_lengths
+                        for s in self.segments
+                    ]
+                )
+            )
+
+    def load_pickles(self) -> str:
+        """Read an index pickled by earlier versions, returning its format"""
+        self.positions = None
         with open(self.index_path, "rb") as f:
-            self.index = pickle.load(f)
+            index = pickle.load(f)
         with open(self.docmap_path, "rb") as f:
             self.docmap = pickle.load(f)
-        with open(self.tf_path, "rb") as f:
-            self.term_frequencies = pickle.load(f)
-        with open(self.doc_lengths_path, "rb") as f:
-            self.doc_lengths = pickle.load(f)
+        stats = {}
+        if os.path.exists(self.bm25_stats_path):
+            with open(self.bm25_stats_path, "rb") as f:
+                stats = pickle.load(f)
 
-    def get_documents(self, term: str) -> list[int]:
-        doc_ids = self.index.get(term, set())
-        return sorted(list(doc_ids))
+        if os.path.exists(self.term_frequencies_path):
+            with open(self.term_frequencies_path, "rb") as f:
+                term_frequencies = pickle.load(f)
+            builder = PostingsBuilder()
+            for doc_id in self.docmap:
+                builder.add_document(doc_id, list(term_frequencies[doc_id].elements()))
+            self.index, self.doc_ids, self.doc_lengths, *_ = builder.build()
+        else:
+            with open(self.doc_lengths_path, "rb") as f:
+                documents = pickle.load(f)
+            self.doc_ids = documents["doc_ids"]
+            self.doc_lengths = documents["doc_lengths"]
+            self.index = index
+            if stats.get("index_format") == "compressed":
+                self.index = decompress_index(index)
 
-    def __add_document(self, doc_id: int, text: str) -> None:
-        tokens = tokenize_text(text)
-        for token in set(tokens):
-            self.index[token].add(doc_id)
-        self.term_frequencies[doc_id].update(tokens)
-        self.doc_lengths[doc_id] = len(tokens)
+        self.index_format = "arrays"
+        self.__set_fields((), None, None)
+        self.__compute_bm25_stats(quantize=stats.get("impact_scale") is not None)
+        return stats.get("index_format", "arrays")
+
+    def get_documents(self, term: str) -> list[int]:
+        doc_ids = [ids[ordinals] for ids, ordinals, _ in self.__live_postings(term)]
+        if not doc_ids:
+            return []
+        return np.sort(np.concatenate(doc_ids)).tolist()
 
     def get_tf(self, doc_id: int, term: str) -> int:
         tokens = tokenize_text(term)
         if len(tokens) != 1:
             raise ValueError("term must be a single token")
         token = tokens[0]
-        return self.term_frequencies[doc_id][token]
+        for doc_ids, ordinals, frequencies in self.__live_postings(token):
+            tf = term_frequency((ordinals, frequencies), find_ordinal(doc_ids, doc_id))
+            if tf:
+                return tf
+        return 0
 
     def get_idf(self, term: str) -> float:
         tokens = tokenize_text(term)
@@ -81,7 +503,7 @@ class InvertedIndex:
             raise ValueError("term must be a single token")
         token = tokens[0]
         doc_count = len(self.docmap)
-        term_doc_count = len(self.index[token])
+        term_doc_count = self.__document_frequency(token)
         return math.log((doc_count + 1) / (term_doc_count + 1))
 
     def get_bm25_idf(self, term: str) -> float:
@@ -89,54 +511,337 @@ class InvertedIndex:
         if len(tokens) != 1:
             raise ValueError("term must be a single token")
         token = tokens[0]
-        doc_count = len(self.docmap)
-        term_doc_count = len(self.index[token])
-        return math.log((doc_count - term_doc_count + 0.5) / (term_doc_count + 0.5) + 1)
+        if token in self.term_idf:
+            return self.term_idf[token]
+        return bm25_idf(len(self.docmap), self.__document_frequency(token))
 
     def get_bm25_tf(
         self, doc_id: int, term: str, k1: float = BM25_K1, b: float = BM25_B
     ) -> float:
         tf = self.get_tf(doc_id, term)
-        doc_length = self.doc_lengths.get(doc_id, 0)
-        avg_doc_length = self.__get_avg_doc_length()
-        if avg_doc_length > 0:
-            length_norm = 1 - b + b * (doc_length / avg_doc_length)
-        else:
-            length_norm = 1
-        return (tf * (k1 + 1)) / (tf + k1 * length_norm)
+        return bm25_tf(tf, self.__doc_length(doc_id), self.avg_doc_length, k1, b)
 
     def get_tf_idf(self, doc_id: int, term: str) -> float:
         tf = self.get_tf(doc_id, term)
         idf = self.get_idf(term)
         return tf * idf
 
-    def __get_avg_doc_length(self) -> float:
-        if not self.doc_lengths or len(self.doc_lengths) == 0:
-            return 0.0
-        total_length = 0
-        for length in self.doc_lengths.values():
-            total_length += length
-        return total_length / len(self.doc_lengths)
+    def __postings(self, term: str) -> tuple[np.ndarray, np.ndarray] | None:
+        postings = self.index.get(term)
+        if postings is not None and self.index_format == "compressed":
+            return postings.decode()
+        return postings
+
+    def __live_postings(
+        self, term: str
+    ) -> list[tuple[np.ndarray, np.ndarray, np.ndarray]]:
+        """(doc_ids, ordinals, term frequencies) of the term in every segment"""
+        if self.segmented:
+            return [(s.doc_ids, *s.live_postings(term)) for s in self.segments]
+        postings = self.__postings(term)
+        if postings is None:
+            return []
+        return [(self.doc_ids, *postings)]
+
+    def __document_frequency(self, term: str) -> int:
+        return sum(len(ordinals) for _, ordinals, _ in self.__live_postings(term))
+
+    def __doc_length(self, doc_id: int) -> int:
+        if self.segmented:
+            for segment in self.segments:
+                ordinal = segment.live_ordinal(doc_id)
+                if ordinal is not None:
+                    return int(segment.doc_lengths[ordinal])
+            return 0
+        ordinal = find_ordinal(self.doc_ids, doc_id)
+        return int(self.doc_lengths[ordinal]) if ordinal is not None else 0
+
+    def __impact_blocks(
+        self, query_tokens: list[str]
+    ) -> dict[str, ArrayImpactBlocks | CompressedImpactBlocks]:
+        blocks = {}
+        for token in set(query_tokens):
+            postings = self.index.get(token)
+            if postings is None:
+                continue
+            if self.index_format == "compressed":
+                blocks[token] = CompressedImpactBlocks(
+                    postings,
+                    self.length_norms,
+                    self.term_idf[token],
+                    scale=self.impact_scale,
+                )
+            else:
+                blocks[token] = ArrayImpactBlocks(postings[0], self.impacts[token])
+        return blocks
+
+    def __compute_bm25_stats(self, quantize: bool = False) -> None:
+        self.matrix = None
+        self.sorted_terms = None
+        self.spelling = None
+        self.result_cache.clear()
+        self.avg_doc_length = average_doc_length(self.doc_lengths)
+        self.term_idf, self.impacts = compute_impacts(
+            self.index, self.doc_lengths, self.avg_doc_length
+        )
+        self.impact_scale = None
+        if quantize:
+            self.impacts, self.impact_scale = quantize_impacts(self.impacts)
+        self.block_max_impacts = block_max_impacts(self.impacts)
+
+    def expand_term(
+        self, pattern: str, max_expansions: int = MAX_EXPANSIONS
+    ) -> list[str]:
+        """Index terms matching a wildcard pattern such as "pad*", sorted"""
+        pattern = normalize_pattern(pattern)
+        if not self.segmented:
+            return expand_pattern(self.__term_dictionary(), pattern, max_expansions)
+        expansions = set()
+        for segment in self.segments:
+            expansions.update(expand_pattern(segment.terms, pattern, max_expansions))
+        return sorted(expansions)[:max_expansions]
+
+    def __term_dictionary(self) -> Sequence[str]:
+        # Saved indexes keep their terms sorted; a freshly built one is
+        # sorted once, on the first expansion.
+        if isinstance(self.index, TermMapping):
+            return self.index.terms
+        if self.sorted_terms is None:
+            self.sorted_terms = sorted(self.index)
+        return self.sorted_terms
+
+    def spelling_index(self) -> SpellingIndex:
+        """Symmetric-delete index over the vocabulary, built on first use"""
+        if self.spelling is None:
+            indexes = (
+                [s.index for s in self.segments] if self.segmented else [self.index]
+            )
+            # Stored postings still count deleted documents, which is close
+            # enough to rank suggestions.
+            frequencies = Counter()
+            for index in indexes:
+                for term, postings in index.items():
+                    if isinstance(postings, CompressedPostings):
+                        frequencies[term] += postings.count
+                    else:
+                        frequencies[term] += len(postings[0])
+            self.spelling = SpellingIndex(frequencies)
+        return self.spelling
+
+    def correct_spelling(self, query: str) -> str:
+        """Replace query words missing from the index by the closest term"""
+        analyzer = get_analyzer()
+        spelling = self.spelling_index()
+        words = []
+        for word in query.split():
+            tokens = analyzer.analyze(word)
+            if tokens and tokens[0] not in spelling:
+                word = spelling.correct(tokens[0]) or word
+            words.append(word)
+        return " ".join(words)
+
+    def __analyze_query(self, query: str) -> list[str]:
+        """Tokens of a query, with wildcard words expanded to index terms"""
+        query, patterns = parse_wildcards(query)
+        query_tokens = tokenize_text(query)
+        for pattern in patterns:
+            query_tokens.extend(self.expand_term(pattern))
+        return query_tokens
 
     def bm25(self, doc_id: int, term: str) -> float:
         tf_component = self.get_bm25_tf(doc_id, term)
         idf_component = self.get_bm25_idf(term)
         return tf_component * idf_component
 
-    def bm25_search(self, query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> list[dict]:
-        query_tokens = tokenize_text(query)
+    def bm25_search(
+        self, query: str, limit: int = DEFAULT_SEARCH_LIMIT, mode: str = "exhaustive"
+    ) -> list[dict]:
+        """Rank documents by BM25, caching results by analyzed query"""
+        key = ("bm25", self.__query_key(query), limit, mode)
+        return self.result_cache.get_or_compute(
+            key, lambda: self.__bm25_search(query, limit, mode)
+        )
 
-        scores = {}
-        for doc_id in self.docmap:
-            score = 0.0
-            for token in query_tokens:
-                score += self.bm25(doc_id, token)
-            scores[doc_id] = score
+    def __query_key(self, query: str) -> tuple:
+        query, clauses = parse_phrases(query)
+        return (
+            tuple(self.__analyze_query(query)),
+            tuple((tuple(tokenize_text(phrase)), width) for phrase, width in clauses),
+        )
 
-        sorted_docs = sorted(scores.items(), key=lambda x: x[1], reverse=True)
+    def __bm25_search(self, query: str, limit: int, mode: str) -> list[dict]:
+        return self.__format_results(self.__rank(query, limit, mode))
 
+    def __rank(self, query: str, limit: int, mode: str) -> list[tuple[int, float]]:
+        query, clauses = parse_phrases(query)
+        query_tokens = self.__analyze_query(query)
+        if clauses:
+            ranked = self.__search_phrases(query_tokens, clauses, limit)
+        elif self.segmented and mode in SCORING_MODES:
+            ranked = self.__search_segments(query_tokens, limit)
+        else:
+            ranked = self.__search(query_tokens, limit, mode)
+        if not clauses:
+            ranked = pad_with_unmatched(ranked, self.docmap, limit)
+        return ranked
+
+    def feedback_weights(
+        self,
+        query: str,
+        feedback_docs: int = FEEDBACK_DOCS,
+        feedback_terms: int = FEEDBACK_TERMS,
+        original_weight: float = FEEDBACK_ORIGINAL_WEIGHT,
+    ) -> dict[str, float]:
+        """Query term weights expanded by RM3 pseudo-relevance feedback"""
+        query_tokens = self.__analyze_query(parse_phrases(query)[0])
+        # Unrounded scores, so near ties keep their relative weights
+        ranked = self.__rank(query, feedback_docs, "exhaustive")
+        feedback = [(doc_id, score) for doc_id, score in ranked if score > 0]
+        total_score = sum(score for _, score in feedback)
+
+        relevance = Counter()
+        for doc_id, score in feedback:
+            movie = self.docmap[doc_id]
+            tokens = tokenize_text(f"{movie['title']} {movie['description']}")
+            doc_weight = score / total_score / len(tokens)
+            for term, count in Counter(tokens).items():
+                relevance[term] += doc_weight * count
+        expansion = dict(relevance.most_common(feedback_terms))
+        expansion_total = sum(expansion.values())
+
+        weights = Counter()
+        for term, count in Counter(query_tokens).items():
+            weights[term] += original_weight * count / len(query_tokens)
+        for term, weight in expansion.items():
+            weights[term] += (1 - original_weight) * weight / expansion_total
+        return dict(weights.most_common())
+
+    def feedback_search(
+        self,
+        query: str,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        feedback_docs: int = FEEDBACK_DOCS,
+        feedback_terms: int = FEEDBACK_TERMS,
+    ) -> list[dict]:
+        """Search again with the query expanded by `feedback_weights`"""
+        weights = self.feedback_weights(query, feedback_docs, feedback_terms)
+        query_tokens = list(weights)
+        if self.segmented:
+            ranked = self.__search_segments(query_tokens, limit, weights=weights)
+        else:
+            ranked = self.__search(query_tokens, limit, "exhaustive", weights)
+        return self.__format_results(pad_with_unmatched(ranked, self.docmap, limit))
+
+    def feedback_query(
+        self,
+        query: str,
+        feedback_docs: int = FEEDBACK_DOCS,
+        feedback_terms: int = FEEDBACK_TERMS,
+    ) -> str:
+        """The query followed by its feedback terms, as plain text"""
+        query_tokens = set(tokenize_text(query))
+        weights = self.feedback_weights(query, feedback_docs, feedback_terms)
+        expansion = [term for term in weights if term not in query_tokens]
+        return " ".join([query, *expansion])
+
+    def bm25f_search(
+        self,
+        query: str,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        weights: Mapping[str, float] | None = None,
+    ) -> list[dict]:
+        """Search with BM25F, weighting the fields at query time"""
+        if not self.fields:
+            raise ValueError("BM25F needs an index built with fields")
+        weights = {**DEFAULT_FIELD_WEIGHTS, **(weights or {})}
+        unknown = weights.keys() - set(self.fields)
+        if unknown:
+            raise ValueError(f"unknown fields: {', '.join(sorted(unknown))}")
+        field_weights = np.array([weights[field] for field in self.fields])
+
+        query, clauses = parse_phrases(query)
+        query_tokens = self.__analyze_query(query)
+        if self.segmented:
+            ranked = self.__search_segments(
+                query_tokens,
+                limit,
+                self.__segment_phrase_matches(clauses),
+                field_weights,
+            )
+        else:
+            ranked = self.__search_fields(query_tokens, limit, clauses, field_weights)
+        if not clauses:
+            ranked = pad_with_unmatched(ranked, self.docmap, limit)
+        return self.__format_results(ranked)
+
+    def boolean_search(
+        self,
+        query: str,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        rank: bool = False,
+        default_operator: str = "or",
+    ) -> list[dict]:
+        """Documents matching a boolean query, ranked by BM25 with `rank`"""
+        tree = parse_boolean_query(query, default_operator, self.expand_term)
+        if tree is None:
+            return []
+        matches = self.__boolean_matches(tree)
+        matched_ids = np.sort(
+            np.concatenate([doc_ids[ordinals] for doc_ids, ordinals in matches])
+        )
+        if not rank:
+            return self.__format_results(
+                [(doc_id, 0.0) for doc_id in matched_ids[:limit].tolist()]
+            )
+
+        query_tokens = positive_terms(tree)
+        if self.segmented:
+            by_segment = {
+                id(segment): ordinals
+                for segment, (_, ordinals) in zip(self.segments, matches)
+            }
+            ranked = self.__search_segments(
+                query_tokens, limit, lambda segment: by_segment[id(segment)]
+            )
+        else:
+            ranked = self.__search_matching(query_tokens, limit, matches[0][1])
+        # Matches made only of excluded terms have no score; list them last.
+        ranked = pad_with_unmatched(ranked, map(int, matched_ids), limit)
+        return self.__format_results(ranked)
+
+    def __boolean_matches(self, tree: QueryNode) -> list[tuple[np.ndarray, np.ndarray]]:
+        """(doc_ids, matching ordinals) of every segment"""
+        if not self.segmented:
+            ordinals = evaluate_query(
+                tree,
+                self.__boolean_postings,
+                lambda: np.arange(len(self.doc_ids), dtype=ORDINAL_DTYPE),
+            )
+            return [(self.doc_ids, ordinals)]
+        matches = []
+        for segment in self.segments:
+            ordinals = evaluate_query(
+                tree,
+                lambda term, segment=segment: segment.live_postings(term)[0],
+                lambda segment=segment: (
+                    np.flatnonzero(segment.live).astype(ORDINAL_DTYPE)
+                    if segment.live is not None
+                    else np.arange(len(segment.doc_ids), dtype=ORDINAL_DTYPE)
+                ),
+            )
+            matches.append((segment.doc_ids, ordinals))
+        return matches
+
+    def __boolean_postings(self, term: str) -> np.ndarray | CompressedPostings | None:
+        # Compressed postings are probed block by block, not decoded upfront.
+        postings = self.index.get(term)
+        if postings is None or self.index_format == "compressed":
+            return postings
+        return postings[0]
+
+    def __format_results(self, ranked: list[tuple[int, float]]) -> list[dict]:
         results = []
-        for doc_id, score in sorted_docs[:limit]:
+        for doc_id, score in ranked:
             doc = self.docmap[doc_id]
             formatted_result = format_search_result(
                 doc_id=doc["id"],
@@ -145,33 +850,343 @@ class InvertedIndex:
                 score=score,
             )
             results.append(formatted_result)
-
         return results
 
+    def __search(
+        self,
+        query_tokens: list[str],
+        limit: int,
+        mode: str,
+        weights: Mapping[str, float] | None = None,
+    ) -> list[tuple[int, float]]:
+        blocks = self.__impact_blocks(query_tokens)
+
+        match mode:
+            case "exhaustive":
+                ordinals, scores = accumulate_impacts(
+                    {token: b.decode() for token, b in blocks.items()},
+                    query_tokens,
+                    len(self.doc_ids),
+                    self.impact_scale,
+                    weights,
+                )
+                ranked = top_k(ordinals, scores, limit)
+            case "wand" | "bmw":
+                ranked = dynamic_pruning_top_k(
+                    blocks,
+                    self.block_max_impacts,
+                    query_tokens,
+                    limit,
+                    self.impact_scale,
+                    use_block_max=mode == "bmw",
+                )
+            case _:
+                raise ValueError(f"mode must be one of {', '.join(SCORING_MODES)}")
+        return [(int(self.doc_ids[ordinal]), score) for ordinal, score in ranked]
+
+    def impact_matrix(self) -> ImpactMatrix:
+        """The index as a document-term matrix of BM25 impacts, built once"""
+        if self.segmented:
+            raise ValueError("merge the index into one segment to export a matrix")
+        if self.matrix is None:
+            blocks = self.__impact_blocks(list(self.index))
+            self.matrix = ImpactMatrix.from_postings(
+                ((term, blocks[term].decode()) for term in self.index),
+                len(self.doc_ids),
+                self.impact_scale,
+            )
+        return self.matrix
+
+    def bm25_search_batch(
+        self, queries: list[str], limit: int = DEFAULT_SEARCH_LIMIT
+    ) -> list[list[dict]]:
+        """Score many queries in one pass over the impact matrix"""
+        keys = [
+            ("bm25", self.__query_key(query), limit, "exhaustive") for query in queries
+        ]
+
+        def search_missing(positions: list[int]) -> list[list[dict]]:
+            missing = [queries[i] for i in positions]
+            if self.segmented or any(PHRASE_PATTERN.search(q) for q in missing):
+                return [
+                    self.__bm25_search(query, limit, "exhaustive") for query in missing
+                ]
+            matrix = self.impact_matrix()
+            rankings = matrix.top_k(
+                [self.__analyze_query(query) for query in missing], limit
+            )
+
+            results = []
+            for ranked in rankings:
+                ranked = [
+                    (int(self.doc_ids[ordinal]), score) for ordinal, score in ranked
+                ]
+                results.append(
+                    self.__format_results(
+                        pad_with_unmatched(ranked, self.docmap, limit)
+                    )
+                )
+            return results
+
+        return self.result_cache.get_or_compute_batch(keys, search_missing)
+
+    def __search_phrases(
+        self,
+        query_tokens: list[str],
+        clauses: list[tuple[str, int | None]],
+        limit: int,
+    ) -> list[tuple[int, float]]:
+        # Phrase and proximity clauses filter the exhaustively scored
+        # documents; the unconstrained remainder is not padded in.
+        if self.segmented:
+            return self.__search_segments(
+                query_tokens, limit, self.__segment_phrase_matches(clauses)
+            )
+        return self.__search_matching(
+            query_tokens, limit, self.__phrase_matches(clauses)
+        )
+
+    def __search_matching(
+        self, query_tokens: list[str], limit: int, matches: np.ndarray | None
+    ) -> list[tuple[int, float]]:
+        """Exhaustive top-k restricted to the ordinals in `matches`, if given"""
+        blocks = self.__impact_blocks(query_tokens)
+        ordinals, scores = accumulate_impacts(
+            {token: b.decode() for token, b in blocks.items()},
+            query_tokens,
+            len(self.doc_ids),
+            self.impact_scale,
+        )
+        ordinals, scores = keep_matches(ordinals, scores, matches)
+        ranked = top_k(ordinals, scores, limit)
+        return [(int(self.doc_ids[ordinal]), score) for ordinal, score in ranked]
+
+    def __search_fields(
+        self,
+        query_tokens: list[str],
+        limit: int,
+        clauses: list[tuple[str, int | None]],
+        field_weights: np.ndarray,
+    ) -> list[tuple[int, float]]:
+        # Field norms only depend on the index, so they are computed once;
+        # a query then costs one gather and a small matrix product per term.
+        if self.field_norms is None:
+            self.field_norms = field_length_norms(
+                self.field_lengths, self.avg_field_lengths
+            )
+        impacts = {}
+        for token in set(query_tokens):
+            postings = self.__postings(token)
+            if postings is None:
+                continue
+            ordinals = postings[0]
+            impacts[token] = (
+                ordinals,
+                bm25f_impacts(
+                    self.field_frequencies[token],
+                    self.field_norms[ordinals],
+                    field_weights,
+                    self.term_idf[token],
+                ),
+            )
+        ordinals, scores = accumulate_impacts(impacts, query_tokens, len(self.doc_ids))
+        if clauses:
+            ordinals, scores = keep_matches(
+                ordinals, scores, self.__phrase_matches(clauses)
+            )
+        ranked = top_k(ordinals, scores, limit)
+        return [(int(self.doc_ids[ordinal]), score) for ordinal, score in ranked]
+
+    def __phrase_matches(
+        self, clauses: list[tuple[str, int | None]]
+    ) -> np.ndarray | None:
+        if self.positions is None:
+            raise ValueError("phrase queries need an index built with positions")
+        return match_phrases(clauses, self.__positional_postings)
+
+    @staticmethod
+    def __segment_phrase_matches(
+        clauses: list[tuple[str, int | None]],
+    ) -> Callable[[Segment], np.ndarray | None] | None:
+        if not clauses:
+            return None
+        return lambda segment: match_phrases(clauses, segment.live_positional_postings)
+
+    def __positional_postings(
+        self, term: str
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray] | None:
+        postings = self.__postings(term)
+        if postings is None:
+            return None
+        return (*postings, self.positions[term])
+
+    def __search_segments(
+        self,
+        query_tokens: list[str],
+        limit: int,
+        matches: Callable[[Segment], np.ndarray | None] | None = None,
+        field_weights: np.ndarray | None = None,
+        weights: Mapping[str, float] | None = None,
+    ) -> list[tuple[int, float]]:
+        # Every mode scores exhaustively here: block maxima stored per segment
+        # do not bound impacts computed from corpus-wide statistics.
+        terms = set(query_tokens)
+        if field_weights is None:
+            postings = [{t: s.live_postings(t) for t in terms} for s in self.segments]
+        else:
+            postings = [
+                {t: s.live_field_postings(t) for t in terms} for s in self.segments
+            ]
+        doc_count = len(self.docmap)
+        idf = {
+            term: bm25_idf(doc_count, sum(len(p[term][0]) for p in postings))
+            for term in terms
+        }
+
+        ranked = []
+        for segment, segment_postings in zip(self.segments, postings):
+            impacts = {}
+            for term, (ordinals, frequencies) in segment_postings.items():
+                if len(ordinals) == 0:
+                    continue
+                if field_weights is None:
+                    norms = length_norms(
+                        segment.doc_lengths[ordinals], self.avg_doc_length
+                    )
+                    term_impacts = posting_impacts(frequencies, norms, idf[term])
+                else:
+                    norms = field_length_norms(
+                        segment.field_lengths[ordinals], self.avg_field_lengths
+                    )
+                    term_impacts = bm25f_impacts(
+                        frequencies, norms, field_weights, idf[term]
+                    )
+                impacts[term] = (ordinals, term_impacts)
+            ordinals, scores = accumulate_impacts(
+                impacts, query_tokens, len(segment.doc_ids), weights=weights
+            )
+            if matches is not None:
+                ordinals, scores = keep_matches(ordinals, scores, matches(segment))
+            ranked.extend(
+                (int(segment.doc_ids[ordinal]), score)
+                for ordinal, score in top_k(ordinals, scores, limit)
+            )
+        ranked.sort(key=lambda x: (-x[1], x[0]))
+        return ranked[:limit]
+
 
-def build_command() -> None:
+def index_movies(
+    movies: Iterable[dict], positions: bool = False, fields: bool = False
+) -> tuple[
+    dict[str, tuple[np.ndarray, np.ndarray]],
+    np.ndarray,
+    np.ndarray,
+    dict[str, np.ndarray],
+    dict[str, np.ndarray],
+    np.ndarray,
+]:
+    builder = PostingsBuilder(positions, len(INDEX_FIELDS) if fields else 0)
+    for m in movies:
+        doc_description = f"{m['title']} {m['description']}"
+        # The fields are analyzed one word at a time, so the document's
+        # tokens are those of its fields one after the other.
+        field_lengths = None
+        if fields:
+            field_lengths = [len(tokenize_text(m[field])) for field in INDEX_FIELDS]
+        if positions:
+            tokens, token_positions = get_analyzer().analyze_positions(doc_description)
+            builder.add_document(m["id"], tokens, token_positions, field_lengths)
+        else:
+            builder.add_document(
+                m["id"], tokenize_text(doc_description), field_lengths=field_lengths
+            )
+    return builder.build()
+
+
+def build_postings(
+    movies: Iterable[dict],
+    workers: int = 1,
+    positions: bool = False,
+    fields: bool = False,
+) -> tuple[
+    dict[str, tuple[np.ndarray, np.ndarray]],
+    np.ndarray,
+    np.ndarray,
+    dict[str, np.ndarray],
+    dict[str, np.ndarray],
+    np.ndarray,
+]:
+    """Tokenize movies into postings, optionally across worker processes"""
+    if workers <= 1:
+        return index_movies(movies, positions, fields)
+    parts = []
+    in_flight = deque()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        # At most two batches per worker are in flight, so the movie stream
+        # is never read far ahead of the workers.
+        for batch in itertools.batched(movies, INDEX_BATCH_SIZE):
+            if len(in_flight) >= 2 * workers:
+                parts.append(in_flight.popleft().result())
+            in_flight.append(executor.submit(index_movies, batch, positions, fields))
+        parts.extend(future.result() for future in in_flight)
+    if not parts:
+        return index_movies([], positions, fields)
+    return merge_postings(parts)
+
+
+def build_command(
+    quantize: bool = False,
+    index_format: str = "arrays",
+    workers: int = 1,
+    positions: bool = False,
+    fields: bool = False,
+) -> None:
     idx = InvertedIndex()
-    idx.build()
-    idx.save()
+    idx.build(quantize, workers, positions, fields)
+    idx.save(index_format)
 
 
-def search_command(query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> list[dict]:
+def update_command(movies: list[dict]) -> None:
     idx = InvertedIndex()
     idx.load()
-    query_tokens = tokenize_text(query)
-    seen, results = set(), []
-    for query_token in query_tokens:
-        matching_doc_ids = idx.get_documents(query_token)
-        for doc_id in matching_doc_ids:
-            if doc_id in seen:
-                continue
-            seen.add(doc_id)
-            doc = idx.docmap[doc_id]
-            results.append(doc)
-            if len(results) >= limit:
-                return results
+    for m in movies:
+        idx.add_document(m)
+    idx.commit()
+
+
+def delete_command(doc_ids: list[int]) -> None:
+    idx = InvertedIndex()
+    idx.load()
+    for doc_id in doc_ids:
+        idx.delete_document(doc_id)
+    idx.commit()
+
+
+def merge_command(everything: bool = False) -> int:
+    idx = InvertedIndex()
+    idx.load()
+    idx.merge(everything=everything)
+    return len(idx.segments)
+
+
+def convert_command() -> str:
+    idx = InvertedIndex()
+    index_format = idx.load_pickles()
+    idx.save(index_format)
+    return index_format
 
-    return results
+
+def search_command(
+    query: str,
+    limit: int = DEFAULT_SEARCH_LIMIT,
+    rank: bool = False,
+    default_operator: str = "or",
+    idx: InvertedIndex | None = None,
+) -> list[dict]:
+    if idx is None:
+        idx = InvertedIndex()
+        idx.load()
+    return idx.boolean_search(query, limit, rank, default_operator)
 
 
 def preprocess_text(text: str) -> str:
@@ -181,22 +1196,7 @@ def preprocess_text(text: str) -> str:
 
 
 def tokenize_text(text: str) -> list[str]:
-    text = preprocess_text(text)
-    tokens = text.split()
-    valid_tokens = []
-    for token in tokens:
-        if token:
-            valid_tokens.append(token)
-    stop_words = load_stopwords()
-    filtered_words = []
-    for word in valid_tokens:
-        if word not in stop_words:
-            filtered_words.append(word)
-    stemmer = PorterStemmer()
-    stemmed_words = []
-    for word in filtered_words:
-        stemmed_words.append(stemmer.stem(word))
-    return stemmed_words
+    return get_analyzer().analyze(text)
 
 
 def tf_command(doc_id: int, term: str) -> int:
@@ -231,7 +1231,78 @@ def tfidf_command(doc_id: int, term: str) -> float:
     return idx.get_tf_idf(doc_id, term)
 
 
-def bm25search_command(query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> list[dict]:
+def bm25search_command(
+    query: str,
+    limit: int = DEFAULT_SEARCH_LIMIT,
+    mode: str = "exhaustive",
+    feedback: bool = False,
+    idx: InvertedIndex | None = None,
+) -> list[dict]:
+    if idx is None:
+        idx = InvertedIndex()
+        idx.load()
+    if feedback:
+        return idx.feedback_search(query, limit)
+    return idx.bm25_search(query, limit, mode)
+
+
+def bm25search_batch_command(
+    lines: Iterable[str],
+    limit: int = DEFAULT_SEARCH_LIMIT,
+    mode: str = "exhaustive",
+    feedback: bool = False,
+    idx: InvertedIndex | None = None,
+) -> Iterator[dict]:
+    """Answer a JSON Lines stream of queries, loading the index once"""
+    if idx is None:
+        idx = InvertedIndex()
+        idx.load()
+
+    def search(queries: list[str]) -> list[list[dict]]:
+        if mode == "exhaustive" and not feedback:
+            return idx.bm25_search_batch(queries, limit)
+        return [
+            bm25search_command(query, limit, mode, feedback, idx) for query in queries
+        ]
+
+    return search_batches(read_queries(lines), search)
+
+
+def bm25fsearch_command(
+    query: str,
+    limit: int = DEFAULT_SEARCH_LIMIT,
+    weights: Mapping[str, float] | None = None,
+) -> list[dict]:
+    idx = InvertedIndex()
+    idx.load()
+    return idx.bm25f_search(query, limit, weights)
+
+
+def compare_scoring_modes_command(limit: int = DEFAULT_SEARCH_LIMIT) -> dict:
     idx = InvertedIndex()
     idx.load()
-    return idx.bm25_search(query, limit)
+    queries = [test_case["query"] for test_case in load_golden_dataset()["test_cases"]]
+
+    rankings = {}
+    latencies = {}
+    for mode in SCORING_MODES:
+        rankings[mode] = []
+        start = time.perf_counter()
+        for query in queries:
+            results = idx.bm25_search(query, limit, mode)
+            rankings[mode].append([(r["id"], r["score"]) for r in results])
+        latencies[mode] = (time.perf_counter() - start) / len(queries) * 1000
+
+    if not idx.segmented:
+        start = time.perf_counter()
+        batch = idx.bm25_search_batch(queries, limit)
+        rankings["matrix"] = [[(r["id"], r["score"]) for r in rs] for rs in batch]
+        latencies["matrix"] = (time.perf_counter() - start) / len(queries) * 1000
+
+    modes = {}
+    for mode, ranking in rankings.items():
+        modes[mode] = {
+            "avg_latency_ms": latencies[mode],
+            "identical_top_k": ranking == rankings["exhaustive"],
+        }
+    return {"queries_count": len(queries), "limit": limit, "modes": modes}
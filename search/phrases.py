@@ -0,0 +1,155 @@
+import re
+from collections.abc import Callable
+
+import numpy as np
+
+from search.postings import ORDINAL_DTYPE, gather_positions
+from search.search_utils import get_analyzer
+
+# A quoted phrase, optionally followed by ~N to match its terms in any order
+# within N extra words, e.g. "winnie the pooh" or "bear london"~3.
+PHRASE_PATTERN = re.compile(r'"([^"]*)"(?:~(\d+))?')
+
+PositionalPostings = tuple[np.ndarray, np.ndarray, np.ndarray]
+
+
+def parse_phrases(query: str) -> tuple[str, list[tuple[str, int | None]]]:
+    """Split the phrase and proximity clauses out of a query
+
+    Returns:
+        The query with quotes and slops removed, whose words are all still
+        scored, and every (phrase, slop) clause, slop None for exact phrases
+    """
+    clauses = [
+        (match.group(1), int(match.group(2)) if match.group(2) else None)
+        for match in PHRASE_PATTERN.finditer(query)
+    ]
+    return PHRASE_PATTERN.sub(r" \1 ", query), clauses
+
+
+def _intersect_ordinals(postings: list[PositionalPostings]) -> np.ndarray:
+    candidates = postings[0][0]
+    for ordinals, _, _ in postings[1:]:
+        candidates = np.intersect1d(candidates, ordinals, assume_unique=True)
+    return candidates
+
+
+def _occurrences(
+    postings: PositionalPostings, candidates: np.ndarray
+) -> tuple[np.ndarray, np.ndarray]:
+    """(ordinal, position) of every occurrence of a term in the candidates"""
+    ordinals, frequencies, positions = postings
+    keep = np.isin(ordinals, candidates, assume_unique=True)
+    return (
+        np.repeat(ordinals[keep].astype(np.int64), frequencies[keep]),
+        gather_positions(positions, frequencies, keep).astype(np.int64),
+    )
+
+
+def phrase_matches(
+    postings: list[PositionalPostings], offsets: list[int]
+) -> np.ndarray:
+    """Ordinals of the documents containing the terms at the given offsets
+
+    Every occurrence is keyed by (ordinal, position - offset), the position
+    the phrase would start at. A document matches when one start key is
+    shared by all terms, so the phrase is found with sorted key
+    intersections instead of a scan per document.
+
+    Args:
+        postings: (ordinals, term frequencies, positions) of each phrase term
+        offsets: Word offset of each term from the first one
+    """
+    candidates = _intersect_ordinals(postings)
+    starts = None
+    for term_postings, offset in zip(postings, offsets):
+        if len(candidates) == 0:
+            break
+        ordinals, positions = _occurrences(term_postings, candidates)
+        valid = positions >= offset
+        keys = np.unique((ordinals[valid] << 32) + positions[valid] - offset)
+        if starts is not None:
+            keys = np.intersect1d(starts, keys, assume_unique=True)
+        starts = keys
+        candidates = np.unique(starts >> 32)
+    return candidates.astype(ORDINAL_DTYPE)
+
+
+def proximity_matches(postings: list[PositionalPostings], width: int) -> np.ndarray:
+    """Ordinals of the documents with every term inside a window of `width` words
+
+    Terms may appear in any order. Occurrences of all terms in the candidate
+    documents are sorted by position and swept once with a sliding window.
+
+    Args:
+        postings: (ordinals, term frequencies, positions) of each distinct term
+        width: Largest number of words the window may span
+    """
+    candidates = _intersect_ordinals(postings)
+    if len(candidates) == 0 or len(postings) == 1:
+        return candidates.astype(ORDINAL_DTYPE)
+
+    occurrences = [_occurrences(p, candidates) for p in postings]
+    ordinals = np.concatenate([o for o, _ in occurrences])
+    positions = np.concatenate([p for _, p in occurrences])
+    terms = np.repeat(np.arange(len(postings)), [len(o) for o, _ in occurrences])
+    order = np.lexsort((positions, ordinals))
+    ordinals = ordinals[order].tolist()
+    positions = positions[order].tolist()
+    terms = terms[order].tolist()
+
+    matches = []
+    counts = [0] * len(postings)
+    covered = 0
+    start = 0
+    for end in range(len(ordinals)):
+        if end > 0 and ordinals[end] != ordinals[end - 1]:
+            counts = [0] * len(postings)
+            covered = 0
+            start = end
+        if counts[terms[end]] == 0:
+            covered += 1
+        counts[terms[end]] += 1
+        while positions[end] - positions[start] >= width:
+            counts[terms[start]] -= 1
+            if counts[terms[start]] == 0:
+                covered -= 1
+            start += 1
+        if covered == len(postings) and (not matches or matches[-1] != ordinals[end]):
+            matches.append(ordinals[end])
+    return np.array(matches, dtype=ORDINAL_DTYPE)
+
+
+def match_phrases(
+    clauses: list[tuple[str, int | None]],
+    postings: Callable[[str], PositionalPostings | None],
+) -> np.ndarray | None:
+    """Ordinals of the documents satisfying every phrase and proximity clause
+
+    Args:
+        clauses: (phrase, slop) pairs from `parse_phrases`
+        postings: Positional postings of a term, None if it is not indexed
+
+    Returns:
+        The matching ordinals, or None if no clause constrains the results,
+        e.g. a phrase made only of stopwords
+    """
+    matches = None
+    for phrase, slop in clauses:
+        tokens, word_positions = get_analyzer().analyze_positions(phrase)
+        if not tokens:
+            continue
+        term_postings = {token: postings(token) for token in tokens}
+        if any(p is None for p in term_postings.values()):
+            return np.empty(0, dtype=ORDINAL_DTYPE)
+        offsets = [position - word_positions[0] for position in word_positions]
+        if slop is None:
+            clause = phrase_matches([term_postings[t] for t in tokens], offsets)
+        else:
+            width = offsets[-1] + 1 + slop
+            clause = proximity_matches(list(term_postings.values()), width)
+        if matches is None:
+            matches = clause
+        else:
+            matches = np.intersect1d(matches, clause, assume_unique=True)
+    return matches
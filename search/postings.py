@@ -0,0 +1,496 @@
+from array import array
+from collections import Counter
+from collections.abc import Mapping
+
+import numpy as np
+
+DOC_ID_DTYPE = np.int64
+ORDINAL_DTYPE = np.int32
+TF_DTYPE = np.int32
+
+POSTINGS_BLOCK_SIZE = 128
+INDEX_FORMATS = ("arrays", "compressed")
+
+
+class PostingsBuilder:
+    """Accumulates documents into array-backed postings
+
+    Documents are numbered by ordinal, their position in ascending document
+    ID order. Every term maps to a sorted array of ordinals and a parallel
+    array of term frequencies. Document lengths are a dense array indexed by
+    ordinal.
+
+    With `positions`, every term also maps to the word positions of all its
+    occurrences, posting after posting: the positions of a posting are the
+    run of term frequency length starting where the previous run ends.
+
+    With `field_count` fields, the tokens of a document are its fields one
+    after the other. Every posting then also records the term frequency in
+    each field, as one row of a (postings, fields) array aligned with the
+    term's postings, and every document the length of each of its fields.
+    """
+
+    def __init__(self, positions: bool = False, field_count: int = 0) -> None:
+        self.doc_ids = array("q")
+        self.doc_lengths = array("i")
+        self.ordinals: dict[str, array] = {}
+        self.frequencies: dict[str, array] = {}
+        self.positions: dict[str, array] | None = {} if positions else None
+        self.max_position = 0
+        self.field_count = field_count
+        self.field_lengths = array("i")
+        self.field_frequencies: dict[str, array] = {}
+
+    def add_document(
+        self,
+        doc_id: int,
+        tokens: list[str],
+        positions: list[int] | None = None,
+        field_lengths: list[int] | None = None,
+    ) -> None:
+        ordinal = len(self.doc_ids)
+        self.doc_ids.append(doc_id)
+        self.doc_lengths.append(len(tokens))
+        if self.positions is None:
+            term_frequencies = Counter(tokens)
+        else:
+            occurrences: dict[str, list[int]] = {}
+            for token, position in zip(tokens, positions):
+                occurrences.setdefault(token, []).append(position)
+            if positions:
+                self.max_position = max(self.max_position, positions[-1])
+            term_frequencies = {}
+            for token, token_positions in occurrences.items():
+                term_frequencies[token] = len(token_positions)
+                term_positions = self.positions.get(token)
+                if term_positions is None:
+                    term_positions = self.positions[token] = array("I")
+                term_positions.extend(token_positions)
+        for token, tf in term_frequencies.items():
+            term_ordinals = self.ordinals.get(token)
+            if term_ordinals is None:
+                term_ordinals = self.ordinals[token] = array("i")
+                self.frequencies[token] = array("i")
+            term_ordinals.append(ordinal)
+            self.frequencies[token].append(tf)
+        if self.field_count:
+            self.__add_fields(tokens, term_frequencies, field_lengths)
+
+    def __add_fields(
+        self,
+        tokens: list[str],
+        term_frequencies: Mapping[str, int],
+        field_lengths: list[int],
+    ) -> None:
+        if len(field_lengths) != self.field_count or sum(field_lengths) != len(tokens):
+            raise ValueError("field lengths must split the tokens into every field")
+        self.field_lengths.extend(field_lengths)
+        field_counts = []
+        start = 0
+        for length in field_lengths:
+            field_counts.append(Counter(tokens[start : start + length]))
+            start += length
+        for token in term_frequencies:
+            term_fields = self.field_frequencies.get(token)
+            if term_fields is None:
+                term_fields = self.field_frequencies[token] = array("i")
+            term_fields.extend(counts[token] for counts in field_counts)
+
+    def build(
+        self,
+    ) -> tuple[
+        dict[str, tuple[np.ndarray, np.ndarray]],
+        np.ndarray,
+        np.ndarray,
+        dict[str, np.ndarray],
+        dict[str, np.ndarray],
+        np.ndarray,
+    ]:
+        """Freeze the accumulated documents into NumPy arrays
+
+        Returns:
+            The term dictionary of (ordinals, term frequencies) postings, the
+            document ID of every ordinal, the length of every document, the
+            positions of every term, empty unless positions are recorded, the
+            per-field term frequencies of every term, empty without fields,
+            and the (documents, fields) field lengths
+        """
+        doc_ids = np.frombuffer(self.doc_ids, dtype=DOC_ID_DTYPE).copy()
+        doc_lengths = np.frombuffer(self.doc_lengths, dtype=TF_DTYPE).copy()
+        field_lengths = (
+            np.frombuffer(self.field_lengths, dtype=TF_DTYPE)
+            .reshape(len(doc_ids), self.field_count)
+            .copy()
+        )
+
+        order = np.argsort(doc_ids, kind="stable")
+        in_order = bool(np.all(order == np.arange(len(order))))
+        if not in_order:
+            ranks = np.empty_like(order, dtype=ORDINAL_DTYPE)
+            ranks[order] = np.arange(len(order), dtype=ORDINAL_DTYPE)
+            doc_ids = doc_ids[order]
+            doc_lengths = doc_lengths[order]
+            field_lengths = field_lengths[order]
+
+        dtype = position_dtype(self.max_position)
+        index = {}
+        positions = {}
+        field_frequencies = {}
+        for term, term_ordinals in self.ordinals.items():
+            ordinals = np.frombuffer(term_ordinals, dtype=ORDINAL_DTYPE).copy()
+            frequencies = np.frombuffer(self.frequencies[term], dtype=TF_DTYPE).copy()
+            if self.positions is not None:
+                term_positions = np.frombuffer(self.positions[term], dtype=np.uint32)
+                positions[term] = term_positions.astype(dtype)
+            if self.field_count:
+                field_frequencies[term] = (
+                    np.frombuffer(self.field_frequencies[term], dtype=TF_DTYPE)
+                    .reshape(len(ordinals), self.field_count)
+                    .copy()
+                )
+            if not in_order:
+                ordinals = ranks[ordinals]
+                sort = np.argsort(ordinals, kind="stable")
+                if self.positions is not None:
+                    positions[term] = gather_positions(
+                        positions[term], frequencies, sort
+                    )
+                if self.field_count:
+                    field_frequencies[term] = field_frequencies[term][sort]
+                ordinals = ordinals[sort]
+                frequencies = frequencies[sort]
+            index[term] = (ordinals, frequencies)
+
+        return index, doc_ids, doc_lengths, positions, field_frequencies, field_lengths
+
+
+def position_dtype(max_position: int) -> np.dtype:
+    """Narrowest unsigned integer type holding positions up to `max_position`
+
+    Descriptions are short, so positions usually take a single byte each.
+    """
+    for dtype in (np.uint8, np.uint16, np.uint32):
+        if max_position <= np.iinfo(dtype).max:
+            return np.dtype(dtype)
+    raise ValueError(f"document too long for positions: {max_position} words")
+
+
+def gather_positions(
+    positions: np.ndarray, frequencies: np.ndarray, selection: np.ndarray
+) -> np.ndarray:
+    """Positions of the selected postings of a term, in selection order
+
+    Args:
+        positions: The term's positions, one run per posting
+        frequencies: The term frequency, i.e. run length, of every posting
+        selection: Posting indices or a boolean mask over the postings
+
+    Returns:
+        The concatenated position runs of the selected postings
+    """
+    starts = (np.cumsum(frequencies, dtype=np.int64) - frequencies)[selection]
+    lengths = frequencies[selection].astype(np.int64)
+    run_starts = np.cumsum(lengths) - lengths
+    gather = np.repeat(starts - run_starts, lengths) + np.arange(int(lengths.sum()))
+    return positions[gather]
+
+
+def merge_postings(
+    parts: list[
+        tuple[
+            dict[str, tuple[np.ndarray, np.ndarray]],
+            np.ndarray,
+            np.ndarray,
+            dict[str, np.ndarray],
+            dict[str, np.ndarray],
+            np.ndarray,
+        ]
+    ],
+) -> tuple[
+    dict[str, tuple[np.ndarray, np.ndarray]],
+    np.ndarray,
+    np.ndarray,
+    dict[str, np.ndarray],
+    dict[str, np.ndarray],
+    np.ndarray,
+]:
+    """Combine postings built over disjoint sets of documents
+
+    Args:
+        parts: (index, doc_ids, doc_lengths, positions, field_frequencies,
+            field_lengths) as returned by `PostingsBuilder.build`, one per
+            set of documents
+
+    Returns:
+        The same tuple with ordinals renumbered in ascending document ID
+        order across all parts. Positions and fields are only kept if every
+        part has them.
+    """
+    if len(parts) == 1:
+        return parts[0]
+    has_positions = all(positions or not index for index, _, _, positions, *_ in parts)
+    field_count = min(field_lengths.shape[1] for *_, field_lengths in parts)
+    all_ids = np.concatenate([part[1] for part in parts])
+    order = np.argsort(all_ids, kind="stable")
+    ranks = np.empty_like(order, dtype=ORDINAL_DTYPE)
+    ranks[order] = np.arange(len(order), dtype=ORDINAL_DTYPE)
+    doc_ids = all_ids[order].astype(DOC_ID_DTYPE, copy=False)
+    doc_lengths = np.concatenate([part[2] for part in parts])[order]
+    field_lengths = np.concatenate([part[5][:, :field_count] for part in parts])[order]
+    # Every part stores positions in one dtype; keep the widest.
+    dtype = max(
+        (next(iter(part[3].values())).dtype for part in parts if part[3]),
+        key=lambda dtype: dtype.itemsize,
+        default=np.dtype(np.uint8),
+    )
+
+    collected: dict[str, list[tuple]] = {}
+    offset = 0
+    for index, part_ids, _, positions, field_frequencies, _ in parts:
+        part_ranks = ranks[offset : offset + len(part_ids)]
+        offset += len(part_ids)
+        for term, (ordinals, frequencies) in index.items():
+            collected.setdefault(term, []).append(
+                (
+                    part_ranks[ordinals],
+                    frequencies,
+                    positions[term] if has_positions else None,
+                    field_frequencies[term] if field_count else None,
+                )
+            )
+
+    merged = {}
+    merged_positions = {}
+    merged_fields = {}
+    for term, term_parts in collected.items():
+        if len(term_parts) == 1:
+            ordinals, frequencies, term_positions, term_fields = term_parts[0]
+            merged[term] = (ordinals, frequencies)
+            if has_positions:
+                merged_positions[term] = term_positions.astype(dtype)
+            if field_count:
+                merged_fields[term] = term_fields
+            continue
+        ordinals = np.concatenate([p[0] for p in term_parts])
+        frequencies = np.concatenate([p[1] for p in term_parts])
+        sort = np.argsort(ordinals, kind="stable")
+        merged[term] = (ordinals[sort], frequencies[sort])
+        if has_positions:
+            positions = np.concatenate([p[2].astype(dtype) for p in term_parts])
+            merged_positions[term] = gather_positions(positions, frequencies, sort)
+        if field_count:
+            merged_fields[term] = np.concatenate([p[3] for p in term_parts])[sort]
+    return (
+        merged,
+        doc_ids,
+        doc_lengths,
+        merged_positions,
+        merged_fields,
+        field_lengths,
+    )
+
+
+def find_ordinal(doc_ids: np.ndarray, doc_id: int) -> int | None:
+    ordinal = int(np.searchsorted(doc_ids, doc_id))
+    if ordinal < len(doc_ids) and doc_ids[ordinal] == doc_id:
+        return ordinal
+    return None
+
+
+def term_frequency(
+    postings: tuple[np.ndarray, np.ndarray] | None, ordinal: int | None
+) -> int:
+    if postings is None or ordinal is None:
+        return 0
+    ordinals, frequencies = postings
+    position = int(np.searchsorted(ordinals, ordinal))
+    if position < len(ordinals) and ordinals[position] == ordinal:
+        return int(frequencies[position])
+    return 0
+
+
+def _pack_bits(values: np.ndarray, width: int) -> np.ndarray:
+    if width == 0:
+        return np.empty(0, dtype=np.uint8)
+    shifts = np.arange(width - 1, -1, -1, dtype=np.uint32)
+    bits = (values.astype(np.uint32)[:, None] >> shifts) & 1
+    return np.packbits(bits.astype(np.uint8).ravel())
+
+
+def _unpack_bits(data: np.ndarray, count: int, width: int) -> np.ndarray:
+    if width == 0:
+        return np.zeros(count, dtype=np.int64)
+    bits = np.unpackbits(data, count=count * width).reshape(count, width)
+    weights = np.left_shift(1, np.arange(width - 1, -1, -1, dtype=np.int64))
+    return bits @ weights
+
+
+class CompressedPostings:
+    """Block-compressed postings list with skip data
+
+    Postings are cut into blocks of `POSTINGS_BLOCK_SIZE`. Within a block,
+    ordinals are stored as gaps from the previous ordinal and term
+    frequencies as tf - 1, each bit-packed at the smallest width that fits
+    the block (frame of reference). Per block, the skip data holds the last
+    ordinal, the byte offset of the block and both bit widths, so a reader
+    can jump to and decode a single block.
+    """
+
+    __slots__ = ("count", "data", "doc_bits", "last_docs", "offsets", "tf_bits")
+
+    def __init__(self, ordinals: np.ndarray, frequencies: np.ndarray) -> None:
+        self.count = len(ordinals)
+        block_count = -(-self.count // POSTINGS_BLOCK_SIZE)
+        self.last_docs = np.empty(block_count, dtype=ORDINAL_DTYPE)
+        self.offsets = np.empty(block_count, dtype=np.uint32)
+        self.doc_bits = np.empty(block_count, dtype=np.uint8)
+        self.tf_bits = np.empty(block_count, dtype=np.uint8)
+
+        chunks = []
+        offset = 0
+        previous = -1
+        for block in range(block_count):
+            start = block * POSTINGS_BLOCK_SIZE
+            block_ordinals = ordinals[start : start + POSTINGS_BLOCK_SIZE].astype(
+                np.int64
+            )
+            gaps = np.diff(block_ordinals, prepend=previous) - 1
+            tfs = frequencies[start : start + POSTINGS_BLOCK_SIZE].astype(np.int64) - 1
+            doc_bits = int(gaps.max()).bit_length()
+            tf_bits = int(tfs.max()).bit_length()
+
+            packed_docs = _pack_bits(gaps, doc_bits)
+            packed_tfs = _pack_bits(tfs, tf_bits)
+            chunks.extend([packed_docs, packed_tfs])
+
+            self.last_docs[block] = block_ordinals[-1]
+            self.offsets[block] = offset
+            self.doc_bits[block] = doc_bits
+            self.tf_bits[block] = tf_bits
+            offset += len(packed_docs) + len(packed_tfs)
+            previous = int(block_ordinals[-1])
+
+        self.data = np.concatenate(chunks) if chunks else np.empty(0, dtype=np.uint8)
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getstate__(self) -> tuple:
+        # Raw buffers pickle far smaller than one ndarray header per field,
+        # which matters for the long tail of terms with a single block.
+        return (
+            self.count,
+            self.last_docs.tobytes(),
+            self.offsets.tobytes(),
+            self.doc_bits.tobytes(),
+            self.tf_bits.tobytes(),
+            self.data.tobytes(),
+        )
+
+    def __setstate__(self, state: tuple) -> None:
+        self.count, last_docs, offsets, doc_bits, tf_bits, data = state
+        self.last_docs = np.frombuffer(last_docs, dtype=ORDINAL_DTYPE)
+        self.offsets = np.frombuffer(offsets, dtype=np.uint32)
+        self.doc_bits = np.frombuffer(doc_bits, dtype=np.uint8)
+        self.tf_bits = np.frombuffer(tf_bits, dtype=np.uint8)
+        self.data = np.frombuffer(data, dtype=np.uint8)
+
+    @classmethod
+    def from_arrays(
+        cls,
+        count: int,
+        last_docs: np.ndarray,
+        offsets: np.ndarray,
+        doc_bits: np.ndarray,
+        tf_bits: np.ndarray,
+        data: np.ndarray,
+    ) -> "CompressedPostings":
+        """Wrap already encoded blocks, e.g. views of a memory-mapped segment"""
+        postings = cls.__new__(cls)
+        postings.count = count
+        postings.last_docs = last_docs
+        postings.offsets = offsets
+        postings.doc_bits = doc_bits
+        postings.tf_bits = tf_bits
+        postings.data = data
+        return postings
+
+    @property
+    def nbytes(self) -> int:
+        return (
+            self.data.nbytes
+            + self.last_docs.nbytes
+            + self.offsets.nbytes
+            + self.doc_bits.nbytes
+            + self.tf_bits.nbytes
+        )
+
+    def decode_block(self, block: int) -> tuple[np.ndarray, np.ndarray]:
+        count = min(POSTINGS_BLOCK_SIZE, self.count - block * POSTINGS_BLOCK_SIZE)
+        doc_bits = int(self.doc_bits[block])
+        tf_bits = int(self.tf_bits[block])
+        start = int(self.offsets[block])
+        tf_start = start + -(-count * doc_bits // 8)
+        end = tf_start + -(-count * tf_bits // 8)
+
+        gaps = _unpack_bits(self.data[start:tf_start], count, doc_bits)
+        tfs = _unpack_bits(self.data[tf_start:end], count, tf_bits)
+        previous = int(self.last_docs[block - 1]) if block > 0 else -1
+        ordinals = (previous + np.cumsum(gaps + 1)).astype(ORDINAL_DTYPE)
+        return ordinals, (tfs + 1).astype(TF_DTYPE)
+
+    def contains(self, ordinals: np.ndarray) -> np.ndarray:
+        """Mask of the sorted `ordinals` present in the postings
+
+        The skip data locates the one block each ordinal can fall in, so only
+        the blocks holding a candidate are decoded.
+        """
+        found = np.zeros(len(ordinals), dtype=bool)
+        blocks = np.searchsorted(self.last_docs, ordinals)
+        touched, starts = np.unique(blocks, return_index=True)
+        ends = np.append(starts[1:], len(ordinals))
+        for block, start, end in zip(touched.tolist(), starts, ends):
+            if block >= len(self.last_docs):
+                break
+            block_ordinals = self.decode_block(block)[0]
+            found[start:end] = contains_ordinals(block_ordinals, ordinals[start:end])
+        return found
+
+    def decode(self) -> tuple[np.ndarray, np.ndarray]:
+        blocks = [self.decode_block(block) for block in range(len(self.last_docs))]
+        if not blocks:
+            return np.empty(0, dtype=ORDINAL_DTYPE), np.empty(0, dtype=TF_DTYPE)
+        ordinals, frequencies = zip(*blocks)
+        return np.concatenate(ordinals), np.concatenate(frequencies)
+
+
+def contains_ordinals(
+    postings: np.ndarray | CompressedPostings, ordinals: np.ndarray
+) -> np.ndarray:
+    """Mask of the sorted `ordinals` present in a postings list
+
+    Each ordinal is binary searched, so the cost grows with the number of
+    candidates rather than the length of the postings list.
+
+    Args:
+        postings: Sorted posting ordinals, or compressed postings
+        ordinals: Sorted candidate ordinals
+    """
+    if isinstance(postings, CompressedPostings):
+        return postings.contains(ordinals)
+    positions = np.searchsorted(postings, ordinals)
+    found = positions < len(postings)
+    found[found] = postings[positions[found]] == ordinals[found]
+    return found
+
+
+def compress_index(
+    index: dict[str, tuple[np.ndarray, np.ndarray]],
+) -> dict[str, CompressedPostings]:
+    return {term: CompressedPostings(*postings) for term, postings in index.items()}
+
+
+def decompress_index(
+    index: dict[str, CompressedPostings],
+) -> dict[str, tuple[np.ndarray, np.ndarray]]:
+    return {term: postings.decode() for term, postings in index.items()}
@@ -1,16 +1,30 @@
+import functools
 import json
 import os
 from time import sleep
 
 from dotenv import load_dotenv
-from google import genai
-from sentence_transformers import CrossEncoder
 
 load_dotenv()
-api_key = os.getenv("GEMINI_API_KEY")
-client = genai.Client(api_key=api_key)
 model = "gemini-2.0-flash"
-cross_encoder = CrossEncoder("cross-encoder/ms-marco-TinyBERT-L2-v2")
+CROSS_ENCODER_MODEL = "cross-encoder/ms-marco-TinyBERT-L2-v2"
+
+
+# The client and the model are created on first use rather than at import,
+# so that searches without reranking, and thin clients of the search server,
+# do not pay for them.
+@functools.cache
+def get_client():
+    from google import genai
+
+    return genai.Client(api_key=os.getenv("GEMINI_API_KEY"))
+
+
+@functools.cache
+def get_cross_encoder():
+    from sentence_transformers import CrossEncoder
+
+    return CrossEncoder(CROSS_ENCODER_MODEL)
 
 
 def llm_rerank_individual(
@@ -34,7 +48,7 @@ Give me ONLY the number in your response, no other text or explanation.
 
 Score:"""
 
-        response = client.models.generate_content(model=model, contents=prompt)
+        response = get_client().models.generate_content(model=model, contents=prompt)
         score_text = (response.text or "").strip()
         score = int(score_text)
         scored_docs.append({**doc, "individual_score": score})
@@ -71,7 +85,7 @@ Return ONLY the IDs in order of relevance (best match first). Return a valid JSO
 [75, 12, 34, 2, 1]
 """
 
-    response = client.models.generate_content(model=model, contents=prompt)
+    response = get_client().models.generate_content(model=model, contents=prompt)
     ranking_text = (response.text or "").strip()
 
     parsed_ids = json.loads(ranking_text)
@@ -91,7 +105,7 @@ def cross_encoder_rerank(
     for doc in documents:
         pairs.append([query, f"{doc.get('title', '')} - {doc.get('document', '')}"])
 
-    scores = cross_encoder.predict(pairs)
+    scores = get_cross_encoder().predict(pairs)
 
     for doc, score in zip(documents, scores):
         doc["crossencoder_score"] = float(score)
@@ -0,0 +1,132 @@
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Hashable
+
+from search.search_utils import RESULT_CACHE_SIZE, RESULT_CACHE_TTL
+
+
+class ResultCache:
+    """LRU cache of search results with an optional time to live
+
+    Size is counted in results rather than entries, as hybrid searches keep
+    result lists hundreds of times deeper than what they return. Results are
+    copied in and out, so callers are free to annotate the ones they get.
+
+    `clear` drops every entry and bumps `generation`, which searches built on
+    top of another engine fold into their own keys so they are invalidated
+    along with it.
+    """
+
+    def __init__(
+        self,
+        max_size: int = RESULT_CACHE_SIZE,
+        ttl: float | None = RESULT_CACHE_TTL,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        self.max_size = max_size
+        self.ttl = ttl
+        self.clock = clock
+        self.entries: OrderedDict[Hashable, tuple[float, list]] = OrderedDict()
+        self.size = 0
+        self.generation = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        self.lock = threading.Lock()
+
+    def get(self, key: Hashable) -> list | None:
+        with self.lock:
+            entry = self.entries.get(key)
+            expired = (
+                entry is not None
+                and self.ttl is not None
+                and self.clock() - entry[0] > self.ttl
+            )
+            if expired:
+                self.__remove(key)
+                self.expirations += 1
+                entry = None
+            if entry is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return copy_results(entry[1])
+
+    def put(self, key: Hashable, results: list) -> None:
+        if len(results) > self.max_size:
+            return
+        results = copy_results(results)
+        with self.lock:
+            if key in self.entries:
+                self.__remove(key)
+            self.entries[key] = (self.clock(), results)
+            self.size += len(results)
+            while self.size > self.max_size:
+                self.__remove(next(iter(self.entries)))
+                self.evictions += 1
+
+    def get_or_compute(self, key: Hashable, compute: Callable[[], list]) -> list:
+        """Cached results for a key, computing and storing them on a miss"""
+        results = self.get(key)
+        if results is None:
+            results = compute()
+            self.put(key, results)
+        return results
+
+    def get_or_compute_batch(
+        self, keys: list[Hashable], compute: Callable[[list[int]], list[list]]
+    ) -> list[list]:
+        """Cached results for many keys, computing all the misses in one call
+
+        Args:
+            keys: Cache key of every query
+            compute: Results for the positions in `keys` that missed, in order
+        """
+        results = [self.get(key) for key in keys]
+        missing = [i for i, cached in enumerate(results) if cached is None]
+        if missing:
+            for i, computed in zip(missing, compute(missing), strict=True):
+                self.put(keys[i], computed)
+                results[i] = computed
+        return results
+
+    def clear(self) -> None:
+        with self.lock:
+            self.entries.clear()
+            self.size = 0
+            self.generation += 1
+
+    def stats(self) -> dict:
+        with self.lock:
+            return {
+                "entries": len(self.entries),
+                "size": self.size,
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "generation": self.generation,
+            }
+
+    def __remove(self, key: Hashable) -> None:
+        _, results = self.entries.pop(key)
+        self.size -= len(results)
+
+
+def copy_results(results: list[dict]) -> list[dict]:
+    """Copy result dicts deep enough for callers to annotate them and their metadata"""
+    return [
+        {**result, "metadata": {**result["metadata"]}}
+        if "metadata" in result
+        else {**result}
+        for result in results
+    ]
+
+
+def normalize_query(query: str) -> str:
+    """Query text with runs of whitespace collapsed, for raw-text cache keys"""
+    return " ".join(query.split())
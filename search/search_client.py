@@ -0,0 +1,45 @@
+import json
+import urllib.error
+import urllib.request
+from typing import Any
+
+SEARCH_SERVER_HOST = "127.0.0.1"
+SEARCH_SERVER_PORT = 8765
+SEARCH_SERVER_URL = f"http://{SEARCH_SERVER_HOST}:{SEARCH_SERVER_PORT}"
+
+
+def server_request(url: str, path: str, payload: dict | None = None) -> Any:
+    """Send a request to a running search server and decode its JSON answer
+
+    Only the standard library is imported, so a thin client starts without
+    loading NumPy, the models or the index.
+
+    Args:
+        url: Base URL of the server, e.g. `SEARCH_SERVER_URL`
+        path: Endpoint, e.g. "/keyword"
+        payload: Arguments of the endpoint, sent as a POST body; None for a GET
+
+    Raises:
+        ValueError: The server rejected the request
+        RuntimeError: The server failed to answer the request
+        ConnectionError: No server answers at `url`
+    """
+    data = json.dumps(payload).encode() if payload is not None else None
+    request = urllib.request.Request(
+        url.rstrip("/") + path,
+        data=data,
+        headers={"Content-Type": "application/json"},
+    )
+    try:
+        with urllib.request.urlopen(request) as response:
+            return json.load(response)
+    except urllib.error.HTTPError as e:
+        try:
+            error = json.load(e).get("error", e.reason)
+        except ValueError:
+            error = e.reason
+        if e.code >= 500:
+            raise RuntimeError(f"search server error: {error}") from e
+        raise ValueError(error) from e
+    except urllib.error.URLError as e:
+        raise ConnectionError(f"no search server at {url}: {e.reason}") from e
@@ -0,0 +1,206 @@
+import json
+from collections.abc import Callable
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, HTTPServer
+from typing import Any
+
+from search.batch import json_default
+from search.hybrid_search import (
+    HybridSearch,
+    rrf_search_command,
+    weighted_search_command,
+)
+from search.keyword_search import InvertedIndex, bm25search_command, search_command
+from search.reranking import get_cross_encoder
+from search.search_client import SEARCH_SERVER_HOST, SEARCH_SERVER_PORT
+from search.search_utils import (
+    DEFAULT_ALPHA,
+    DEFAULT_SEARCH_LIMIT,
+    RRF_K,
+    load_movies,
+)
+from search.semantic_search import ChunkedSemanticSearch, search_chunked_command
+
+
+class SearchService:
+    """Search engines loaded on first use and kept for every later request
+
+    The keyword, semantic and hybrid endpoints share one index and one set
+    of embeddings, and the command functions of each engine answer with the
+    same dicts as the CLIs print from.
+    """
+
+    def __init__(self) -> None:
+        self.movies: list[dict] | None = None
+        self.idx: InvertedIndex | None = None
+        self.semantic_search: ChunkedSemanticSearch | None = None
+        self.hybrid_search: HybridSearch | None = None
+
+    def documents(self) -> list[dict]:
+        if self.movies is None:
+            self.movies = load_movies()
+        return self.movies
+
+    def index(self) -> InvertedIndex:
+        if self.idx is None:
+            idx = InvertedIndex()
+            idx.load()
+            self.idx = idx
+        return self.idx
+
+    def chunk_search(self) -> ChunkedSemanticSearch:
+        if self.semantic_search is None:
+            searcher = ChunkedSemanticSearch()
+            searcher.load_or_create_chunk_embeddings(self.documents())
+            self.semantic_search = searcher
+        return self.semantic_search
+
+    def hybrid(self) -> HybridSearch:
+        if self.hybrid_search is None:
+            self.hybrid_search = HybridSearch(
+                self.documents(), semantic_search=self.chunk_search(), idx=self.index()
+            )
+        return self.hybrid_search
+
+    def preload(self) -> None:
+        """Load every engine and model up front instead of on first use"""
+        self.hybrid()
+        get_cross_encoder()
+
+    def keyword(
+        self,
+        query: str,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        mode: str = "exhaustive",
+        feedback: bool = False,
+    ) -> dict:
+        results = bm25search_command(query, limit, mode, feedback, self.index())
+        return {"query": query, "results": results}
+
+    def boolean(
+        self,
+        query: str,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+        rank: bool = False,
+        default_operator: str = "or",
+    ) -> dict:
+        results = search_command(query, limit, rank, default_operator, self.index())
+        return {"query": query, "results": results}
+
+    def semantic(
+        self, query: str, limit: int = DEFAULT_SEARCH_LIMIT, aggregation: str = "max"
+    ) -> dict:
+        return search_chunked_command(query, limit, self.chunk_search(), aggregation)
+
+    def weighted(
+        self,
+        query: str,
+        alpha: float = DEFAULT_ALPHA,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+    ) -> dict:
+        return weighted_search_command(query, alpha, limit, self.hybrid())
+
+    def rrf(
+        self,
+        query: str,
+        k: int = RRF_K,
+        enhance: str | None = None,
+        rerank_method: str | None = None,
+        limit: int = DEFAULT_SEARCH_LIMIT,
+    ) -> dict:
+        return rrf_search_command(
+            query, k, enhance, rerank_method, limit, self.hybrid()
+        )
+
+    def stats(self) -> dict:
+        """Result cache statistics of the engines loaded so far"""
+        caches = {
+            "keyword": self.idx,
+            "semantic": self.semantic_search,
+            "hybrid": self.hybrid_search,
+        }
+        return {
+            name: engine.result_cache.stats()
+            for name, engine in caches.items()
+            if engine is not None
+        }
+
+
+ROUTES: dict[str, Callable[..., dict]] = {
+    "/keyword": SearchService.keyword,
+    "/boolean": SearchService.boolean,
+    "/semantic": SearchService.semantic,
+    "/hybrid/weighted": SearchService.weighted,
+    "/hybrid/rrf": SearchService.rrf,
+    "/stats": SearchService.stats,
+}
+
+
+class SearchServer(HTTPServer):
+    """HTTP server answering search requests from one `SearchService`
+
+    Requests are handled one at a time, as the engines are loaded lazily and
+    are not thread-safe.
+    """
+
+    def __init__(self, address: tuple[str, int], service: SearchService) -> None:
+        super().__init__(address, SearchRequestHandler)
+        self.service = service
+
+
+class SearchRequestHandler(BaseHTTPRequestHandler):
+    server: SearchServer
+
+    def do_GET(self) -> None:
+        self.__dispatch({})
+
+    def do_POST(self) -> None:
+        length = int(self.headers.get("Content-Length", 0))
+        try:
+            payload = json.loads(self.rfile.read(length) or b"{}")
+        except json.JSONDecodeError as e:
+            self.__send(HTTPStatus.BAD_REQUEST, {"error": f"invalid JSON: {e}"})
+            return
+        self.__dispatch(payload)
+
+    def __dispatch(self, payload: Any) -> None:
+        route = ROUTES.get(self.path)
+        if route is None:
+            self.__send(HTTPStatus.NOT_FOUND, {"error": f"no endpoint {self.path}"})
+            return
+        if not isinstance(payload, dict):
+            self.__send(HTTPStatus.BAD_REQUEST, {"error": "expected a JSON object"})
+            return
+        try:
+            body = route(self.server.service, **payload)
+        except (TypeError, ValueError) as e:
+            self.__send(HTTPStatus.BAD_REQUEST, {"error": str(e)})
+        except Exception as e:  # noqa: BLE001
+            # Missing files, model or API failures: still answer, so clients
+            # see the error instead of a dropped connection.
+            self.log_error("%s failed: %r", self.path, e)
+            self.__send(
+                HTTPStatus.INTERNAL_SERVER_ERROR, {"error": f"{type(e).__name__}: {e}"}
+            )
+        else:
+            self.__send(HTTPStatus.OK, body)
+
+    def __send(self, status: HTTPStatus, body: dict) -> None:
+        data = json.dumps(body, default=json_default).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+def serve_command(
+    host: str = SEARCH_SERVER_HOST,
+    port: int = SEARCH_SERVER_PORT,
+    preload: bool = False,
+) -> None:
+    service = SearchService()
+    if preload:
+        service.preload()
+    with SearchServer((host, port), service) as server:
+        server.serve_forever()
@@ -1,7 +1,11 @@
 import json
 import os
+from collections.abc import Iterator
 from typing import Any
 
+from search.analyzer import Analyzer, load_analyzer
+from search.corpus import iter_documents
+
 DEFAULT_ALPHA = 0.5
 RRF_K = 60
 SEARCH_MULTIPLIER = 5
@@ -13,6 +17,15 @@ SCORE_PRECISION = 3
 BM25_K1 = 1.5
 BM25_B = 0.75
 
+# RM3 pseudo-relevance feedback: documents and terms taken from the first
+# pass, and the share of the final query weight kept by the original terms.
+FEEDBACK_DOCS = 10
+FEEDBACK_TERMS = 10
+FEEDBACK_ORIGINAL_WEIGHT = 0.5
+
+INDEX_FIELDS = ("title", "description")
+DEFAULT_FIELD_WEIGHTS = {"title": 2.0, "description": 1.0}
+
 PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(__file__)))
 DATA_PATH = os.path.join(PROJECT_ROOT, "hoopla", "data", "movies.json")
 STOPWORDS_PATH = os.path.join(PROJECT_ROOT, "hoopla", "data", "stopwords.txt")
@@ -23,16 +36,42 @@ CACHE_DIR = os.path.join(PROJECT_ROOT, "hoopla", "cache")
 DEFAULT_CHUNK_SIZE = 200
 DEFAULT_CHUNK_OVERLAP = 1
 DEFAULT_SEMANTIC_CHUNK_SIZE = 4
+DEFAULT_CHUNK_TOP_K = 3
+
+INDEX_BATCH_SIZE = 1000
+RESULT_CACHE_SIZE = 200_000
+RESULT_CACHE_TTL = 600.0
+EMBEDDING_BATCH_SIZE = 256
+EMBEDDING_SCORE_BLOCK_ROWS = 16_384
+DEFAULT_EMBEDDING_FORMAT = "int8"
+HNSW_M = 16
+HNSW_EF_CONSTRUCTION = 100
+HNSW_EF_SEARCH = 64
+HNSW_CANDIDATES_PER_RESULT = 4
+BATCH_QUERY_SIZE = 256
 
 MOVIE_EMBEDDINGS_PATH = os.path.join(CACHE_DIR, "movie_embeddings.npy")
 CHUNK_EMBEDDINGS_PATH = os.path.join(CACHE_DIR, "chunk_embeddings.npy")
-CHUNK_METADATA_PATH = os.path.join(CACHE_DIR, "chunk_metadata.json")
+CHUNK_METADATA_PATH = os.path.join(CACHE_DIR, "chunk_metadata.npy")
+CHUNK_METADATA_JSON_PATH = os.path.join(CACHE_DIR, "chunk_metadata.json")
+CHUNK_HNSW_PATH = os.path.join(CACHE_DIR, "chunk_hnsw.npz")
+
+
+def iter_movies(path: str | None = None) -> Iterator[dict]:
+    """Stream movies one at a time from the corpus
+
+    Args:
+        path: A JSON file with a "movies" array or a JSON Lines file with one
+            movie per line, `DATA_PATH` by default
+
+    Returns:
+        Iterator over the movies in file order
+    """
+    return iter_documents(path or DATA_PATH, "movies")
 
 
 def load_movies() -> list[dict]:
-    with open(DATA_PATH, "r") as f:
-        data = json.load(f)
-    return data["movies"]
+    return list(iter_movies())
 
 
 def load_stopwords() -> list[str]:
@@ -40,6 +79,10 @@ def load_stopwords() -> list[str]:
         return f.read().splitlines()
 
 
+def get_analyzer() -> Analyzer:
+    return load_analyzer(STOPWORDS_PATH)
+
+
 def format_search_result(
     doc_id: str, title: str, document: str, score: float, **metadata: Any
 ) -> dict[str, Any]:
@@ -0,0 +1,707 @@
+import json
+import os
+import shutil
+from collections.abc import Callable, Iterator, Mapping
+from typing import Any
+
+import numpy as np
+
+from search.bm25 import (
+    average_doc_length,
+    block_max_impacts,
+    compute_impacts,
+    quantize_impacts,
+)
+from search.postings import (
+    DOC_ID_DTYPE,
+    ORDINAL_DTYPE,
+    TF_DTYPE,
+    CompressedPostings,
+    compress_index,
+    find_ordinal,
+    gather_positions,
+    merge_postings,
+)
+
+SEGMENT_VERSION = 1
+SEGMENT_META_FILE = "meta.json"
+SEGMENTS_MANIFEST = "segments.json"
+SEGMENT_PREFIX = "segment_"
+MERGE_FACTOR = 8
+MAX_DELETED_RATIO = 0.3
+
+
+def _array_path(directory: str, name: str) -> str:
+    return os.path.join(directory, f"{name}.npy")
+
+
+def _write_array(directory: str, name: str, array: np.ndarray) -> None:
+    np.save(_array_path(directory, name), array, allow_pickle=False)
+
+
+def _open_array(directory: str, name: str) -> np.ndarray:
+    # asarray drops the memmap subclass but keeps the view on the mapping, so
+    # slices and arithmetic behave like any other ndarray.
+    return np.asarray(np.load(_array_path(directory, name), mmap_mode="r"))
+
+
+def _offsets(lengths: list[int]) -> np.ndarray:
+    offsets = np.zeros(len(lengths) + 1, dtype=np.int64)
+    np.cumsum(lengths, out=offsets[1:])
+    return offsets
+
+
+def _concatenate(arrays: list[np.ndarray], dtype) -> np.ndarray:
+    if not arrays:
+        return np.empty(0, dtype=dtype)
+    return np.concatenate(arrays).astype(dtype, copy=False)
+
+
+def _blob(items: list[bytes]) -> tuple[np.ndarray, np.ndarray]:
+    data = np.frombuffer(b"".join(items), dtype=np.uint8)
+    return data, _offsets([len(item) for item in items])
+
+
+class TermDictionary:
+    """Sorted term strings stored as one UTF-8 blob, searched without decoding it
+
+    Indexing decodes a single term, so the dictionary can also be bisected
+    like a sorted list of strings.
+    """
+
+    def __init__(self, data: np.ndarray, offsets: np.ndarray) -> None:
+        self.data = data
+        self.offsets = offsets
+
+    def __len__(self) -> int:
+        return len(self.offsets) - 1
+
+    def term_bytes(self, position: int) -> bytes:
+        return self.data[self.offsets[position] : self.offsets[position + 1]].tobytes()
+
+    def __getitem__(self, position: int) -> str:
+        return self.term_bytes(position).decode()
+
+    def __iter__(self) -> Iterator[str]:
+        for position in range(len(self)):
+            yield self.term_bytes(position).decode()
+
+    def find(self, term: str) -> int | None:
+        # UTF-8 byte order is code point order, so the blob is searched on
+        # raw bytes.
+        target = term.encode()
+        low, high = 0, len(self)
+        while low < high:
+            middle = (low + high) // 2
+            if self.term_bytes(middle) < target:
+                low = middle + 1
+            else:
+                high = middle
+        if low < len(self) and self.term_bytes(low) == target:
+            return low
+        return None
+
+
+class TermMapping(Mapping):
+    """Read-only dict-like view of one per-term value of a segment"""
+
+    def __init__(self, terms: TermDictionary, value: Callable[[int], Any]) -> None:
+        self.terms = terms
+        self.value = value
+
+    def __getitem__(self, term: str) -> Any:
+        position = self.terms.find(term)
+        if position is None:
+            raise KeyError(term)
+        return self.value(position)
+
+    def __contains__(self, term: object) -> bool:
+        return isinstance(term, str) and self.terms.find(term) is not None
+
+    def __iter__(self) -> Iterator[str]:
+        return iter(self.terms)
+
+    def __len__(self) -> int:
+        return len(self.terms)
+
+    def items(self) -> Iterator[tuple[str, Any]]:
+        # Walk the dictionary in order instead of searching it once per term.
+        for position, term in enumerate(self.terms):
+            yield term, self.value(position)
+
+
+class DocumentMap(Mapping):
+    """Read-only doc_id -> document view decoding one JSON document on access
+
+    Iterates in the order documents were added to the index, like the dict
+    it replaces.
+    """
+
+    def __init__(
+        self,
+        doc_ids: np.ndarray,
+        slots: np.ndarray,
+        insertion_ids: np.ndarray,
+        data: np.ndarray,
+        offsets: np.ndarray,
+    ) -> None:
+        self.doc_ids = doc_ids
+        self.slots = slots
+        self.insertion_ids = insertion_ids
+        self.data = data
+        self.offsets = offsets
+
+    def __getitem__(self, doc_id: int) -> dict:
+        ordinal = find_ordinal(self.doc_ids, doc_id)
+        if ordinal is None:
+            raise KeyError(doc_id)
+        slot = self.slots[ordinal]
+        return json.loads(
+            self.data[self.offsets[slot] : self.offsets[slot + 1]].tobytes()
+        )
+
+    def __contains__(self, doc_id: object) -> bool:
+        return (
+            isinstance(doc_id, (int, np.integer))
+            and find_ordinal(self.doc_ids, doc_id) is not None
+        )
+
+    def __iter__(self) -> Iterator[int]:
+        for slot in range(len(self.insertion_ids)):
+            yield int(self.insertion_ids[slot])
+
+    def __len__(self) -> int:
+        return len(self.insertion_ids)
+
+
+class Segment:
+    """An index opened from flat `.npy` files with `mmap`
+
+    Opening reads only the small metadata file. Postings, statistics and
+    documents are paged in lazily when a query touches them, and processes
+    opening the same segment share the page cache.
+    """
+
+    def __init__(self, directory: str, deletes_path: str | None = None) -> None:
+        with open(os.path.join(directory, SEGMENT_META_FILE)) as f:
+            meta = json.load(f)
+        if meta["version"] != SEGMENT_VERSION:
+            raise ValueError(f"unsupported segment version {meta['version']}")
+        self.directory = directory
+        self.index_format = meta["index_format"]
+        self.avg_doc_length = meta["avg_doc_length"]
+        self.impact_scale = meta["impact_scale"]
+
+        self.doc_ids = _open_array(directory, "doc_ids")
+        self.doc_lengths = _open_array(directory, "doc_lengths")
+        self.docmap = DocumentMap(
+            self.doc_ids,
+            _open_array(directory, "document_slots"),
+            _open_array(directory, "document_ids"),
+            _open_array(directory, "documents"),
+            _open_array(directory, "document_offsets"),
+        )
+
+        self.terms = TermDictionary(
+            _open_array(directory, "terms"), _open_array(directory, "term_offsets")
+        )
+        term_idf = _open_array(directory, "term_idf")
+        self.term_idf = TermMapping(self.terms, lambda i: float(term_idf[i]))
+
+        postings_offsets = _open_array(directory, "postings_offsets")
+        block_offsets = _open_array(directory, "block_offsets")
+        block_maxes = _open_array(directory, "block_maxes")
+        self.block_max_impacts = TermMapping(
+            self.terms, lambda i: block_maxes[block_offsets[i] : block_offsets[i + 1]]
+        )
+
+        self.positions: TermMapping | None = None
+        if meta.get("positions"):
+            positions_offsets = _open_array(directory, "positions_offsets")
+            positions = _open_array(directory, "positions")
+            self.positions = TermMapping(
+                self.terms,
+                lambda i: positions[positions_offsets[i] : positions_offsets[i + 1]],
+            )
+
+        self.fields: tuple[str, ...] = tuple(meta.get("fields", ()))
+        self.field_lengths: np.ndarray | None = None
+        self.field_frequencies: TermMapping | None = None
+        if self.fields:
+            self.field_lengths = _open_array(directory, "field_lengths")
+            field_frequencies = _open_array(directory, "field_frequencies")
+            self.field_frequencies = TermMapping(
+                self.terms,
+                lambda i: field_frequencies[
+                    postings_offsets[i] : postings_offsets[i + 1]
+                ],
+            )
+
+        # Deleted documents stay in the postings until the segment is merged
+        # away; `live` masks them out by ordinal.
+        self.live: np.ndarray | None = None
+        self.live_count = len(self.doc_ids)
+        if deletes_path is not None:
+            deleted = np.unpackbits(np.load(deletes_path), count=len(self.doc_ids))
+            self.live = deleted == 0
+            self.live_count = int(self.live.sum())
+
+        if self.index_format == "compressed":
+            self.index = TermMapping(
+                self.terms, self.__compressed_postings(postings_offsets, block_offsets)
+            )
+            self.impacts = {}
+            return
+
+        ordinals = _open_array(directory, "ordinals")
+        frequencies = _open_array(directory, "frequencies")
+        impacts = _open_array(directory, "impacts")
+        self.index = TermMapping(
+            self.terms,
+            lambda i: (
+                ordinals[postings_offsets[i] : postings_offsets[i + 1]],
+                frequencies[postings_offsets[i] : postings_offsets[i + 1]],
+            ),
+        )
+        self.impacts = TermMapping(
+            self.terms, lambda i: impacts[postings_offsets[i] : postings_offsets[i + 1]]
+        )
+
+    def __compressed_postings(
+        self, postings_offsets: np.ndarray, block_offsets: np.ndarray
+    ) -> Callable[[int], CompressedPostings]:
+        last_docs = _open_array(self.directory, "last_docs")
+        data_offsets = _open_array(self.directory, "data_offsets")
+        block_data_offsets = _open_array(self.directory, "block_data_offsets")
+        doc_bits = _open_array(self.directory, "doc_bits")
+        tf_bits = _open_array(self.directory, "tf_bits")
+        data = _open_array(self.directory, "data")
+
+        def postings(i: int) -> CompressedPostings:
+            blocks = slice(block_offsets[i], block_offsets[i + 1])
+            return CompressedPostings.from_arrays(
+                int(postings_offsets[i + 1] - postings_offsets[i]),
+                last_docs[blocks],
+                block_data_offsets[blocks],
+                doc_bits[blocks],
+                tf_bits[blocks],
+                data[data_offsets[i] : data_offsets[i + 1]],
+            )
+
+        return postings
+
+    def live_ordinal(self, doc_id: int) -> int | None:
+        ordinal = find_ordinal(self.doc_ids, doc_id)
+        if ordinal is None or (self.live is not None and not self.live[ordinal]):
+            return None
+        return ordinal
+
+    def postings(self, term: str) -> tuple[np.ndarray, np.ndarray] | None:
+        postings = self.index.get(term)
+        if postings is not None and self.index_format == "compressed":
+            return postings.decode()
+        return postings
+
+    def live_postings(self, term: str) -> tuple[np.ndarray, np.ndarray]:
+        """(ordinals, term frequencies) of the term in documents not deleted"""
+        postings = self.postings(term)
+        if postings is None:
+            return np.empty(0, dtype=ORDINAL_DTYPE), np.empty(0, dtype=TF_DTYPE)
+        ordinals, frequencies = postings
+        if self.live is not None:
+            keep = self.live[ordinals]
+            return ordinals[keep], frequencies[keep]
+        return ordinals, frequencies
+
+    def live_positional_postings(
+        self, term: str
+    ) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """(ordinals, term frequencies, positions) of the term in live documents"""
+        if self.positions is None:
+            raise ValueError(f"segment {self.directory} has no positions")
+        postings = self.postings(term)
+        if postings is None:
+            return (
+                np.empty(0, dtype=ORDINAL_DTYPE),
+                np.empty(0, dtype=TF_DTYPE),
+                np.empty(0, dtype=np.uint8),
+            )
+        ordinals, frequencies = postings
+        positions = self.positions[term]
+        if self.live is not None:
+            keep = self.live[ordinals]
+            positions = gather_positions(positions, frequencies, keep)
+            return ordinals[keep], frequencies[keep], positions
+        return ordinals, frequencies, positions
+
+    def live_field_postings(self, term: str) -> tuple[np.ndarray, np.ndarray]:
+        """(ordinals, per-field term frequencies) of the term in live documents"""
+        if self.field_frequencies is None:
+            raise ValueError(f"segment {self.directory} has no fields")
+        postings = self.postings(term)
+        if postings is None:
+            return (
+                np.empty(0, dtype=ORDINAL_DTYPE),
+                np.empty((0, len(self.fields)), dtype=TF_DTYPE),
+            )
+        ordinals = postings[0]
+        field_frequencies = self.field_frequencies[term]
+        if self.live is not None:
+            keep = self.live[ordinals]
+            return ordinals[keep], field_frequencies[keep]
+        return ordinals, field_frequencies
+
+
+class LiveDocumentMap(Mapping):
+    """Read-only doc_id -> document view over the live documents of segments"""
+
+    def __init__(self, segments: list[Segment]) -> None:
+        self.segments = segments
+
+    def __getitem__(self, doc_id: int) -> dict:
+        for segment in self.segments:
+            if segment.live_ordinal(doc_id) is not None:
+                return segment.docmap[doc_id]
+        raise KeyError(doc_id)
+
+    def __contains__(self, doc_id: object) -> bool:
+        return any(
+            segment.live_ordinal(doc_id) is not None for segment in self.segments
+        )
+
+    def __iter__(self) -> Iterator[int]:
+        for segment in self.segments:
+            for doc_id in segment.docmap:
+                if segment.live is None or segment.live_ordinal(doc_id) is not None:
+                    yield doc_id
+
+    def __len__(self) -> int:
+        return sum(segment.live_count for segment in self.segments)
+
+
+def write_segment(
+    directory: str,
+    index: Mapping[str, tuple[np.ndarray, np.ndarray]],
+    doc_ids: np.ndarray,
+    doc_lengths: np.ndarray,
+    docmap: Mapping[int, dict],
+    term_idf: Mapping[str, float],
+    impacts: Mapping[str, np.ndarray],
+    block_max_impacts: Mapping[str, np.ndarray],
+    avg_doc_length: float,
+    impact_scale: float | None,
+    index_format: str = "arrays",
+    positions: Mapping[str, np.ndarray] | None = None,
+    fields: tuple[str, ...] = (),
+    field_frequencies: Mapping[str, np.ndarray] | None = None,
+    field_lengths: np.ndarray | None = None,
+) -> None:
+    """Write an index as a segment directory
+
+    The segment is written next to `directory` and swapped in once complete,
+    so readers never see a half-written segment and already opened mappings
+    of the previous one stay valid.
+
+    Args:
+        directory: Segment directory to create or replace
+        index: Uncompressed (ordinals, term frequencies) postings per term
+        doc_ids: Document ID of every ordinal
+        doc_lengths: Token count of every ordinal
+        docmap: Documents by ID, in insertion order
+        term_idf: BM25 IDF per term
+        impacts: Per-posting impact scores per term, unused when compressed
+        block_max_impacts: Per-block maximum impact per term
+        avg_doc_length: Mean document length
+        impact_scale: Dequantization scale for 8-bit impacts, None if unquantized
+        index_format: "arrays" or "compressed" postings
+        positions: Word positions per term, one run per posting, if recorded
+        fields: Names of the fields documents were split into, if any
+        field_frequencies: (postings, fields) term frequencies per term
+        field_lengths: (documents, fields) token count of every field
+    """
+    staging = f"{directory}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    os.makedirs(staging)
+
+    terms = sorted(index, key=str.encode)
+    data, offsets = _blob([term.encode() for term in terms])
+    _write_array(staging, "terms", data)
+    _write_array(staging, "term_offsets", offsets)
+    _write_array(
+        staging,
+        "term_idf",
+        np.array([term_idf[term] for term in terms], dtype=np.float64),
+    )
+
+    postings = [index[term] for term in terms]
+    _write_array(staging, "postings_offsets", _offsets([len(p[0]) for p in postings]))
+    term_block_maxes = [block_max_impacts[term] for term in terms]
+    _write_array(staging, "block_offsets", _offsets([len(m) for m in term_block_maxes]))
+    block_dtype = np.uint8 if impact_scale is not None else np.float64
+    _write_array(staging, "block_maxes", _concatenate(term_block_maxes, block_dtype))
+
+    if index_format == "compressed":
+        compressed = compress_index(dict(zip(terms, postings)))
+        blocks = [compressed[term] for term in terms]
+        _write_array(
+            staging,
+            "last_docs",
+            _concatenate([b.last_docs for b in blocks], ORDINAL_DTYPE),
+        )
+        _write_array(
+            staging,
+            "block_data_offsets",
+            _concatenate([b.offsets for b in blocks], np.uint32),
+        )
+        _write_array(
+            staging, "doc_bits", _concatenate([b.doc_bits for b in blocks], np.uint8)
+        )
+        _write_array(
+            staging, "tf_bits", _concatenate([b.tf_bits for b in blocks], np.uint8)
+        )
+        _write_array(staging, "data_offsets", _offsets([len(b.data) for b in blocks]))
+        _write_array(staging, "data", _concatenate([b.data for b in blocks], np.uint8))
+    else:
+        _write_array(
+            staging, "ordinals", _concatenate([p[0] for p in postings], ORDINAL_DTYPE)
+        )
+        _write_array(
+            staging, "frequencies", _concatenate([p[1] for p in postings], TF_DTYPE)
+        )
+        _write_array(
+            staging,
+            "impacts",
+            _concatenate([impacts[term] for term in terms], block_dtype),
+        )
+
+    if positions is not None:
+        term_positions = [positions[term] for term in terms]
+        _write_array(
+            staging, "positions_offsets", _offsets([len(p) for p in term_positions])
+        )
+        # Positions of one index share the narrowest dtype fitting them all.
+        dtype = term_positions[0].dtype if term_positions else np.uint8
+        _write_array(staging, "positions", _concatenate(term_positions, dtype))
+
+    if fields:
+        _write_array(
+            staging,
+            "field_frequencies",
+            _concatenate([field_frequencies[term] for term in terms], TF_DTYPE)
+            if terms
+            else np.empty((0, len(fields)), dtype=TF_DTYPE),
+        )
+        _write_array(
+            staging, "field_lengths", np.asarray(field_lengths, dtype=TF_DTYPE)
+        )
+
+    _write_array(staging, "doc_ids", np.asarray(doc_ids, dtype=DOC_ID_DTYPE))
+    _write_array(staging, "doc_lengths", np.asarray(doc_lengths, dtype=TF_DTYPE))
+    insertion_ids = np.fromiter(docmap, dtype=DOC_ID_DTYPE, count=len(docmap))
+    slots = np.empty(len(insertion_ids), dtype=np.int64)
+    slots[np.searchsorted(doc_ids, insertion_ids)] = np.arange(len(insertion_ids))
+    data, offsets = _blob(
+        [json.dumps(docmap[doc_id]).encode() for doc_id in insertion_ids.tolist()]
+    )
+    _write_array(staging, "documents", data)
+    _write_array(staging, "document_offsets", offsets)
+    _write_array(staging, "document_ids", insertion_ids)
+    _write_array(staging, "document_slots", slots)
+
+    with open(os.path.join(staging, SEGMENT_META_FILE), "w") as f:
+        json.dump(
+            {
+                "version": SEGMENT_VERSION,
+                "index_format": index_format,
+                "avg_doc_length": avg_doc_length,
+                "impact_scale": impact_scale,
+                "positions": positions is not None,
+                "fields": list(fields),
+            },
+            f,
+        )
+
+    shutil.rmtree(directory, ignore_errors=True)
+    os.replace(staging, directory)
+
+
+def build_segment(
+    directory: str,
+    index: Mapping[str, tuple[np.ndarray, np.ndarray]],
+    doc_ids: np.ndarray,
+    doc_lengths: np.ndarray,
+    docmap: Mapping[int, dict],
+    quantize: bool = False,
+    index_format: str = "arrays",
+    positions: Mapping[str, np.ndarray] | None = None,
+    fields: tuple[str, ...] = (),
+    field_frequencies: Mapping[str, np.ndarray] | None = None,
+    field_lengths: np.ndarray | None = None,
+) -> None:
+    """Compute the BM25 statistics of postings and write them as a segment"""
+    avg_doc_length = average_doc_length(doc_lengths)
+    term_idf, impacts = compute_impacts(index, doc_lengths, avg_doc_length)
+    impact_scale = None
+    if quantize:
+        impacts, impact_scale = quantize_impacts(impacts)
+    write_segment(
+        directory,
+        index,
+        doc_ids,
+        doc_lengths,
+        docmap,
+        term_idf,
+        impacts,
+        block_max_impacts(impacts),
+        avg_doc_length,
+        impact_scale,
+        index_format,
+        positions,
+        fields,
+        field_frequencies,
+        field_lengths,
+    )
+
+
+def merge_segments(segments: list[Segment], directory: str) -> None:
+    """Write the live documents of `segments` as one new segment
+
+    Postings are remapped to the merged ordinals rather than re-tokenized.
+    The merged segment keeps the format and quantization of the largest
+    source segment.
+    """
+    has_positions = all(segment.positions is not None for segment in segments)
+    fields = segments[0].fields
+    if any(segment.fields != fields for segment in segments):
+        fields = ()
+    parts = []
+    for segment in segments:
+        live = segment.live
+        if live is None:
+            live = np.ones(len(segment.doc_ids), dtype=bool)
+        remap = (np.cumsum(live) - 1).astype(ORDINAL_DTYPE)
+        index = {}
+        positions = {}
+        field_frequencies = {}
+        for term, postings in segment.index.items():
+            if segment.index_format == "compressed":
+                postings = postings.decode()
+            keep = live[postings[0]]
+            if keep.any():
+                index[term] = (remap[postings[0][keep]], postings[1][keep])
+                if has_positions:
+                    positions[term] = gather_positions(
+                        segment.positions[term], postings[1], keep
+                    )
+                if fields:
+                    field_frequencies[term] = segment.field_frequencies[term][keep]
+        field_lengths = (
+            segment.field_lengths[live]
+            if fields
+            else np.empty((live.sum(), 0), dtype=TF_DTYPE)
+        )
+        parts.append(
+            (
+                index,
+                segment.doc_ids[live],
+                segment.doc_lengths[live],
+                positions,
+                field_frequencies,
+                field_lengths,
+            )
+        )
+    index, doc_ids, doc_lengths, positions, field_frequencies, field_lengths = (
+        merge_postings(parts)
+    )
+
+    docmap = {}
+    for segment in segments:
+        for doc_id in segment.docmap:
+            if segment.live_ordinal(doc_id) is not None:
+                docmap[doc_id] = segment.docmap[doc_id]
+
+    largest = max(segments, key=lambda segment: segment.live_count)
+    build_segment(
+        directory,
+        index,
+        doc_ids,
+        doc_lengths,
+        docmap,
+        quantize=largest.impact_scale is not None,
+        index_format=largest.index_format,
+        positions=positions if has_positions else None,
+        fields=fields,
+        field_frequencies=field_frequencies,
+        field_lengths=field_lengths,
+    )
+
+
+def select_merge(segments: list[Segment]) -> list[int]:
+    """Positions of the segments the merge policy wants compacted
+
+    Once there are `MERGE_FACTOR` segments, the smallest `MERGE_FACTOR` are
+    merged together, so segment sizes grow geometrically and a document is
+    rewritten a logarithmic number of times. Segments with more than
+    `MAX_DELETED_RATIO` of their documents deleted are always rewritten.
+    """
+    selected = set()
+    if len(segments) >= MERGE_FACTOR:
+        by_size = sorted(range(len(segments)), key=lambda i: segments[i].live_count)
+        selected.update(by_size[:MERGE_FACTOR])
+    for position, segment in enumerate(segments):
+        deleted = len(segment.doc_ids) - segment.live_count
+        if deleted > MAX_DELETED_RATIO * len(segment.doc_ids):
+            selected.add(position)
+    return sorted(selected)
+
+
+def read_manifest(directory: str) -> dict:
+    """The list of segments making up an index and their deletion files"""
+    with open(os.path.join(directory, SEGMENTS_MANIFEST)) as f:
+        return json.load(f)
+
+
+def write_manifest(directory: str, manifest: dict) -> None:
+    path = os.path.join(directory, SEGMENTS_MANIFEST)
+    with open(f"{path}.tmp", "w") as f:
+        json.dump(manifest, f)
+    os.replace(f"{path}.tmp", path)
+
+
+def open_segments(directory: str, manifest: dict) -> list[Segment]:
+    segments = []
+    for entry in manifest["segments"]:
+        deletes = entry["deletes"]
+        segments.append(
+            Segment(
+                os.path.join(directory, entry["name"]),
+                os.path.join(directory, deletes) if deletes is not None else None,
+            )
+        )
+    return segments
+
+
+def write_deletes(path: str, live: np.ndarray) -> None:
+    np.save(path, np.packbits(~live), allow_pickle=False)
+
+
+def remove_unreferenced(directory: str, manifest: dict, reserved: set[str]) -> None:
+    """Delete segments and deletion files the manifest no longer lists
+
+    Processes that still have them mapped keep reading the old data.
+    """
+    referenced = set(reserved)
+    for entry in manifest["segments"]:
+        referenced.add(entry["name"])
+        if entry["deletes"] is not None:
+            referenced.add(entry["deletes"])
+    for name in os.listdir(directory):
+        if not name.startswith(SEGMENT_PREFIX) or name in referenced:
+            continue
+        if name.endswith(".tmp") and name.removesuffix(".tmp") in referenced:
+            continue
+        path = os.path.join(directory, name)
+        if os.path.isdir(path):
+            shutil.rmtree(path, ignore_errors=True)
+        else:
+            os.remove(path)
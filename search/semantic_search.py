@@ -1,64 +1,110 @@
+import itertools
 import json
 import os
 import re
+from collections.abc import Iterable, Iterator
 
 import numpy as np
-from sentence_transformers import SentenceTransformer
 
+from search.batch import read_queries, search_batches
+from search.bm25 import top_k
+from search.embedding_store import (
+    EmbeddingMatrix,
+    convert_embeddings,
+    normalize_embeddings,
+    save_array,
+)
+from search.hnsw import HNSWIndex
+from search.result_cache import ResultCache, normalize_query
 from search.search_utils import (
     CHUNK_EMBEDDINGS_PATH,
+    CHUNK_HNSW_PATH,
+    CHUNK_METADATA_JSON_PATH,
     CHUNK_METADATA_PATH,
     DEFAULT_CHUNK_OVERLAP,
     DEFAULT_CHUNK_SIZE,
+    DEFAULT_CHUNK_TOP_K,
+    DEFAULT_EMBEDDING_FORMAT,
     DEFAULT_SEARCH_LIMIT,
     DEFAULT_SEMANTIC_CHUNK_SIZE,
     DOCUMENT_PREVIEW_LENGTH,
+    EMBEDDING_BATCH_SIZE,
+    HNSW_CANDIDATES_PER_RESULT,
+    HNSW_EF_CONSTRUCTION,
+    HNSW_EF_SEARCH,
+    HNSW_M,
     MOVIE_EMBEDDINGS_PATH,
     format_search_result,
-    load_movies,
+    iter_movies,
+)
+
+CHUNK_AGGREGATIONS = ("max", "top2-mean", "top-k-sum")
+CHUNK_METADATA_DTYPE = np.dtype(
+    [("movie_idx", np.int32), ("chunk_idx", np.int32), ("total_chunks", np.int32)]
 )
 
 
 class SemanticSearch:
-    def __init__(self, model_name="all-MiniLM-L6-v2"):
+    def __init__(
+        self,
+        model_name="all-MiniLM-L6-v2",
+        result_cache=None,
+        embedding_format=DEFAULT_EMBEDDING_FORMAT,
+    ):
+        # Imported here: torch takes seconds to import, which thin clients of
+        # the search server never need to.
+        from sentence_transformers import SentenceTransformer
+
         self.model = SentenceTransformer(model_name)
-        self.embeddings = None
+        self.embeddings: EmbeddingMatrix | None = None
+        # Format of the embeddings this instance builds; saved ones are used
+        # in whatever format they were saved in.
+        self.embedding_format = embedding_format
         self.documents = None
         self.document_map = {}
+        self.result_cache = result_cache if result_cache is not None else ResultCache()
 
     def generate_embedding(self, text):
         if not text or not text.strip():
             raise ValueError("cannot generate embedding for empty text")
         return self.model.encode([text])[0]
 
-    def build_embeddings(self, documents):
+    def set_documents(self, documents: list[dict]) -> None:
+        # Every build and load starts here, so cached results never outlive
+        # the embeddings they were computed from.
+        self.result_cache.clear()
         self.documents = documents
-        self.document_map = {}
-        movie_strings = []
-        for doc in documents:
-            self.document_map[doc["id"]] = doc
-            movie_strings.append(f"{doc['title']}: {doc['description']}")
-        self.embeddings = self.model.encode(movie_strings, show_progress_bar=True)
-
-        os.makedirs(os.path.dirname(MOVIE_EMBEDDINGS_PATH), exist_ok=True)
-        np.save(MOVIE_EMBEDDINGS_PATH, self.embeddings)
+        self.document_map = {doc["id"]: doc for doc in documents}
+
+    def build_embeddings(self, documents: Iterable[dict]) -> EmbeddingMatrix:
+        """Encode documents batch by batch as they are streamed in"""
+        self.set_documents([])
+        batches = []
+        for batch in itertools.batched(documents, EMBEDDING_BATCH_SIZE):
+            for doc in batch:
+                self.documents.append(doc)
+                self.document_map[doc["id"]] = doc
+            movie_strings = [f"{doc['title']}: {doc['description']}" for doc in batch]
+            batches.append(self.model.encode(movie_strings))
+        EmbeddingMatrix.from_embeddings(
+            np.concatenate(batches) if batches else np.empty((0, 0)),
+            self.embedding_format,
+        ).save(MOVIE_EMBEDDINGS_PATH)
+        self.embeddings = EmbeddingMatrix.load(MOVIE_EMBEDDINGS_PATH)
         return self.embeddings
 
-    def load_or_create_embeddings(self, documents):
-        self.documents = documents
-        self.document_map = {}
-        for doc in documents:
-            self.document_map[doc["id"]] = doc
-
+    def load_or_create_embeddings(self, documents: Iterable[dict]) -> EmbeddingMatrix:
         if os.path.exists(MOVIE_EMBEDDINGS_PATH):
-            self.embeddings = np.load(MOVIE_EMBEDDINGS_PATH)
+            documents = list(documents)
+            self.set_documents(documents)
+            self.embeddings = EmbeddingMatrix.load(MOVIE_EMBEDDINGS_PATH)
             if len(self.embeddings) == len(documents):
                 return self.embeddings
 
         return self.build_embeddings(documents)
 
     def search(self, query, limit=DEFAULT_SEARCH_LIMIT):
-        if self.embeddings is None or self.embeddings.size == 0:
+        if self.embeddings is None or len(self.embeddings) == 0:
             raise ValueError(
                 "No embeddings loaded. Call `load_or_create_embeddings` first."
             )
@@ -68,17 +114,11 @@ class SemanticSearch:
                 "No documents loaded. Call `load_or_create_embeddings` first."
             )
 
-        query_embedding = self.generate_embedding(query)
-
-        similarities = []
-        for i, doc_embedding in enumerate(self.embeddings):
-            similarity = cosine_similarity(query_embedding, doc_embedding)
-            similarities.append((similarity, self.documents[i]))
-
-        similarities.sort(key=lambda x: x[0], reverse=True)
+        scores = self.embeddings.similarities(self.generate_embedding(query))
 
         results = []
-        for score, doc in similarities[:limit]:
+        for i, score in top_k(np.arange(len(scores)), scores, limit):
+            doc = self.documents[i]
             results.append(
                 {
                     "score": score,
@@ -101,6 +141,57 @@ def cosine_similarity(vec1, vec2):
     return dot_product / (norm1 * norm2)
 
 
+def cosine_similarities(
+    normalized_embeddings: np.ndarray, query_embedding: np.ndarray
+) -> np.ndarray:
+    """Cosine similarity of a query with every row of normalized embeddings"""
+    return normalized_embeddings @ normalize_embeddings(query_embedding)
+
+
+def movie_segments(chunk_movies: np.ndarray) -> np.ndarray:
+    """Offsets where each movie's run of chunks starts, for `ufunc.reduceat`"""
+    return np.flatnonzero(np.diff(chunk_movies, prepend=-1))
+
+
+def aggregate_chunk_scores(
+    scores: np.ndarray,
+    starts: np.ndarray,
+    aggregation: str = "max",
+    k: int = DEFAULT_CHUNK_TOP_K,
+) -> np.ndarray:
+    """One score per movie from its chunk scores, see `CHUNK_AGGREGATIONS`"""
+    if aggregation == "max":
+        return np.maximum.reduceat(scores, starts)
+    if aggregation == "top2-mean":
+        totals, counts = top_chunk_totals(scores, starts, 2)
+        return totals / counts
+    if aggregation == "top-k-sum":
+        return top_chunk_totals(scores, starts, k)[0]
+    raise ValueError(f"aggregation must be one of {', '.join(CHUNK_AGGREGATIONS)}")
+
+
+def top_chunk_totals(
+    scores: np.ndarray, starts: np.ndarray, k: int
+) -> tuple[np.ndarray, np.ndarray]:
+    """Sum and number of the `k` best chunk scores of every movie"""
+    lengths = np.diff(starts, append=len(scores))
+    positions = np.arange(len(scores))
+    remaining = scores.copy()
+    totals = np.zeros(len(starts), dtype=scores.dtype)
+    # Each round retires every movie's best remaining score, so nothing is sorted.
+    for round_ in range(k):
+        left = lengths > round_
+        if not left.any():
+            break
+        best = np.maximum.reduceat(remaining, starts)
+        totals += np.where(left, best, 0)
+        # Retire only the first chunk holding the best score, so ties each count.
+        is_best = remaining == np.repeat(best, lengths)
+        first = np.minimum.reduceat(np.where(is_best, positions, len(scores)), starts)
+        remaining[first[left]] = -np.inf
+    return totals, np.minimum(lengths, k)
+
+
 def verify_model():
     search_instance = SemanticSearch()
     print(f"Model loaded: {search_instance.model}")
@@ -117,9 +208,8 @@ def embed_text(text):
 
 def verify_embeddings():
     search_instance = SemanticSearch()
-    documents = load_movies()
-    embeddings = search_instance.load_or_create_embeddings(documents)
-    print(f"Number of docs:   {len(documents)}")
+    embeddings = search_instance.load_or_create_embeddings(iter_movies())
+    print(f"Number of docs:   {len(search_instance.documents)}")
     print(
         f"Embeddings shape: {embeddings.shape[0]} vectors in {embeddings.shape[1]} dimensions"
     )
@@ -135,8 +225,7 @@ def embed_query_text(query):
 
 def semantic_search(query, limit=DEFAULT_SEARCH_LIMIT):
     search_instance = SemanticSearch()
-    documents = load_movies()
-    search_instance.load_or_create_embeddings(documents)
+    search_instance.load_or_create_embeddings(iter_movies())
 
     results = search_instance.search(query, limit)
 
@@ -229,100 +318,185 @@ def semantic_chunk_text(
         print(f"{i + 1}. {chunk}")
 
 
-class ChunkedSemanticSearch(SemanticSearch):
-    def __init__(self, model_name: str = "all-MiniLM-L6-v2") -> None:
-        super().__init__(model_name)
-        self.chunk_embeddings = None
-        self.chunk_metadata = None
-
-    def build_chunk_embeddings(self, documents: list[dict]) -> np.ndarray:
-        self.documents = documents
-
-        self.document_map = {}
-        for doc in documents:
-            self.document_map[doc["id"]] = doc
-
-        all_chunks = []
-        chunk_metadata = []
-
-        for idx, doc in enumerate(documents):
-            text = doc.get("description", "")
-            if not text.strip():
-                continue
-
-            chunks = semantic_chunk(
-                text,
-                max_chunk_size=DEFAULT_SEMANTIC_CHUNK_SIZE,
-                overlap=DEFAULT_CHUNK_OVERLAP,
-            )
-
-            for i, chunk in enumerate(chunks):
-                all_chunks.append(chunk)
-                chunk_metadata.append(
-                    {"movie_idx": idx, "chunk_idx": i, "total_chunks": len(chunks)}
-                )
+def movie_chunks(doc: dict) -> list[str]:
+    """Chunks of a movie description, in the order they are embedded"""
+    text = doc.get("description", "")
+    if not text.strip():
+        return []
+    return semantic_chunk(
+        text, max_chunk_size=DEFAULT_SEMANTIC_CHUNK_SIZE, overlap=DEFAULT_CHUNK_OVERLAP
+    )
 
-        self.chunk_embeddings = self.model.encode(all_chunks, show_progress_bar=True)
-        self.chunk_metadata = chunk_metadata
 
-        os.makedirs(os.path.dirname(CHUNK_EMBEDDINGS_PATH), exist_ok=True)
-        np.save(CHUNK_EMBEDDINGS_PATH, self.chunk_embeddings)
-        with open(CHUNK_METADATA_PATH, "w") as f:
-            json.dump(
-                {"chunks": chunk_metadata, "total_chunks": len(all_chunks)}, f, indent=2
-            )
+class ChunkedSemanticSearch(SemanticSearch):
+    """Semantic search over movie description chunks, optionally through HNSW"""
+
+    def __init__(
+        self,
+        model_name: str = "all-MiniLM-L6-v2",
+        result_cache: ResultCache | None = None,
+        embedding_format: str = DEFAULT_EMBEDDING_FORMAT,
+        ann: bool = False,
+        ef_search: int = HNSW_EF_SEARCH,
+    ) -> None:
+        super().__init__(model_name, result_cache, embedding_format)
+        self.chunk_embeddings: EmbeddingMatrix | None = None
+        self.chunk_metadata = None
+        self.chunk_movies: np.ndarray | None = None
+        self.movie_starts: np.ndarray | None = None
+        self.ann = ann
+        self.ef_search = ef_search
+        self.hnsw: HNSWIndex | None = None
+
+    def build_chunk_embeddings(self, documents: Iterable[dict]) -> EmbeddingMatrix:
+        """Chunk and encode documents batch by batch as they are streamed in"""
+        self.set_documents([])
+        chunk_metadata: list[tuple[int, int, int]] = []
+        batches = []
+
+        for batch in itertools.batched(documents, EMBEDDING_BATCH_SIZE):
+            batch_chunks = []
+            for doc in batch:
+                idx = len(self.documents)
+                self.documents.append(doc)
+                self.document_map[doc["id"]] = doc
+
+                chunks = movie_chunks(doc)
+                for i, chunk in enumerate(chunks):
+                    batch_chunks.append(chunk)
+                    chunk_metadata.append((idx, i, len(chunks)))
+            if batch_chunks:
+                batches.append(self.model.encode(batch_chunks))
+
+        EmbeddingMatrix.from_embeddings(
+            np.concatenate(batches) if batches else np.empty((0, 0)),
+            self.embedding_format,
+        ).save(CHUNK_EMBEDDINGS_PATH)
+        save_array(
+            CHUNK_METADATA_PATH, np.array(chunk_metadata, dtype=CHUNK_METADATA_DTYPE)
+        )
+        if os.path.exists(CHUNK_HNSW_PATH):
+            os.remove(CHUNK_HNSW_PATH)
+        self.hnsw = None
+        self.chunk_embeddings = EmbeddingMatrix.load(CHUNK_EMBEDDINGS_PATH)
+        self.chunk_metadata = np.load(CHUNK_METADATA_PATH, mmap_mode="r")
+        self.__index_chunk_movies()
 
         return self.chunk_embeddings
 
-    def load_or_create_chunk_embeddings(self, documents: list[dict]) -> np.ndarray:
-        self.documents = documents
-        self.document_map = {}
-        for doc in documents:
-            self.document_map[doc["id"]] = doc
-
-        if os.path.exists(CHUNK_EMBEDDINGS_PATH) and os.path.exists(
-            CHUNK_METADATA_PATH
-        ):
-            self.chunk_embeddings = np.load(CHUNK_EMBEDDINGS_PATH)
-            with open(CHUNK_METADATA_PATH, "r") as f:
-                data = json.load(f)
-                self.chunk_metadata = data["chunks"]
-            return self.chunk_embeddings
+    def load_or_create_chunk_embeddings(
+        self, documents: Iterable[dict]
+    ) -> EmbeddingMatrix:
+        """Load the saved chunk embeddings as stored, or build them if missing"""
+        if os.path.exists(CHUNK_EMBEDDINGS_PATH):
+            if not os.path.exists(CHUNK_METADATA_PATH) and os.path.exists(
+                CHUNK_METADATA_JSON_PATH
+            ):
+                convert_chunk_metadata(CHUNK_METADATA_JSON_PATH, CHUNK_METADATA_PATH)
+            if os.path.exists(CHUNK_METADATA_PATH):
+                embeddings = EmbeddingMatrix.load(CHUNK_EMBEDDINGS_PATH)
+                chunk_metadata = np.load(CHUNK_METADATA_PATH, mmap_mode="r")
+                if len(embeddings) == len(chunk_metadata):
+                    self.set_documents(list(documents))
+                    self.chunk_embeddings = embeddings
+                    self.chunk_metadata = chunk_metadata
+                    self.__index_chunk_movies()
+                    return self.chunk_embeddings
 
         return self.build_chunk_embeddings(documents)
 
-    def search_chunks(self, query: str, limit: int = 10) -> list[dict]:
+    def load_or_build_hnsw(self) -> HNSWIndex:
+        """Load the saved HNSW graph of the chunks, or build it if missing"""
+        self.__require_chunk_embeddings()
+        if self.hnsw is None and os.path.exists(CHUNK_HNSW_PATH):
+            hnsw = HNSWIndex.load(CHUNK_HNSW_PATH)
+            if len(hnsw) == len(self.chunk_embeddings):
+                self.hnsw = hnsw
+        if self.hnsw is None:
+            self.build_hnsw()
+        return self.hnsw
+
+    def build_hnsw(
+        self, m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION
+    ) -> HNSWIndex:
+        """Build the HNSW graph of the chunk embeddings and save it"""
+        self.__require_chunk_embeddings()
+        vectors = normalize_embeddings(self.chunk_embeddings.to_float32())
+        self.hnsw = HNSWIndex.build(vectors, m, ef_construction)
+        self.hnsw.save(CHUNK_HNSW_PATH)
+        return self.hnsw
+
+    def search_chunks(
+        self, query: str, limit: int = 10, aggregation: str = "max"
+    ) -> list[dict]:
+        self.__require_chunk_embeddings()
+        # The model sees the raw text, so only whitespace is normalized.
+        key = self.__cache_key(query, limit, aggregation)
+        return self.result_cache.get_or_compute(
+            key,
+            lambda: self.__rank_chunks(
+                self.generate_embedding(query), limit, aggregation
+            ),
+        )
+
+    def search_chunks_batch(
+        self, queries: list[str], limit: int = 10, aggregation: str = "max"
+    ) -> list[list[dict]]:
+        """Search many queries, encoding the uncached ones in batches"""
+        self.__require_chunk_embeddings()
+        keys = [self.__cache_key(query, limit, aggregation) for query in queries]
+
+        def search_missing(positions: list[int]) -> list[list[dict]]:
+            texts = [queries[i] for i in positions]
+            if not all(text.strip() for text in texts):
+                raise ValueError("cannot generate embedding for empty text")
+            embeddings = self.model.encode(texts, batch_size=EMBEDDING_BATCH_SIZE)
+            return [
+                self.__rank_chunks(embedding, limit, aggregation)
+                for embedding in embeddings
+            ]
+
+        return self.result_cache.get_or_compute_batch(keys, search_missing)
+
+    def __require_chunk_embeddings(self) -> None:
         if self.chunk_embeddings is None or self.chunk_metadata is None:
             raise ValueError(
                 "No chunk embeddings loaded. Call load_or_create_chunk_embeddings first."
             )
 
-        query_embedding = self.generate_embedding(query)
-
-        chunk_scores = []
-        for i, chunk_embedding in enumerate(self.chunk_embeddings):
-            similarity = cosine_similarity(query_embedding, chunk_embedding)
-            chunk_scores.append(
-                {
-                    "chunk_idx": i,
-                    "movie_idx": self.chunk_metadata[i]["movie_idx"],
-                    "score": similarity,
-                }
-            )
-
-        movie_scores = {}
-        for chunk_score in chunk_scores:
-            movie_idx = chunk_score["movie_idx"]
-            if (
-                movie_idx not in movie_scores
-                or chunk_score["score"] > movie_scores[movie_idx]
-            ):
-                movie_scores[movie_idx] = chunk_score["score"]
-
-        sorted_movies = sorted(movie_scores.items(), key=lambda x: x[1], reverse=True)
+    def __cache_key(self, query: str, limit: int, aggregation: str) -> tuple:
+        ef_search = self.ef_search if self.ann else None
+        return ("chunks", normalize_query(query), limit, aggregation, ef_search)
+
+    def __index_chunk_movies(self) -> None:
+        """Keep the movie of every chunk as arrays, with chunks sorted by movie"""
+        chunk_movies = self.chunk_metadata["movie_idx"].astype(np.int64)
+        if np.any(chunk_movies[1:] < chunk_movies[:-1]):
+            order = np.argsort(chunk_movies, kind="stable")
+            chunk_movies = chunk_movies[order]
+            self.chunk_embeddings = self.chunk_embeddings[order]
+            self.chunk_metadata = self.chunk_metadata[order]
+        self.movie_starts = movie_segments(chunk_movies)
+        self.chunk_movies = chunk_movies
+
+    def __rank_chunks(
+        self, query_embedding: np.ndarray, limit: int, aggregation: str
+    ) -> list[dict]:
+        if len(self.chunk_movies) == 0:
+            return []
+        if self.ann:
+            chunk_movies, scores = self.__nearest_chunks(query_embedding, limit)
+            starts = movie_segments(chunk_movies)
+        else:
+            chunk_movies = self.chunk_movies
+            scores = self.chunk_embeddings.similarities(query_embedding)
+            starts = self.movie_starts
+        movie_scores = aggregate_chunk_scores(scores, starts, aggregation)
+        # Ties keep ascending movie_idx, the order movies are chunked in.
+        ranked = top_k(chunk_movies[starts], movie_scores, limit)
 
         results = []
-        for movie_idx, score in sorted_movies[:limit]:
+        for movie_idx, score in ranked:
             doc = self.documents[movie_idx]
             results.append(
                 format_search_result(
@@ -335,16 +509,91 @@ class ChunkedSemanticSearch(SemanticSearch):
 
         return results
 
+    def __nearest_chunks(
+        self, query_embedding: np.ndarray, limit: int
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Movie and score of the chunks the HNSW graph finds, sorted by movie"""
+        hnsw = self.load_or_build_hnsw()
+        query = self.chunk_embeddings.prepare_query(query_embedding)
+        # Chunks of one movie often rank together, so more chunks are fetched.
+        found = hnsw.search(
+            lambda rows: self.chunk_embeddings.dot(query, rows),
+            limit * HNSW_CANDIDATES_PER_RESULT,
+            self.ef_search,
+        )
+        found.sort()
+        ordinals = np.array([ordinal for ordinal, _ in found], dtype=np.int64)
+        scores = np.array([score for _, score in found], dtype=np.float32)
+        return self.chunk_movies[ordinals], scores
+
+
+def convert_chunk_metadata(json_path: str, path: str) -> np.ndarray:
+    """Rewrite chunk metadata saved as JSON by earlier versions as `.npy`"""
+    with open(json_path, "r") as f:
+        chunks = json.load(f)["chunks"]
+    chunk_metadata = np.array(
+        [
+            (chunk["movie_idx"], chunk["chunk_idx"], chunk["total_chunks"])
+            for chunk in chunks
+        ],
+        dtype=CHUNK_METADATA_DTYPE,
+    )
+    save_array(path, chunk_metadata)
+    return chunk_metadata
+
+
+def embed_chunks_command(
+    embedding_format: str = DEFAULT_EMBEDDING_FORMAT,
+) -> EmbeddingMatrix:
+    searcher = ChunkedSemanticSearch(embedding_format=embedding_format)
+    return searcher.load_or_create_chunk_embeddings(iter_movies())
 
-def embed_chunks_command() -> np.ndarray:
-    movies = load_movies()
-    searcher = ChunkedSemanticSearch()
-    return searcher.load_or_create_chunk_embeddings(movies)
 
+def convert_embeddings_command(embedding_format: str) -> dict[str, EmbeddingMatrix]:
+    """Rewrite the saved movie and chunk embeddings in another format"""
+    return {
+        path: convert_embeddings(path, embedding_format)
+        for path in (MOVIE_EMBEDDINGS_PATH, CHUNK_EMBEDDINGS_PATH)
+        if os.path.exists(path)
+    }
 
-def search_chunked_command(query: str, limit: int = DEFAULT_SEARCH_LIMIT) -> dict:
-    movies = load_movies()
+
+def build_hnsw_command(
+    m: int = HNSW_M, ef_construction: int = HNSW_EF_CONSTRUCTION
+) -> HNSWIndex:
     searcher = ChunkedSemanticSearch()
-    searcher.load_or_create_chunk_embeddings(movies)
-    results = searcher.search_chunks(query, limit)
-    return {"query": query, "results": results}
+    searcher.load_or_create_chunk_embeddings(iter_movies())
+    return searcher.build_hnsw(m, ef_construction)
+
+
+def search_chunked_command(
+    query: str,
+    limit: int = DEFAULT_SEARCH_LIMIT,
+    searcher: ChunkedSemanticSearch | None = None,
+    aggregation: str = "max",
+    ann: bool = False,
+    ef_search: int = HNSW_EF_SEARCH,
+) -> dict:
+    if searcher is None:
+        searcher = ChunkedSemanticSearch(ann=ann, ef_search=ef_search)
+        searcher.load_or_create_chunk_embeddings(iter_movies())
+    results = searcher.search_chunks(query, limit, aggregation)
+    return {"query": query, "results": results, "aggregation": aggregation}
+
+
+def search_chunked_batch_command(
+    lines: Iterable[str],
+    limit: int = DEFAULT_SEARCH_LIMIT,
+    searcher: ChunkedSemanticSearch | None = None,
+    aggregation: str = "max",
+    ann: bool = False,
+    ef_search: int = HNSW_EF_SEARCH,
+) -> Iterator[dict]:
+    """Answer a JSON Lines stream of queries, embedding them a batch at a time"""
+    if searcher is None:
+        searcher = ChunkedSemanticSearch(ann=ann, ef_search=ef_search)
+        searcher.load_or_create_chunk_embeddings(iter_movies())
+    return search_batches(
+        read_queries(lines),
+        lambda queries: searcher.search_chunks_batch(queries, limit, aggregation),
+    )
@@ -0,0 +1,105 @@
+from collections import defaultdict
+from collections.abc import Mapping
+
+MAX_EDIT_DISTANCE = 2
+PREFIX_LENGTH = 7
+
+
+class SpellingIndex:
+    """Symmetric-delete (SymSpell) index for correcting misspelled terms
+
+    Every term is stored under each string obtained by deleting up to
+    `max_distance` characters from its prefix. A query word generates its own
+    deletes, and the terms sharing any of them are the only candidates whose
+    edit distance is computed, so a lookup never scans the vocabulary. Deletes
+    are taken from the first `prefix_length` characters only, which bounds the
+    index size for long terms.
+    """
+
+    def __init__(
+        self,
+        frequencies: Mapping[str, int],
+        max_distance: int = MAX_EDIT_DISTANCE,
+        prefix_length: int = PREFIX_LENGTH,
+    ) -> None:
+        self.frequencies = dict(frequencies)
+        self.max_distance = max_distance
+        self.prefix_length = prefix_length
+        deletes = defaultdict(list)
+        for term in self.frequencies:
+            for variant in deletes_of(term[:prefix_length], max_distance):
+                deletes[variant].append(term)
+        self.deletes = dict(deletes)
+
+    def __contains__(self, term: object) -> bool:
+        return term in self.frequencies
+
+    def __len__(self) -> int:
+        return len(self.frequencies)
+
+    def lookup(self, word: str) -> list[tuple[str, int]]:
+        """Terms within `max_distance` edits of a word
+
+        Returns:
+            (term, edit distance) pairs, closest first, then most frequent
+        """
+        if word in self.frequencies:
+            return [(word, 0)]
+        candidates = set()
+        for variant in deletes_of(word[: self.prefix_length], self.max_distance):
+            candidates.update(self.deletes.get(variant, ()))
+
+        suggestions = []
+        for term in candidates:
+            distance = edit_distance(word, term, self.max_distance)
+            if distance is not None:
+                suggestions.append((term, distance))
+        suggestions.sort(key=lambda s: (s[1], -self.frequencies[s[0]], s[0]))
+        return suggestions
+
+    def correct(self, word: str) -> str | None:
+        """The closest and most frequent term to a word, None if none is close"""
+        suggestions = self.lookup(word)
+        return suggestions[0][0] if suggestions else None
+
+
+def deletes_of(word: str, max_distance: int) -> set[str]:
+    """The word and every string made by deleting up to `max_distance` characters"""
+    variants = {word}
+    edge = {word}
+    for _ in range(max_distance):
+        edge = {
+            variant[:i] + variant[i + 1 :]
+            for variant in edge
+            for i in range(len(variant))
+        }
+        variants |= edge
+    return variants
+
+
+def edit_distance(source: str, target: str, max_distance: int) -> int | None:
+    """Levenshtein distance with adjacent transpositions, if within the bound
+
+    Returns:
+        The distance, or None as soon as it is known to exceed `max_distance`
+    """
+    if abs(len(source) - len(target)) > max_distance:
+        return None
+    previous = None
+    row = list(range(len(target) + 1))
+    for i, source_char in enumerate(source, 1):
+        before, previous, row = previous, row, [i] + [0] * len(target)
+        for j, target_char in enumerate(target, 1):
+            cost = source_char != target_char
+            row[j] = min(previous[j] + 1, row[j - 1] + 1, previous[j - 1] + cost)
+            if (
+                cost
+                and before is not None
+                and j > 1
+                and source_char == target[j - 2]
+                and source[i - 2] == target_char
+            ):
+                row[j] = min(row[j], before[j - 2] + 1)
+        if min(row) > max_distance:
+            return None
+    return row[-1] if row[-1] <= max_distance else None
@@ -1,5 +1,6 @@
 import string
-from search.impl.search_utils_impl import load_stop_words
+from search.analyzer import load_analyzer
+from search.impl.search_utils_impl import load_stop_words, STOP_WORDS_PATH
 
 from nltk.stem import PorterStemmer
 
@@ -72,19 +73,10 @@ def text_stem(tokens: list[str]) -> list[str]:
 
 
 def process_text(text: str) -> list[str]:
-    # process lower case
-    lower = text_lowercase(text)
-
-    # process - remove text punctuation
-    punctuation = text_remove_punctuation(lower)
-
-    # process - tokenize text
-    tokens = text_tokenize(punctuation)
-
-    # process - remove stop words
-    clean_stop_words = text_remove_stop_words(tokens)
-
-    # process - stemming
-    stem_words = text_stem(clean_stop_words)
-
-    return stem_words
+    """
+    Lower cases, removes punctuation, tokenizes, removes stop words and stems the given text in a single pass,
+    with the stop words loaded once and the stems cached across calls
+    :param text: The text
+    :return: the processed tokens
+    """
+    return load_analyzer(STOP_WORDS_PATH).analyze(text)
@@ -0,0 +1,78 @@
+import bisect
+import re
+import string
+from collections.abc import Sequence
+
+MAX_EXPANSIONS = 64
+WILDCARDS = "*?"
+
+# A word containing * (any run of characters) or ? (one character).
+WILDCARD_PATTERN = re.compile(r"[^\s()]*[*?][^\s()]*")
+
+_STRIP = str.maketrans("", "", "".join(set(string.punctuation) - set(WILDCARDS)))
+
+
+def is_wildcard(word: str) -> bool:
+    return any(wildcard in word for wildcard in WILDCARDS)
+
+
+def normalize_pattern(word: str) -> str:
+    """Lowercase a wildcard word and strip its punctuation, like the analyzer
+
+    Patterns are matched against index terms as they are, without stopword
+    removal or stemming: "pad*" matches "paddington", while stemmed terms
+    are matched by their stems, e.g. "happ*" matches "happi".
+    """
+    return word.lower().translate(_STRIP)
+
+
+def parse_wildcards(query: str) -> tuple[str, list[str]]:
+    """Split the wildcard words out of a query
+
+    Returns:
+        The query without its wildcard words and the normalized patterns
+    """
+    patterns = [normalize_pattern(word) for word in WILDCARD_PATTERN.findall(query)]
+    return WILDCARD_PATTERN.sub(" ", query), [p for p in patterns if p.strip(WILDCARDS)]
+
+
+def expand_pattern(
+    terms: Sequence[str], pattern: str, max_expansions: int = MAX_EXPANSIONS
+) -> list[str]:
+    """Terms of a sorted term dictionary matching a wildcard pattern
+
+    The literal prefix before the first wildcard is located by binary
+    search, and only the terms sharing it are scanned, stopping after
+    `max_expansions` matches. A pattern starting with a wildcard has no
+    prefix and scans the whole dictionary.
+
+    Args:
+        terms: Term dictionary in ascending order
+        pattern: Normalized pattern with * and ? wildcards
+        max_expansions: Largest number of terms returned
+
+    Returns:
+        Up to `max_expansions` matching terms, in dictionary order
+    """
+    wildcard = min(
+        (pattern.index(w) for w in WILDCARDS if w in pattern), default=len(pattern)
+    )
+    prefix = pattern[:wildcard]
+    matcher = None
+    if pattern[wildcard:] != "*":
+        matcher = re.compile(
+            "".join(
+                ".*" if c == "*" else "." if c == "?" else re.escape(c) for c in pattern
+            )
+        )
+
+    expansions = []
+    position = bisect.bisect_left(terms, prefix)
+    while position < len(terms) and len(expansions) < max_expansions:
+        term = terms[position]
+        if not term.startswith(prefix):
+            break
+        if matcher is None or matcher.fullmatch(term):
+            expansions.append(term)
+        position += 1
+    return expansions
@@ -0,0 +1,48 @@
+import os
+
+import pytest
+
+from search import keyword_search, search_utils
+from search.keyword_search import InvertedIndex
+
+MOVIES = [
+    {
+        "id": 1,
+        "title": "Paddington",
+        "description": "A bear from Peru moves to London.",
+    },
+    {"id": 2, "title": "Ted", "description": "A talking teddy bear comedy in Boston."},
+    {
+        "id": 3,
+        "title": "The Revenant",
+        "description": "A frontiersman is attacked by a bear.",
+    },
+    {"id": 4, "title": "Jaws", "description": "A shark terrorizes a beach town."},
+    {
+        "id": 5,
+        "title": "Finding Nemo",
+        "description": "A clownfish searches the ocean for his son.",
+    },
+    {
+        "id": 6,
+        "title": "Brother Bear",
+        "description": "A boy is turned into a bear by spirits.",
+    },
+]
+
+
+@pytest.fixture
+def movies() -> list[dict]:
+    return MOVIES
+
+
+@pytest.fixture
+def index(monkeypatch, movies) -> InvertedIndex:
+    stopwords_path = os.path.join(
+        os.path.dirname(__file__), "..", "..", "data", "stopwords.txt"
+    )
+    monkeypatch.setattr(search_utils, "STOPWORDS_PATH", stopwords_path)
+    monkeypatch.setattr(keyword_search, "iter_movies", lambda: iter(movies))
+    idx = InvertedIndex()
+    idx.build()
+    return idx
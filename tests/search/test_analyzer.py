@@ -0,0 +1,27 @@
+import os
+
+from search.analyzer import Analyzer
+from search.text_processor import (
+    text_lowercase,
+    text_remove_punctuation,
+    text_stem,
+    text_tokenize,
+)
+
+
+def test_should_analyze_text_like_the_individual_processing_steps():
+    stopwords_path = os.path.join(
+        os.path.dirname(__file__), "..", "..", "data", "stopwords.txt"
+    )
+    with open(stopwords_path) as f:
+        stop_words = f.read().splitlines()
+    given = "The Running bears, running again... and RUNNING!\tA bear's  story"
+    tokens = text_tokenize(
+        text_remove_punctuation(text_lowercase(given)).replace("\t", " ")
+    )
+    expected = text_stem([token for token in tokens if token not in stop_words])
+
+    analyzer = Analyzer(stop_words, stem_cache_size=2)
+
+    assert expected == analyzer.analyze(given)
+    assert expected == analyzer.analyze(given)
@@ -0,0 +1,100 @@
+import io
+import json
+
+import numpy as np
+import pytest
+
+from search import keyword_search
+from search.batch import read_queries, search_batches, write_jsonl
+from search.keyword_search import bm25search_batch_command
+from search.result_cache import ResultCache
+
+
+def test_should_read_objects_and_bare_strings_skipping_blank_lines():
+    lines = ['{"id": "q1", "query": "bear"}\n', "\n", '"shark"\n']
+
+    assert list(read_queries(lines)) == [
+        {"id": "q1", "query": "bear"},
+        {"query": "shark"},
+    ]
+
+
+@pytest.mark.parametrize(
+    "line, error",
+    [
+        ("{not json", ValueError),
+        ('{"id": 1}', TypeError),
+        ("[1, 2]", TypeError),
+        ('{"query": 3}', TypeError),
+    ],
+)
+def test_should_report_the_line_of_an_invalid_query(line, error):
+    with pytest.raises(error, match="line 2"):
+        list(read_queries(['"bear"', line]))
+
+
+def test_should_answer_every_batch_in_input_order():
+    batches = []
+
+    def search(queries):
+        batches.append(queries)
+        return [[{"id": query}] for query in queries]
+
+    records = [{"query": str(i), "id": i} for i in range(5)]
+    answers = list(search_batches(records, search, batch_size=2))
+
+    assert batches == [["0", "1"], ["2", "3"], ["4"]]
+    assert answers == [
+        {"query": str(i), "id": i, "results": [{"id": str(i)}]} for i in range(5)
+    ]
+
+
+def test_should_write_numpy_scores_as_json_lines():
+    out = io.StringIO()
+
+    count = write_jsonl(
+        [{"query": "bear", "score": np.float32(0.5)}, {"query": "shark"}], out
+    )
+
+    assert count == 2
+    assert [json.loads(line) for line in out.getvalue().splitlines()] == [
+        {"query": "bear", "score": 0.5},
+        {"query": "shark"},
+    ]
+
+
+def test_should_only_compute_cache_misses_of_a_batch():
+    cache = ResultCache(ttl=None)
+    cache.put("b", [{"id": 99}])
+    computed = []
+
+    def compute(positions):
+        computed.append(positions)
+        return [[{"id": i}] for i in positions]
+
+    results = cache.get_or_compute_batch(["a", "b", "c"], compute)
+
+    assert computed == [[0, 2]]
+    assert results == [[{"id": 0}], [{"id": 99}], [{"id": 2}]]
+    assert cache.get_or_compute_batch(["a", "c"], compute) == [[{"id": 0}], [{"id": 2}]]
+    assert computed == [[0, 2]]
+
+
+@pytest.mark.parametrize(
+    "mode, feedback", [("exhaustive", False), ("wand", False), ("exhaustive", True)]
+)
+def test_should_match_single_query_searches_in_batch_mode(index, mode, feedback):
+    lines = [
+        '{"id": "a", "query": "bear"}',
+        '"shark town"',
+        '{"id": "c", "query": "talking bear"}',
+    ]
+    queries = ["bear", "shark town", "talking bear"]
+
+    answers = list(bm25search_batch_command(lines, 3, mode, feedback, index))
+
+    assert [answer.get("id") for answer in answers] == ["a", None, "c"]
+    assert [answer["results"] for answer in answers] == [
+        keyword_search.bm25search_command(query, 3, mode, feedback, index)
+        for query in queries
+    ]
@@ -0,0 +1,59 @@
+import json
+
+import pytest
+
+from search import corpus
+from search.corpus import iter_documents
+
+MOVIES = [
+    {
+        "id": 1,
+        "title": "Paddington",
+        "description": "A bear from Peru moves to London.",
+    },
+    {
+        "id": 2,
+        "title": "Ted",
+        "description": 'A talking "teddy" bear, with [brackets] and {braces}.',
+    },
+    {"id": 3, "title": "Amélie", "description": "Déjà vu in Montmartre.\nTwo lines."},
+]
+
+
+@pytest.fixture(autouse=True)
+def small_reads(monkeypatch):
+    monkeypatch.setattr(corpus, "READ_CHUNK_SIZE", 7)
+
+
+def test_should_stream_the_same_movies_as_json_load(tmp_path):
+    given = tmp_path / "movies.json"
+    given.write_text(
+        json.dumps({"version": "1", "movies": MOVIES, "count": 3}, indent=2)
+    )
+
+    assert (
+        list(iter_documents(str(given), "movies"))
+        == json.loads(given.read_text())["movies"]
+    )
+
+
+def test_should_stream_json_lines(tmp_path):
+    given = tmp_path / "movies.jsonl"
+    given.write_text("\n".join(json.dumps(m) for m in MOVIES) + "\n\n")
+
+    assert list(iter_documents(str(given), "movies")) == MOVIES
+
+
+def test_should_stream_an_empty_array(tmp_path):
+    given = tmp_path / "movies.json"
+    given.write_text('{"movies": [ ]}')
+
+    assert list(iter_documents(str(given), "movies")) == []
+
+
+def test_should_fail_on_a_truncated_file(tmp_path):
+    given = tmp_path / "movies.json"
+    given.write_text(json.dumps({"movies": MOVIES})[:-20])
+
+    with pytest.raises(ValueError):
+        list(iter_documents(str(given), "movies"))
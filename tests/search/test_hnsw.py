@@ -0,0 +1,80 @@
+import os
+
+import numpy as np
+
+from search.hnsw import HNSWIndex, select_neighbors
+from search.semantic_search import normalize_embeddings
+
+
+def clustered_vectors(count, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.standard_normal((20, 16))
+    clusters = rng.integers(20, size=count)
+    vectors = centers[clusters] + 0.3 * rng.standard_normal((count, 16))
+    return normalize_embeddings(vectors.astype(np.float32))
+
+
+def dot_scores(vectors, query):
+    return lambda rows: vectors[rows] @ query
+
+
+def test_should_find_most_of_the_exact_nearest_neighbours():
+    vectors = clustered_vectors(1000)
+    queries = clustered_vectors(20, seed=1)
+    hnsw = HNSWIndex.build(vectors, m=8, ef_construction=64)
+
+    recall = []
+    for query in queries:
+        expected = set(np.argsort(-(vectors @ query))[:10].tolist())
+        found = hnsw.search(dot_scores(vectors, query), k=10, ef=64)
+        recall.append(len(expected & {ordinal for ordinal, _ in found}) / 10)
+
+    assert np.mean(recall) >= 0.9
+
+
+def test_should_return_every_node_best_first_when_k_exceeds_the_index():
+    vectors = clustered_vectors(30)
+    query = vectors[7]
+    hnsw = HNSWIndex.build(vectors, m=4, ef_construction=16)
+
+    found = hnsw.search(dot_scores(vectors, query), k=50, ef=50)
+
+    assert sorted(ordinal for ordinal, _ in found) == list(range(30))
+    assert found[0][0] == 7
+    assert [score for _, score in found] == sorted(
+        (score for _, score in found), reverse=True
+    )
+    assert HNSWIndex.build(vectors[:0]).search(dot_scores(vectors, query), 5) == []
+
+
+def test_should_search_the_same_after_a_save_and_load_round_trip(tmp_path):
+    vectors = clustered_vectors(300)
+    hnsw = HNSWIndex.build(vectors, m=6, ef_construction=32)
+    path = str(tmp_path / "hnsw.npz")
+
+    hnsw.save(path)
+    loaded = HNSWIndex.load(path)
+
+    assert not os.path.exists(f"{path}.tmp")
+    assert (len(loaded), loaded.m, loaded.ef_construction) == (300, 6, 32)
+    for query in vectors[:5]:
+        scores = dot_scores(vectors, query)
+        assert loaded.search(scores, 10) == hnsw.search(scores, 10)
+
+
+def test_should_prefer_neighbours_in_different_directions():
+    vectors = normalize_embeddings(
+        np.array([[1.0, 0.1], [1.0, 0.12], [1.0, -0.5], [0.0, 1.0]], np.float32)
+    )
+    node = np.array([1.0, 0.0], np.float32)
+    candidates = np.arange(4)
+
+    kept = select_neighbors(vectors, candidates, vectors @ node, m=2)
+
+    # Candidate 1 is closer to candidate 0 than to the node, so 2 is kept instead.
+    assert kept.tolist() == [0, 2]
+    assert select_neighbors(vectors, candidates, vectors @ node, m=3).tolist() == [
+        0,
+        2,
+        1,
+    ]
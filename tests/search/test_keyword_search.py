@@ -0,0 +1,602 @@
+import multiprocessing
+import pickle
+from collections import Counter
+
+import numpy as np
+import pytest
+
+from search import bm25, keyword_search, search_utils
+from search.keyword_search import InvertedIndex, tokenize_text
+from search.postings import CompressedPostings, contains_ordinals
+
+WORDS = ["bear", "shark", "london", "comedy", "ocean", "spirit", "town", "boy"]
+
+
+def synthetic_movies(ids=range(1, 400), words=WORDS) -> list[dict]:
+    """Movies whose titles and descriptions cycle through a few words"""
+    return [
+        {
+            "id": i,
+            "title": words[i % 8],
+            "description": " ".join(words[(i * j) % 8] for j in range(i % 13 + 1)),
+        }
+        for i in ids
+    ]
+
+
+@pytest.fixture
+def synthetic_corpus(monkeypatch, index) -> list[dict]:
+    """Build indexes from `synthetic_movies` instead of the shared movies"""
+    movies = synthetic_movies()
+    monkeypatch.setattr(keyword_search, "iter_movies", lambda: iter(movies))
+    return movies
+
+
+def full_scan_scores(idx: InvertedIndex, query: str) -> list[tuple[int, float]]:
+    scores = {}
+    for doc_id in idx.docmap:
+        score = 0.0
+        for token in tokenize_text(query):
+            score += idx.bm25(doc_id, token)
+        scores[doc_id] = score
+    return sorted(scores.items(), key=lambda x: x[1], reverse=True)
+
+
+def test_should_return_the_same_scores_as_a_full_scan(index):
+    given = "talking bear comedy"
+    expected = full_scan_scores(index, given)[:3]
+
+    results = index.bm25_search(given, limit=3)
+
+    assert [(r["id"], r["score"]) for r in results] == [
+        (doc_id, round(score, 3)) for doc_id, score in expected
+    ]
+
+
+def test_should_pad_with_unmatched_documents_when_limit_exceeds_matches(index):
+    results = index.bm25_search("shark", limit=3)
+
+    assert [r["id"] for r in results] == [4, 1, 2]
+    assert [r["score"] for r in results[1:]] == [0.0, 0.0]
+
+
+def test_should_rank_the_same_with_quantized_impacts(index):
+    quantized = InvertedIndex()
+    quantized.build(quantize=True)
+
+    expected = index.bm25_search("bear comedy boston", limit=3)
+    results = quantized.bm25_search("bear comedy boston", limit=3)
+
+    assert quantized.impact_scale is not None
+    assert [r["id"] for r in results] == [r["id"] for r in expected]
+    for result, exact in zip(results, expected):
+        assert result["score"] == pytest.approx(exact["score"], rel=0.02)
+
+
+def test_should_read_bm25_statistics_back_from_disk(index, tmp_path):
+    index.segment_path = str(tmp_path / "index")
+    index.save()
+
+    loaded = InvertedIndex(str(tmp_path))
+    loaded.load()
+
+    assert loaded.avg_doc_length == index.avg_doc_length
+    assert loaded.get_bm25_idf("bear") == index.get_bm25_idf("bear")
+    assert loaded.bm25_search("bear", limit=2) == index.bm25_search("bear", limit=2)
+
+
+def test_should_rebuild_a_loaded_index(index, tmp_path):
+    index.segment_path = str(tmp_path / "index")
+    index.save()
+
+    loaded = InvertedIndex(str(tmp_path))
+    loaded.load()
+    loaded.build()
+
+    assert list(loaded.docmap) == list(index.docmap)
+    assert loaded.bm25_search("bear", limit=6) == index.bm25_search("bear", limit=6)
+
+
+def test_should_forget_removed_documents_when_rebuilding(movies, monkeypatch, index):
+    monkeypatch.setattr(keyword_search, "iter_movies", lambda: iter(movies[:2]))
+    index.build()
+    monkeypatch.setattr(keyword_search, "iter_movies", lambda: iter(movies[:1]))
+    index.build()
+
+    assert list(index.docmap) == [1]
+    assert [r["id"] for r in index.bm25_search("bear", limit=5)] == [1]
+
+
+@pytest.mark.parametrize("mode", ["wand", "bmw"])
+def test_should_return_the_same_top_k_as_exhaustive_scoring(synthetic_corpus, mode):
+    idx = InvertedIndex()
+    idx.build()
+
+    for query in ["bear", "shark comedy", "ocean ocean town boy", "unknown"]:
+        for limit in [1, 5, 20]:
+            expected = idx.bm25_search(query, limit, mode="exhaustive")
+            assert idx.bm25_search(query, limit, mode=mode) == expected
+
+
+def test_should_keep_postings_sorted_by_document_id_whatever_the_build_order(
+    movies, monkeypatch, index
+):
+    monkeypatch.setattr(keyword_search, "iter_movies", lambda: reversed(movies))
+    idx = InvertedIndex()
+    idx.build()
+
+    assert idx.doc_ids.tolist() == [1, 2, 3, 4, 5, 6]
+    assert idx.get_documents("bear") == [1, 2, 3, 6]
+    assert idx.get_tf(6, "bear") == 2
+    assert idx.get_tf(4, "bear") == 0
+    assert idx.bm25_search("bear", limit=4) == index.bm25_search("bear", limit=4)
+
+
+@pytest.mark.parametrize("quantize", [False, True])
+def test_should_search_a_compressed_index_like_the_array_index(
+    synthetic_corpus, tmp_path, quantize
+):
+    idx = InvertedIndex(str(tmp_path))
+    idx.build(quantize)
+    idx.save(index_format="compressed")
+
+    loaded = InvertedIndex(str(tmp_path))
+    loaded.load()
+
+    assert loaded.index_format == "compressed"
+    assert loaded.get_documents("bear") == idx.get_documents("bear")
+    assert loaded.get_tf(8, "bear") == idx.get_tf(8, "bear")
+    for query in ["bear", "shark comedy", "ocean ocean town boy"]:
+        for mode in ["exhaustive", "wand", "bmw"]:
+            assert loaded.bm25_search(query, 20, mode) == idx.bm25_search(
+                query, 20, mode
+            )
+
+
+def test_should_convert_original_pickle_files(movies, index, tmp_path):
+    pickles = {
+        "index.pkl": {token: set(index.get_documents(token)) for token in index.index},
+        "docmap.pkl": index.docmap,
+        "term_frequencies.pkl": {
+            m["id"]: Counter(tokenize_text(f"{m['title']} {m['description']}"))
+            for m in movies
+        },
+        "doc_lengths.pkl": {
+            m["id"]: index.doc_lengths[i] for i, m in enumerate(movies)
+        },
+    }
+    for name, content in pickles.items():
+        with open(tmp_path / name, "wb") as f:
+            pickle.dump(content, f)
+
+    converted = InvertedIndex(str(tmp_path))
+    converted.save(converted.load_pickles())
+    loaded = InvertedIndex(str(tmp_path))
+    loaded.load()
+
+    assert loaded.docmap[3] == index.docmap[3]
+    assert list(loaded.docmap) == list(index.docmap)
+    assert loaded.get_documents("bear") == index.get_documents("bear")
+    assert loaded.bm25_search("talking bear", limit=6) == index.bm25_search(
+        "talking bear", limit=6
+    )
+
+
+def test_should_score_updated_segments_like_a_full_rebuild(
+    movies, monkeypatch, index, tmp_path
+):
+    idx = InvertedIndex(str(tmp_path))
+    idx.build()
+    idx.save()
+    idx.load()
+    idx.add_document(
+        {"id": 7, "title": "Bear Story", "description": "A bear paints in the ocean."}
+    )
+    idx.add_document(
+        {"id": 2, "title": "Ted", "description": "A talking teddy in Boston."}
+    )
+    idx.delete_document(5)
+    idx.commit(merge=False)
+
+    corpus = [m for m in movies if m["id"] not in (2, 5)] + [
+        {"id": 2, "title": "Ted", "description": "A talking teddy in Boston."},
+        {"id": 7, "title": "Bear Story", "description": "A bear paints in the ocean."},
+    ]
+    monkeypatch.setattr(keyword_search, "iter_movies", lambda: iter(corpus))
+    rebuilt = InvertedIndex()
+    rebuilt.build()
+
+    assert idx.segmented
+    assert sorted(idx.docmap) == [1, 2, 3, 4, 6, 7]
+    assert idx.get_documents("bear") == rebuilt.get_documents("bear")
+    for query in ["bear", "talking bear ocean", "clownfish"]:
+        assert idx.bm25_search(query, limit=3) == rebuilt.bm25_search(query, limit=3)
+
+    idx.merge(everything=True)
+
+    assert not idx.segmented
+    assert idx.bm25_search("bear ocean", limit=4) == rebuilt.bm25_search(
+        "bear ocean", limit=4
+    )
+
+
+@pytest.mark.skipif(
+    multiprocessing.get_start_method() != "fork",
+    reason="workers only see the monkeypatched corpus when forked",
+)
+def test_should_build_the_same_index_with_several_workers(monkeypatch, index):
+    movies = synthetic_movies(reversed(range(1, 200)))
+    monkeypatch.setattr(keyword_search, "iter_movies", lambda: iter(movies))
+    monkeypatch.setattr(keyword_search, "INDEX_BATCH_SIZE", 16)
+    sequential = InvertedIndex()
+    sequential.build()
+    parallel = InvertedIndex()
+    parallel.build(workers=3)
+
+    assert parallel.doc_ids.tolist() == sequential.doc_ids.tolist()
+    assert parallel.doc_lengths.tolist() == sequential.doc_lengths.tolist()
+    assert parallel.index.keys() == sequential.index.keys()
+    for term, (ordinals, frequencies) in sequential.index.items():
+        assert parallel.index[term][0].tolist() == ordinals.tolist()
+        assert parallel.index[term][1].tolist() == frequencies.tolist()
+
+
+@pytest.mark.parametrize("quantize", [False, True])
+@pytest.mark.parametrize("index_format", ["arrays", "compressed"])
+def test_should_batch_score_like_exhaustive_search(
+    monkeypatch, synthetic_corpus, tmp_path, quantize, index_format
+):
+    monkeypatch.setattr(bm25, "MATRIX_SCORES_PER_CHUNK", 1000)
+    idx = InvertedIndex(str(tmp_path))
+    idx.build(quantize)
+    idx.save(index_format)
+    idx.load()
+    queries = [
+        "bear",
+        "shark comedy",
+        "ocean ocean town boy",
+        "unknown",
+        "london spirit",
+    ]
+
+    for limit in [1, 5, 400, 500]:
+        expected = [idx.bm25_search(query, limit) for query in queries]
+        assert idx.bm25_search_batch(queries, limit) == expected
+
+
+def test_should_match_phrases_and_proximity_with_positions(
+    movies, monkeypatch, index, tmp_path
+):
+    corpus = movies + [
+        {
+            "id": 7,
+            "title": "Winnie the Pooh",
+            "description": "A bear of very little brain.",
+        },
+        {
+            "id": 8,
+            "title": "Pooh Corner",
+            "description": "Winnie visits the bear the pooh sticks.",
+        },
+    ]
+    monkeypatch.setattr(keyword_search, "iter_movies", lambda: iter(corpus))
+    idx = InvertedIndex(str(tmp_path))
+    idx.build(positions=True)
+
+    assert [r["id"] for r in idx.bm25_search('"winnie the pooh"', limit=5)] == [7]
+    assert {r["id"] for r in idx.bm25_search('"pooh winnie"~3', limit=5)} == {7, 8}
+    assert [r["id"] for r in idx.bm25_search('"bear from peru" london', limit=5)] == [1]
+    assert idx.bm25_search('"bear winnie"', limit=5) == []
+
+    idx.save()
+    idx.load()
+    idx.add_document(
+        {"id": 9, "title": "Pooh", "description": "Winnie the pooh again."}
+    )
+    idx.commit(merge=False)
+
+    assert idx.segmented
+    assert [r["id"] for r in idx.bm25_search('"winnie the pooh"', limit=5)] == [9, 7]
+
+    idx.merge(everything=True)
+
+    assert [r["id"] for r in idx.bm25_search('"winnie the pooh"', limit=5)] == [9, 7]
+
+
+def test_should_reject_phrases_without_positions(index):
+    with pytest.raises(ValueError):
+        index.bm25_search('"talking teddy"')
+
+
+def test_should_reduce_bm25f_to_bm25_with_a_single_field():
+    frequencies = np.array([1, 3, 2])
+    norms = np.array([0.8, 1.0, 1.4])
+
+    given = bm25.bm25f_impacts(
+        frequencies[:, None], norms[:, None], np.array([1.0]), 0.7
+    )
+
+    assert given == pytest.approx(bm25.posting_impacts(frequencies, norms, 0.7))
+
+
+def test_should_weight_fields_at_query_time(movies, monkeypatch, index):
+    corpus = movies + [
+        {
+            "id": 7,
+            "title": "Shark Tale",
+            "description": "A fish lies about a great white.",
+        }
+    ]
+    monkeypatch.setattr(keyword_search, "iter_movies", lambda: iter(corpus))
+    idx = InvertedIndex()
+    idx.build(fields=True)
+
+    by_title = idx.bm25f_search(
+        "shark", limit=2, weights={"title": 5.0, "description": 0.1}
+    )
+    by_description = idx.bm25f_search(
+        "shark", limit=2, weights={"title": 0.1, "description": 5.0}
+    )
+
+    assert [r["id"] for r in by_title] == [7, 4]
+    assert [r["id"] for r in by_description] == [4, 7]
+    with pytest.raises(ValueError):
+        idx.bm25f_search("shark", weights={"genre": 1.0})
+    with pytest.raises(ValueError):
+        index.bm25f_search("shark")
+
+
+@pytest.mark.parametrize("index_format", ["arrays", "compressed"])
+def test_should_score_bm25f_segments_like_a_full_rebuild(
+    movies, monkeypatch, index, tmp_path, index_format
+):
+    weights = {"title": 3.0, "description": 0.5}
+    idx = InvertedIndex(str(tmp_path))
+    idx.build(fields=True)
+    expected = idx.bm25f_search("bear ocean", limit=6, weights=weights)
+    idx.save(index_format)
+    idx.load()
+
+    assert idx.bm25f_search("bear ocean", limit=6, weights=weights) == expected
+
+    idx.add_document(
+        {"id": 7, "title": "Bear Story", "description": "A bear paints in the ocean."}
+    )
+    idx.delete_document(5)
+    idx.commit(merge=False)
+    corpus = [m for m in movies if m["id"] != 5] + [
+        {"id": 7, "title": "Bear Story", "description": "A bear paints in the ocean."}
+    ]
+    monkeypatch.setattr(keyword_search, "iter_movies", lambda: iter(corpus))
+    rebuilt = InvertedIndex()
+    rebuilt.build(fields=True)
+    expected = rebuilt.bm25f_search("bear ocean", limit=6, weights=weights)
+
+    assert idx.segmented
+    assert idx.bm25f_search("bear ocean", limit=6, weights=weights) == expected
+
+    idx.merge(everything=True)
+
+    assert idx.bm25f_search("bear ocean", limit=6, weights=weights) == expected
+
+
+@pytest.mark.parametrize(
+    "query, default_operator, expected",
+    [
+        ("bear AND london", "or", [1]),
+        ("bear london", "or", [1, 2, 3, 6]),
+        ("bear london", "and", [1]),
+        ("bear +london", "or", [1]),
+        ("bear -paddington", "or", [2, 3, 6]),
+        ("(shark OR clownfish) AND NOT beach", "or", [5]),
+        ("NOT bear", "or", [4, 5]),
+        ("teddy OR (bear AND spirits) OR ocean", "and", [2, 5, 6]),
+        ("the", "or", []),
+    ],
+)
+def test_should_match_boolean_queries(index, query, default_operator, expected):
+    results = index.boolean_search(query, limit=10, default_operator=default_operator)
+
+    assert [r["id"] for r in results] == expected
+
+
+def test_should_reject_malformed_boolean_queries(index):
+    for query in ["bear AND (london", "bear)", "bear AND NOT"]:
+        with pytest.raises(ValueError):
+            index.boolean_search(query)
+
+
+def test_should_rank_boolean_matches_with_bm25(index):
+    results = index.boolean_search("bear -paddington", limit=10, rank=True)
+    expected = [
+        r
+        for r in index.bm25_search("bear", limit=10)
+        if r["score"] > 0 and r["id"] != 1
+    ]
+
+    assert results == expected
+
+
+def test_should_probe_compressed_postings_like_arrays():
+    rng = np.random.default_rng(0)
+    ordinals = np.unique(rng.integers(0, 5000, 900)).astype(np.int32)
+    postings = CompressedPostings(ordinals, np.ones(len(ordinals), dtype=np.int32))
+    candidates = np.unique(rng.integers(0, 5200, 300)).astype(np.int32)
+
+    expected = np.isin(candidates, ordinals)
+
+    assert contains_ordinals(postings, candidates).tolist() == expected.tolist()
+    assert contains_ordinals(ordinals, candidates).tolist() == expected.tolist()
+
+
+def test_should_evaluate_boolean_queries_the_same_on_every_index_layout(
+    synthetic_corpus, tmp_path
+):
+    idx = InvertedIndex()
+    idx.build()
+    compressed = InvertedIndex(str(tmp_path / "compressed"))
+    compressed.build()
+    compressed.save("compressed")
+    compressed.load()
+    segmented = InvertedIndex(str(tmp_path / "segmented"))
+    segmented.build()
+    segmented.save()
+    segmented.load()
+    segmented.delete_document(399)
+    segmented.add_document(synthetic_corpus[398])
+    segmented.commit(merge=False)
+    queries = [
+        "bear AND ocean",
+        "shark -comedy",
+        "(town OR boy) AND NOT (spirit london)",
+        "+london +comedy town",
+    ]
+
+    assert segmented.segmented
+    for query in queries:
+        for rank in [False, True]:
+            expected = idx.boolean_search(query, 500, rank)
+            assert compressed.boolean_search(query, 500, rank) == expected
+            assert segmented.boolean_search(query, 500, rank) == expected
+
+
+def test_should_expand_wildcards_against_the_term_dictionary(index):
+    expected = sorted(term for term in index.index if term.startswith("b"))
+
+    assert index.expand_term("B*") == expected
+    assert index.expand_term("b*", max_expansions=2) == expected[:2]
+    assert index.expand_term("?ed") == ["ted"]
+    assert index.expand_term("*fish") == ["clownfish"]
+    assert index.expand_term("zz*") == []
+
+
+def test_should_search_with_wildcard_words(index):
+    assert index.bm25_search("padd*", limit=1)[0]["id"] == 1
+    assert index.bm25_search("sha* beach", limit=1) == index.bm25_search(
+        "shark beach", limit=1
+    )
+    assert [r["id"] for r in index.boolean_search("sha* OR clown*")] == [4, 5]
+    assert [r["id"] for r in index.boolean_search("bear AND ?ed")] == [2]
+    assert index.boolean_search("zz*") == []
+
+
+def test_should_expand_wildcards_the_same_on_every_index_layout(
+    monkeypatch, index, tmp_path
+):
+    movies = synthetic_movies(words=["bear", "beach", *WORDS[2:]])
+    monkeypatch.setattr(keyword_search, "iter_movies", lambda: iter(movies))
+    idx = InvertedIndex()
+    idx.build()
+    compressed = InvertedIndex(str(tmp_path / "compressed"))
+    compressed.build()
+    compressed.save("compressed")
+    compressed.load()
+    segmented = InvertedIndex(str(tmp_path / "segmented"))
+    segmented.build()
+    segmented.save()
+    segmented.load()
+    segmented.delete_document(399)
+    segmented.add_document(movies[398])
+    segmented.commit(merge=False)
+
+    assert segmented.segmented
+    for pattern in ["b*", "*o*", "?ea*"]:
+        expected = idx.expand_term(pattern)
+        assert compressed.expand_term(pattern) == expected
+        assert segmented.expand_term(pattern) == expected
+        assert compressed.bm25_search(pattern, 20) == idx.bm25_search(pattern, 20)
+        assert segmented.bm25_search(pattern, 20) == idx.bm25_search(pattern, 20)
+
+
+def test_should_correct_misspelled_words_to_index_terms(index):
+    assert index.correct_spelling("padington comdy") == "paddington comedi"
+    assert index.correct_spelling("The brother baer") == "The brother bear"
+    assert index.correct_spelling("shark xqzvw") == "shark xqzvw"
+
+
+def test_should_cache_results_by_analyzed_query_until_rebuilt(
+    movies, monkeypatch, index
+):
+    expected = index.bm25_search("talking bear", limit=3)
+    expected[0]["score"] = -1.0
+
+    assert index.bm25_search("Talking,  bears!", limit=3) != expected
+    assert index.result_cache.stats()["hits"] == 1
+    assert index.bm25_search("talking bear", limit=4) != index.bm25_search(
+        "talking bear", limit=3
+    )
+
+    monkeypatch.setattr(keyword_search, "iter_movies", lambda: iter(movies[:1]))
+    index.build()
+
+    assert expected[0]["id"] == 2
+    assert [r["id"] for r in index.bm25_search("talking bear", limit=3)] == [1]
+
+
+def test_should_share_cached_results_between_single_and_batch_searches(index):
+    single = index.bm25_search("talking bear", limit=3)
+
+    batch = index.bm25_search_batch(["Talking bears", "shark", "shark"], limit=3)
+
+    assert batch[0] == single
+    assert batch[1] == batch[2]
+    assert index.result_cache.stats()["hits"] == 1
+    assert index.bm25_search("shark", limit=3) == batch[1]
+    assert index.result_cache.stats()["hits"] == 2
+
+
+def test_should_expand_queries_with_feedback_from_the_top_documents(index):
+    weights = index.feedback_weights("talking", feedback_docs=1, feedback_terms=3)
+
+    assert next(iter(weights)) == "talk"
+    assert sum(weights.values()) == pytest.approx(1.0)
+    assert len(weights) == 3
+    assert index.feedback_query(
+        "talking", feedback_docs=1, feedback_terms=3
+    ).startswith("talking ")
+
+
+def test_should_weight_feedback_documents_by_unrounded_scores(monkeypatch, index):
+    expected = index.feedback_weights("bear", feedback_docs=4)
+    monkeypatch.setattr(search_utils, "SCORE_PRECISION", 0)
+    index.result_cache.clear()
+
+    assert index.feedback_weights("bear", feedback_docs=4) == expected
+
+
+def test_should_score_feedback_queries_with_weighted_bm25(index):
+    weights = index.feedback_weights("shark beach", feedback_docs=2)
+    scores = {
+        doc_id: sum(w * index.bm25(doc_id, term) for term, w in weights.items())
+        for doc_id in index.docmap
+    }
+    expected = sorted(scores.items(), key=lambda x: (-x[1], x[0]))[:4]
+
+    results = index.feedback_search("shark beach", limit=4, feedback_docs=2)
+
+    assert [(r["id"], r["score"]) for r in results] == [
+        (d, round(s, 3)) for d, s in expected
+    ]
+
+
+def test_should_search_feedback_queries_the_same_on_segments(
+    synthetic_corpus, tmp_path
+):
+    idx = InvertedIndex()
+    idx.build()
+    segmented = InvertedIndex(str(tmp_path / "segmented"))
+    segmented.build()
+    segmented.save()
+    segmented.load()
+    segmented.delete_document(399)
+    segmented.add_document(synthetic_corpus[398])
+    segmented.commit(merge=False)
+
+    assert segmented.segmented
+    for query in ["bear", "shark town", "london comedy"]:
+        expected = idx.feedback_search(query, 20)
+        results = segmented.feedback_search(query, 20)
+        assert [r["id"] for r in results] == [r["id"] for r in expected]
+        assert [r["score"] for r in results] == pytest.approx(
+            [r["score"] for r in expected], abs=1e-3
+        )
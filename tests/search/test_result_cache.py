@@ -0,0 +1,80 @@
+from search.result_cache import ResultCache
+
+
+class FakeClock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def results(n: int) -> list[dict]:
+    return [{"id": i, "score": float(n - i), "metadata": {}} for i in range(n)]
+
+
+def test_should_evict_least_recently_used_results_beyond_the_size():
+    cache = ResultCache(max_size=5, ttl=None)
+    cache.put("a", results(2))
+    cache.put("b", results(2))
+    cache.get("a")
+    cache.put("c", results(2))
+
+    assert cache.get("b") is None
+    assert cache.get("a") == results(2)
+    assert cache.get("c") == results(2)
+    assert cache.stats() | {"generation": None} == {
+        "entries": 2,
+        "size": 4,
+        "max_size": 5,
+        "hits": 3,
+        "misses": 1,
+        "evictions": 1,
+        "expirations": 0,
+        "generation": None,
+    }
+
+
+def test_should_expire_entries_after_their_time_to_live():
+    clock = FakeClock()
+    cache = ResultCache(ttl=10.0, clock=clock)
+    cache.put("a", results(1))
+    clock.now = 10.0
+    assert cache.get("a") == results(1)
+    clock.now = 10.5
+
+    assert cache.get("a") is None
+    assert cache.stats()["expirations"] == 1
+    assert cache.stats()["size"] == 0
+
+
+def test_should_hand_out_copies_and_compute_only_on_a_miss():
+    cache = ResultCache()
+    calls = []
+
+    def compute() -> list[dict]:
+        calls.append(1)
+        return results(3)
+
+    first = cache.get_or_compute("a", compute)
+    first[0]["metadata"]["rank"] = 1
+
+    assert cache.get_or_compute("a", compute) == results(3)
+    assert len(calls) == 1
+
+
+def test_should_bump_the_generation_when_cleared():
+    cache = ResultCache()
+    cache.put("a", results(1))
+    cache.clear()
+
+    assert cache.get("a") is None
+    assert cache.stats()["generation"] == 1
+
+
+def test_should_skip_results_larger_than_the_whole_cache():
+    cache = ResultCache(max_size=2)
+    cache.put("a", results(3))
+
+    assert cache.get("a") is None
+    assert cache.stats()["size"] == 0
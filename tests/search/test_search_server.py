@@ -0,0 +1,57 @@
+import threading
+
+import pytest
+
+from search.keyword_search import InvertedIndex
+from search.search_client import server_request
+from search.search_server import SearchServer, SearchService
+
+
+@pytest.fixture
+def server_url(index):
+    # A separate index over the same corpus, so results are checked against `index`
+    service = SearchService()
+    service.idx = InvertedIndex()
+    service.idx.build()
+    with SearchServer(("127.0.0.1", 0), service) as server:
+        thread = threading.Thread(target=server.serve_forever)
+        thread.start()
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+        server.shutdown()
+        thread.join()
+
+
+def test_should_answer_keyword_requests_like_the_index(server_url, index):
+    response = server_request(
+        server_url, "/keyword", {"query": "talking bear", "limit": 2}
+    )
+
+    assert response["results"] == index.bm25_search("talking bear", 2)
+    boolean = server_request(server_url, "/boolean", {"query": "bear -paddington"})
+    assert boolean["results"][0]["id"] == 2
+    assert server_request(server_url, "/stats")["keyword"]["misses"] == 1
+
+
+def test_should_reject_unknown_endpoints_and_arguments(server_url):
+    with pytest.raises(ValueError, match="no endpoint"):
+        server_request(server_url, "/nowhere", {"query": "bear"})
+    with pytest.raises(ValueError, match="unexpected keyword argument"):
+        server_request(server_url, "/keyword", {"query": "bear", "size": 3})
+    with pytest.raises(ValueError, match="unbalanced"):
+        server_request(server_url, "/boolean", {"query": "(bear"})
+
+
+def test_should_report_a_missing_server():
+    with pytest.raises(ConnectionError):
+        server_request("http://127.0.0.1:9", "/keyword", {"query": "bear"})
+
+
+def test_should_report_server_failures(server_url, monkeypatch):
+    def missing_index(self):
+        raise FileNotFoundError("no index saved")
+
+    monkeypatch.setattr(SearchService, "index", missing_index)
+
+    with pytest.raises(RuntimeError, match="FileNotFoundError: no index saved"):
+        server_request(server_url, "/keyword", {"query": "bear"})
+    assert "keyword" in server_request(server_url, "/stats")
@@ -0,0 +1,164 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from search import embedding_store
+from search.embedding_store import EmbeddingMatrix, convert_embeddings
+from search.semantic_search import (
+    CHUNK_METADATA_DTYPE,
+    aggregate_chunk_scores,
+    convert_chunk_metadata,
+    cosine_similarities,
+    cosine_similarity,
+    movie_segments,
+    normalize_embeddings,
+)
+
+
+def test_should_match_pairwise_cosine_similarity_with_normalized_embeddings():
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((50, 8), dtype=np.float32)
+    embeddings[3] = 0
+    query = rng.standard_normal(8, dtype=np.float32)
+
+    scores = cosine_similarities(normalize_embeddings(embeddings), query)
+
+    assert scores.dtype == np.float32
+    assert np.allclose(
+        scores, [cosine_similarity(query, e) for e in embeddings], atol=1e-6
+    )
+    assert scores[3] == 0
+
+
+def test_should_keep_zero_vectors_and_normalized_rows_unchanged():
+    embeddings = np.array([[3.0, 4.0], [0.0, 0.0]])
+
+    normalized = normalize_embeddings(embeddings)
+
+    assert normalized.tolist() == [[0.6, 0.8], [0.0, 0.0]]
+    assert np.array_equal(normalize_embeddings(normalized), normalized)
+    assert cosine_similarities(normalized, np.zeros(2)).tolist() == [0.0, 0.0]
+
+
+def python_aggregate(scores, chunk_movies, reduce):
+    by_movie = {}
+    for movie, score in zip(chunk_movies, scores):
+        by_movie.setdefault(movie, []).append(score)
+    return [reduce(sorted(by_movie[movie], reverse=True)) for movie in sorted(by_movie)]
+
+
+@pytest.mark.parametrize(
+    "aggregation, reduce",
+    [
+        ("max", lambda s: s[0]),
+        ("top2-mean", lambda s: sum(s[:2]) / len(s[:2])),
+        ("top-k-sum", lambda s: sum(s[:3])),
+    ],
+)
+def test_should_aggregate_chunk_scores_per_movie(aggregation, reduce):
+    rng = np.random.default_rng(0)
+    chunk_movies = np.sort(rng.choice([0, 2, 3, 7, 8, 11], size=40))
+    scores = rng.choice([-0.5, 0.1, 0.25, 0.9], size=40).astype(np.float32)
+
+    starts = movie_segments(chunk_movies)
+    aggregated = aggregate_chunk_scores(scores, starts, aggregation, k=3)
+
+    assert chunk_movies[starts].tolist() == sorted(set(chunk_movies.tolist()))
+    assert np.allclose(
+        aggregated, python_aggregate(scores.tolist(), chunk_movies.tolist(), reduce)
+    )
+
+
+def test_should_aggregate_movies_with_fewer_chunks_than_k():
+    scores = np.array([0.5, 0.2, 0.4, 0.4], dtype=np.float32)
+    starts = movie_segments(np.array([1, 4, 4, 4]))
+
+    assert aggregate_chunk_scores(scores, starts, "top2-mean").tolist() == [
+        0.5,
+        pytest.approx(0.4),
+    ]
+    assert aggregate_chunk_scores(scores, starts, "top-k-sum", k=3).tolist() == [
+        0.5,
+        pytest.approx(1.0),
+    ]
+    with pytest.raises(ValueError):
+        aggregate_chunk_scores(scores, starts, "median")
+
+
+def test_should_convert_json_chunk_metadata_to_a_memory_mappable_array(tmp_path):
+    chunks = [
+        {"movie_idx": 0, "chunk_idx": 0, "total_chunks": 2},
+        {"movie_idx": 0, "chunk_idx": 1, "total_chunks": 2},
+        {"movie_idx": 2, "chunk_idx": 0, "total_chunks": 1},
+    ]
+    json_path = tmp_path / "chunk_metadata.json"
+    json_path.write_text(
+        json.dumps({"chunks": chunks, "total_chunks": len(chunks)}, indent=2)
+    )
+
+    converted = convert_chunk_metadata(
+        str(json_path), str(tmp_path / "chunk_metadata.npy")
+    )
+    loaded = np.load(tmp_path / "chunk_metadata.npy", mmap_mode="r")
+
+    assert loaded.dtype == CHUNK_METADATA_DTYPE
+    assert np.array_equal(loaded, converted)
+    assert [dict(zip(loaded.dtype.names, row.tolist())) for row in loaded] == chunks
+
+
+@pytest.mark.parametrize(
+    "embedding_format, tolerance",
+    [("float32", 1e-6), ("float16", 2e-3), ("int8", 2e-2)],
+)
+def test_should_score_saved_embeddings_close_to_float32(
+    tmp_path, embedding_format, tolerance, monkeypatch
+):
+    monkeypatch.setattr(embedding_store, "EMBEDDING_SCORE_BLOCK_ROWS", 7)
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((50, 16)).astype(np.float32)
+    embeddings[4] = 0
+    query = rng.standard_normal(16).astype(np.float32)
+    path = str(tmp_path / "embeddings.npy")
+
+    EmbeddingMatrix.from_embeddings(embeddings, embedding_format).save(path)
+    matrix = EmbeddingMatrix.load(path)
+
+    assert matrix.embedding_format == embedding_format
+    assert matrix.shape == (50, 16)
+    assert np.allclose(
+        matrix.similarities(query),
+        [cosine_similarity(query, e) for e in embeddings],
+        atol=tolerance,
+    )
+    assert matrix.similarities(query)[4] == 0
+
+
+def test_should_convert_saved_embeddings_to_the_requested_format(tmp_path):
+    embeddings = np.random.default_rng(0).standard_normal((20, 8)).astype(np.float32)
+    path = str(tmp_path / "embeddings.npy")
+    np.save(path, embeddings * 3)
+
+    int8 = convert_embeddings(path, "int8")
+    float16 = convert_embeddings(path, "float16")
+
+    assert int8.embedding_format == "int8"
+    assert float16.embedding_format == "float16"
+    assert np.load(path).dtype == np.float16
+    assert not os.path.exists(embedding_store.scales_path(path))
+    assert np.allclose(
+        float16.to_float32(), normalize_embeddings(embeddings), atol=2e-2
+    )
+
+
+def test_should_load_saved_embeddings_without_rewriting_them(tmp_path):
+    embeddings = np.random.default_rng(0).standard_normal((20, 8)).astype(np.float32)
+    path = tmp_path / "embeddings.npy"
+    EmbeddingMatrix.from_embeddings(embeddings, "float16").save(str(path))
+    saved = path.read_bytes()
+
+    matrix = EmbeddingMatrix.load(str(path))
+
+    assert matrix.embedding_format == "float16"
+    assert path.read_bytes() == saved
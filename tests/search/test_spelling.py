@@ -0,0 +1,39 @@
+import numpy as np
+
+from search.spelling import SpellingIndex, edit_distance
+
+
+def test_should_measure_edits_with_transpositions():
+    assert edit_distance("kitten", "sitting", 3) == 3
+    assert edit_distance("bear", "baer", 2) == 1
+    assert edit_distance("comdy", "comedi", 2) == 2
+    assert edit_distance("kitten", "sitting", 2) is None
+    assert edit_distance("bear", "bearskins", 2) is None
+
+
+def test_should_find_every_term_a_full_scan_finds():
+    rng = np.random.default_rng(0)
+    letters = list("abcde")
+    vocabulary = {
+        "".join(rng.choice(letters, rng.integers(3, 11))): i % 7 + 1
+        for i in range(1000)
+    }
+    spelling = SpellingIndex(vocabulary)
+    words = ["".join(rng.choice(letters, rng.integers(2, 12))) for _ in range(100)]
+
+    for word in words:
+        distances = {term: edit_distance(word, term, 2) for term in vocabulary}
+        expected = {(term, d) for term, d in distances.items() if d is not None}
+        if word in vocabulary:
+            expected = {(word, 0)}
+
+        assert set(spelling.lookup(word)) == expected
+
+
+def test_should_prefer_the_closest_then_the_most_frequent_term():
+    spelling = SpellingIndex({"bear": 10, "beer": 3, "bead": 30})
+
+    assert spelling.lookup("baer") == [("bear", 1), ("beer", 1), ("bead", 2)]
+    assert spelling.correct("beat") == "bead"
+    assert spelling.correct("bear") == "bear"
+    assert spelling.correct("xyz") is None